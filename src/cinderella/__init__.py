@@ -3,4 +3,5 @@ from pathlib import Path
 MODULE_DIR = Path(__file__).resolve().parent
 ROOT_DIR = MODULE_DIR.parent.parent
 OUT_DIR = ROOT_DIR / "out"
-CONFIGS_DIR = ROOT_DIR / "configs"
\ No newline at end of file
+CONFIGS_DIR = ROOT_DIR / "configs"
+SPECS_DIR = ROOT_DIR / "specs"
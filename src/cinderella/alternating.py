@@ -0,0 +1,373 @@
+"""
+This module solves witness problems with bilinear templates by alternating
+linear programs, as an alternative to calling PolyQEnt.
+
+With linear templates, the constraint system is bilinear: the coefficients
+of the rank function multiply the coefficients of the reach updates. Once
+all template blocks but one are fixed, every pair with linear hypotheses is
+a linear implication whose conclusion is affine in the remaining unknowns.
+By Farkas' lemma, it holds iff there are nonnegative multipliers of the
+hypotheses that certify it, which is a linear system in the unknowns and
+the multipliers. The engine frees the blocks in turn and solves these LPs,
+minimizing the total violation of the conclusions. Hypotheses that contain
+unknowns of the free block, e.g. the negated goal after the reach update,
+are evaluated at the previous values, and the LPs are only solved up to a
+tolerance, so every candidate is rounded to nearby rationals and checked
+exactly with `check_model` before it is returned. Random restarts run on a
+process pool.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from fractions import Fraction
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import sympy as sp
+
+from cinderella.constraint import ConstraintSystem
+from cinderella.lp import TOLERANCE, is_feasible, linear_form, linear_rows, linprog
+from cinderella.normal_form import dnf_size, dnf_terms, to_nnf
+from cinderella.verify import check_model
+
+MAX_DISJUNCTS = 64
+# The denominators tried when rounding a candidate, LP vertices are usually simple rationals
+MAX_DENOMINATORS = (10 ** 2, 10 ** 4, 10 ** 6)
+
+
+class AlternatingResult(NamedTuple):
+    """
+    The result of the alternating LP engine.
+
+    Attributes
+    ----------
+    model : Optional[Dict[sp.Symbol, sp.Rational]]
+        The witness, if one was found, rounded to rationals that passed
+        `check_model`.
+    violation : float
+        The smallest total violation reached.
+    iterations : int
+        The number of LPs solved in the restart that produced the result.
+    seed : int
+        The seed of that restart.
+    """
+    model: Optional[Dict[sp.Symbol, sp.Rational]]
+    violation: float
+    iterations: int
+    seed: int
+
+
+def solve_alternating(cs: ConstraintSystem,
+                      blocks: Sequence[Sequence[sp.Symbol]],
+                      restarts: int = 8,
+                      max_rounds: int = 20,
+                      bound: float = 10.0,
+                      margin: float = 1e-3,
+                      radius: float = 0.25,
+                      workers: Optional[int] = None) -> AlternatingResult:
+    """
+    Search for a witness by alternating LPs over the template blocks, with
+    random restarts in parallel. The first restart that finds a witness wins.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    blocks : Sequence[Sequence[sp.Symbol]]
+        The blocks of unknowns that are freed in turn, e.g. the rank function
+        coefficients and the update coefficients. Unknowns in no block are
+        free in every LP.
+    restarts : int
+        The number of random restarts.
+    max_rounds : int
+        The maximal number of rounds over all blocks per restart.
+    bound : float
+        The bound on the absolute value of every unknown.
+    margin : float
+        The margin by which strict inequalities have to hold.
+    radius : float
+        The trust region radius of unknowns that occur in hypotheses.
+    workers : Optional[int]
+        The number of worker processes, defaults to the number of cores.
+
+    Returns
+    -------
+    AlternatingResult
+        The witness of the first successful restart, or the restart with the
+        smallest violation.
+    """
+    workers = min(workers or os.cpu_count() or 1, restarts)
+    best = AlternatingResult(None, float('inf'), 0, -1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cs, blocks)) as pool:
+        pending = {pool.submit(_alternate, seed, max_rounds, bound, margin, radius) for seed in range(restarts)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result.model is not None:
+                    for other in pending:
+                        other.cancel()
+                    return result
+                if result.violation < best.violation:
+                    best = result
+    return best
+
+
+_worker_system: Optional[ConstraintSystem] = None
+_worker_blocks: Sequence[Sequence[sp.Symbol]] = ()
+
+
+def _init_worker(cs: ConstraintSystem, blocks: Sequence[Sequence[sp.Symbol]]) -> None:
+    global _worker_system, _worker_blocks
+    _worker_system, _worker_blocks = cs, blocks
+
+
+def _alternate(seed: int, max_rounds: int, bound: float, margin: float, radius: float) -> AlternatingResult:
+    return alternate(_worker_system, _worker_blocks, seed, max_rounds, bound, margin, radius)
+
+
+def alternate(cs: ConstraintSystem,
+              blocks: Sequence[Sequence[sp.Symbol]],
+              seed: int = 0,
+              max_rounds: int = 20,
+              bound: float = 10.0,
+              margin: float = 1e-3,
+              radius: float = 0.25) -> AlternatingResult:
+    """
+    Run a single restart of the alternating LP engine. All unknowns start at
+    random values, then the blocks are freed in turn.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    blocks : Sequence[Sequence[sp.Symbol]]
+        The blocks of unknowns that are freed in turn.
+    seed : int
+        The seed of the random initial values.
+    max_rounds : int
+        The maximal number of rounds over all blocks.
+    bound : float
+        The bound on the absolute value of every unknown.
+    margin : float
+        The margin by which strict inequalities have to hold.
+    radius : float
+        The trust region radius of unknowns that occur in hypotheses.
+
+    Returns
+    -------
+    AlternatingResult
+        The witness, if one was found, and the smallest violation.
+    """
+    unknowns = sorted(set().union(*[c.get_free_variables() for c in cs.free_constraints + cs.constraint_pairs]), key=str)
+    in_blocks = set().union(*map(set, blocks))
+    always_free = [u for u in unknowns if u not in in_blocks]
+    rng = np.random.default_rng(seed)
+    values = {u: float(rng.uniform(-1, 1)) for u in unknowns}
+
+    best = float('inf')
+    iterations = 0
+    for _ in range(max_rounds):
+        for block in blocks:
+            free = [u for u in unknowns if u in set(block)] + always_free
+            step = _solve_step(cs, free, values, bound, margin, radius)
+            iterations += 1
+            if step is None:
+                continue
+            solution, violation = step
+            values.update(solution)
+            best = min(best, violation)
+            if violation <= TOLERANCE:
+                model = _exact_witness(cs, values)
+                if model is not None:
+                    return AlternatingResult(model, violation, iterations, seed)
+    return AlternatingResult(None, best, iterations, seed)
+
+
+def _exact_witness(cs: ConstraintSystem, values: Dict[sp.Symbol, float]) -> Optional[Dict[sp.Symbol, sp.Rational]]:
+    """
+    Round a candidate to rationals with increasing denominators until the
+    rounded candidate is exactly a witness. Returns None if no rounding is.
+    """
+    for max_denominator in MAX_DENOMINATORS:
+        model = {u: sp.Rational(Fraction(v).limit_denominator(max_denominator)) for u, v in values.items()}
+        if check_model(cs, model):
+            return model
+    return None
+
+
+def _solve_step(cs: ConstraintSystem, free: List[sp.Symbol], values: Dict[sp.Symbol, float],
+                bound: float, margin: float, radius: float) -> Optional[Tuple[Dict[sp.Symbol, float], float]]:
+    """
+    Solve the LP over the free unknowns with all other unknowns fixed.
+    Returns the new values of the free unknowns and the total violation, or
+    None if the system is not linear in the free unknowns.
+
+    The LP is only exact for unknowns that do not occur in hypotheses. The
+    others are kept within the radius of their previous values, where the
+    previous hypotheses are a reasonable approximation.
+    """
+    free_set = set(free)
+    fixed = {u: v for u, v in values.items() if u not in free_set}
+    current = {u: values[u] for u in free}
+    problem = _FarkasProblem(free)
+
+    for constraint in cs.free_constraints:
+        for atom in sp.And.make_args(to_nnf(constraint.formula.xreplace(fixed))):
+            if atom == sp.true:
+                continue
+            if not problem.add_free_atom(atom, margin):
+                return None
+
+    for pair in cs.constraint_pairs:
+        variables = list(pair.forall_vars)
+        # Hypotheses with free unknowns are evaluated at their previous values
+        condition = to_nnf(pair.condition.formula.xreplace(fixed).xreplace(current))
+        implication = to_nnf(pair.implication.formula.xreplace(fixed))
+        conclusions = [atom for atom in sp.And.make_args(implication) if atom != sp.true]
+        if not conclusions:
+            continue
+        if dnf_size(condition) > MAX_DISJUNCTS or isinstance(implication, sp.Or):
+            return None
+        for disjunct in dnf_terms(condition):
+            rows = []
+            for atom in disjunct:
+                atom_rows = linear_rows(atom, variables)
+                if atom_rows is None:
+                    return None
+                rows.extend(atom_rows)
+            if not is_feasible(list(disjunct), variables):
+                continue
+            for atom in conclusions:
+                if not problem.add_pair_atom(atom, variables, rows, margin):
+                    return None
+
+    in_hypotheses = set().union(*[pair.condition.formula.free_symbols for pair in cs.constraint_pairs])
+    bounds = [(max(-bound, values[u] - radius), min(bound, values[u] + radius)) if u in in_hypotheses
+              else (-bound, bound) for u in free]
+    return problem.solve(bounds)
+
+
+class _FarkasProblem:
+    """
+    The LP over the free unknowns, the Farkas multipliers and the violation
+    variables of the conclusions. Columns are the unknowns, then the other
+    variables in the order they are created.
+    """
+
+    def __init__(self, unknowns: List[sp.Symbol]) -> None:
+        self.unknowns = unknowns
+        self.columns = len(unknowns)
+        self.violations: List[int] = []
+        self.eq_rows: List[Tuple[Dict[int, float], float]] = []
+        self.ub_rows: List[Tuple[Dict[int, float], float]] = []
+
+    def _new_columns(self, count: int) -> List[int]:
+        columns = list(range(self.columns, self.columns + count))
+        self.columns += count
+        return columns
+
+    def _affine(self, expr: sp.Expr) -> Optional[Tuple[Dict[int, float], float]]:
+        form = linear_form(expr, self.unknowns)
+        if form is None:
+            return None
+        coefficients, constant = form
+        return {i: c for i, c in enumerate(coefficients) if c != 0}, constant
+
+    def add_free_atom(self, atom: sp.Basic, margin: float) -> bool:
+        """
+        Add a free constraint atom e >= 0 (e > 0), i.e. -e - v <= -margin.
+        """
+        forms = _nonnegative_forms(atom)
+        if forms is None:
+            return False
+        for expr, strict in forms:
+            affine = self._affine(expr)
+            if affine is None:
+                return False
+            coefficients, constant = affine
+            v, = self._new_columns(1)
+            self.violations.append(v)
+            row = {i: -c for i, c in coefficients.items()}
+            row[v] = -1.0
+            self.ub_rows.append((row, constant - (margin if strict else 0.0)))
+        return True
+
+    def add_pair_atom(self, atom: sp.Basic, variables: List[sp.Symbol],
+                      rows: List[Tuple[np.ndarray, float]], margin: float) -> bool:
+        """
+        Add a conclusion atom g @ x + h >= 0 over the hypotheses A @ x <= b:
+        A^T lambda = -g and h - b @ lambda >= 0 (> 0 if strict), up to the
+        violation variables.
+        """
+        forms = _nonnegative_forms(atom)
+        if forms is None:
+            return False
+        for expr, strict in forms:
+            expr = sp.expand(expr)
+            gradient = [self._affine(expr.coeff(var)) for var in variables]
+            constant = self._affine(expr.xreplace({var: 0 for var in variables}))
+            if constant is None or any(g is None for g in gradient):
+                return False
+            if variables and sp.Poly(expr, *variables).total_degree() > 1:
+                return False
+            multipliers = self._new_columns(len(rows))
+            v, = self._new_columns(1)
+            self.violations.append(v)
+            for j, (g_coefficients, g_constant) in enumerate(gradient):
+                row = {m: a[j] for m, (a, _) in zip(multipliers, rows) if a[j] != 0}
+                for i, c in g_coefficients.items():
+                    row[i] = row.get(i, 0.0) + c
+                # The residual of the gradient counts as violation as well
+                above, below = self._new_columns(2)
+                self.violations.extend([above, below])
+                row[above], row[below] = -1.0, 1.0
+                self.eq_rows.append((row, -g_constant))
+            h_coefficients, h_constant = constant
+            row = {i: -c for i, c in h_coefficients.items()}
+            for m, (_, b) in zip(multipliers, rows):
+                row[m] = b
+            row[v] = -1.0
+            self.ub_rows.append((row, h_constant - (margin if strict else 0.0)))
+        return True
+
+    def solve(self, bounds: List[Tuple[float, float]]) -> Optional[Tuple[Dict[sp.Symbol, float], float]]:
+        """
+        Minimize the total violation within the bounds of the unknowns.
+        """
+        def matrix(rows):
+            if not rows:
+                return None, None
+            A = np.zeros((len(rows), self.columns))
+            for k, (row, _) in enumerate(rows):
+                for i, c in row.items():
+                    A[k, i] = c
+            return A, np.array([b for _, b in rows])
+
+        A_ub, b_ub = matrix(self.ub_rows)
+        A_eq, b_eq = matrix(self.eq_rows)
+        cost = np.zeros(self.columns)
+        cost[self.violations] = 1.0
+        bounds = list(bounds) + [(0, None)] * (self.columns - len(self.unknowns))
+        try:
+            result = linprog(cost, A_ub, b_ub, A_eq, b_eq, bounds)
+        except RuntimeError:
+            return None
+        if result.status != 'optimal':
+            return None
+        return {u: float(x) for u, x in zip(self.unknowns, result.x)}, float(result.fun)
+
+
+def _nonnegative_forms(atom: sp.Basic) -> Optional[List[Tuple[sp.Expr, bool]]]:
+    """
+    Write a relational atom as expressions e >= 0 (or e > 0 if strict).
+    """
+    if atom == sp.false:
+        return [(sp.Integer(-1), False)]
+    if not atom.is_Relational or atom.rel_op == '!=':
+        return None
+    difference = atom.lhs - atom.rhs
+    if atom.rel_op == '==':
+        return [(difference, False), (-difference, False)]
+    if atom.rel_op in ('>=', '>'):
+        return [(difference, atom.rel_op == '>')]
+    return [(-difference, atom.rel_op == '<')]
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
-from typing import List, Set, Tuple, Union
+from typing import List, Optional, Set, Tuple, Union
 from warnings import warn
 
 import sympy as sp
 
+from cinderella.lp import is_feasible
+from cinderella.normal_form import to_nnf
+
 
 class ConstraintSystem:
     """
@@ -69,6 +72,62 @@ class ConstraintSystem:
         for pair in self.constraint_pairs:
             pair.subs(substitution)
 
+    def copy(self) -> ConstraintSystem:
+        """
+        Copy the constraint system.
+        Formulas are immutable and shared, the containers are copied.
+
+        Returns
+        -------
+        ConstraintSystem
+            The copied constraint system.
+        """
+        cs = ConstraintSystem()
+        cs.free_constraints = [Constraint(c.formula) for c in self.free_constraints]
+        cs.constraint_pairs = [p.copy() for p in self.constraint_pairs]
+        return cs
+
+    def instantiate(self, substitution: dict) -> ConstraintSystem:
+        """
+        Instantiate a copy of the constraint system, e.g. for concrete values
+        of symbolic game parameters. Unlike `subs`, the substitution is purely
+        structural, which is much cheaper on large boolean formulas.
+
+        Parameters
+        ----------
+        substitution : dict
+            The substitution dictionary mapping symbols to values.
+
+        Returns
+        -------
+        ConstraintSystem
+            The instantiated constraint system.
+        """
+        substitution = {sp.sympify(k): sp.sympify(v) for k, v in substitution.items()}
+        cs = self.copy()
+        for constraint in cs.free_constraints:
+            constraint.formula = constraint.formula.xreplace(substitution)
+        for pair in cs.constraint_pairs:
+            pair.condition.formula = pair.condition.formula.xreplace(substitution)
+            pair.implication.formula = pair.implication.formula.xreplace(substitution)
+        return cs
+
+    def minimize_forall_variables(self) -> ConstraintSystem:
+        """
+        Minimize the universally quantified variables of every constraint
+        pair, see `ConstraintPair.minimize_forall_variables`. Pairs that hold
+        trivially are dropped.
+
+        Returns
+        -------
+        ConstraintSystem
+            The minimized constraint system.
+        """
+        cs = self.copy()
+        cs.constraint_pairs = [minimized for pair in self.constraint_pairs
+                               if (minimized := pair.minimize_forall_variables()) is not None]
+        return cs
+
     def write_smt2(self, file_path: str) -> None:
         """
         Write the constraint system to an SMT2 file.
@@ -109,20 +168,35 @@ class ConstraintPair:
         The implication of the constraint pair.
     invariants : List[sp.Basic]
         A list of invariants in the constraint pair.
+    label : str
+        The origin of the constraint pair, e.g. 'rank non-negativity'.
     """
 
     def __init__(self,
                  forall_vars: List[sp.Symbol],
                  condition: sp.Basic,
                  implication: sp.Basic,
+                 label: str = '',
                  ) -> None:
         self.forall_vars = forall_vars
         self.condition = Constraint(condition)
         self.implication = Constraint(implication)
+        self.label = label
 
     def __str__(self) -> str:
         return f'{self.condition.formula} -> {self.implication.formula}'
 
+    def copy(self) -> ConstraintPair:
+        """
+        Copy the constraint pair.
+
+        Returns
+        -------
+        ConstraintPair
+            The copied constraint pair.
+        """
+        return ConstraintPair(list(self.forall_vars), self.condition.formula, self.implication.formula, self.label)
+
     def get_forall_variables(self) -> Set[sp.Symbol]:
         """
         Get the universally quantified variables in the constraint pair.
@@ -148,6 +222,54 @@ class ConstraintPair:
             self.implication.get_free_variables(),
         ).difference(self.get_forall_variables())
         
+    def minimize_forall_variables(self) -> Optional[ConstraintPair]:
+        """
+        Drop the universally quantified variables that are not connected to
+        the conclusion through the hypothesis conjuncts. The conjuncts over
+        only such variables are independent of the conclusion: if they are
+        feasible, they can be dropped with their variables, otherwise the
+        pair holds trivially. Feasibility is only decided for linear
+        conjuncts without unknowns, other independent conjuncts are kept.
+        Infeasibility is confirmed in exact arithmetic before a pair is
+        dropped.
+
+        Returns
+        -------
+        Optional[ConstraintPair]
+            The minimized constraint pair, or None if it holds trivially.
+        """
+        forall = set(self.forall_vars)
+        conjuncts = [c for c in sp.And.make_args(to_nnf(self.condition.formula)) if c != sp.true]
+        # Group the conjuncts into components connected by shared variables
+        components: List[Tuple[Set[sp.Symbol], List[sp.Basic]]] = []
+        for conjunct in conjuncts:
+            variables, members = conjunct.free_symbols & forall, [conjunct]
+            for component in [c for c in components if c[0] & variables]:
+                components.remove(component)
+                variables, members = variables | component[0], component[1] + members
+            components.append((variables, members))
+
+        relevant = forall & self.implication.formula.free_symbols
+        dropped: List[sp.Basic] = []
+        for variables, members in components:
+            if not variables or variables & relevant:
+                continue
+            # Only conjuncts without unknowns can be decided
+            if not all(c.free_symbols <= forall for c in members):
+                continue
+            feasible = is_feasible(members, sorted(variables, key=str))
+            # The pair is only vacuous if the LP result holds exactly, it may err near the boundary
+            if feasible is False:
+                feasible = is_feasible(members, sorted(variables, key=str), exact=True)
+            if feasible is False:
+                return None
+            if feasible:
+                dropped.extend(members)
+        kept = [c for c in conjuncts if c not in dropped]
+        relevant |= set().union(*[c.free_symbols & forall for c in kept])
+        forall_vars = [var for var in self.forall_vars if var in relevant]
+        return ConstraintPair(forall_vars, sp.And(*kept), self.implication.formula, self.label)
+
     def subs(self, substitution: dict) -> None:
         """
         Substitute variables in the constraint pair.
@@ -215,7 +337,7 @@ class Constraint:
         str
             The SMT2 string representing the constraint pair.
         """
-        return f'{self.__to_smt(self.formula)}'
+        return f'{self.__to_smt(to_nnf(self.formula))}'
 
     def __to_smt(self, constraint: sp.Basic) -> str:
         """
@@ -259,29 +381,9 @@ class Constraint:
                     constraint.args) >= 2, f'Expected 2 arguments, got {len(constraint.args)}'
                 return f'(or {" ".join([self.__to_smt(arg) for arg in constraint.args])})'
             elif f == 'not':
-                assert len(
-                    constraint.args) == 1, f'Expected 1 argument, got {len(constraint.args)}'
-                child = constraint.args[0]
-                if isinstance(child, sp.Implies):
-                    assert len(
-                        child.args) == 2, f'Expected 2 arguments, got {len(child.args)}'
-                    return f'(and {self.__to_smt(child.args[0])} {self.__to_smt(sp.Not(child.args[1]))})'
-                elif isinstance(child, sp.And):
-                    assert len(
-                        child.args) >= 2, f'Expected 2 arguments, got {len(child.args)}'
-                    return f'(or {" ".join([self.__to_smt(sp.Not(arg)) for arg in child.args])})'
-                elif isinstance(child, sp.Or):
-                    assert len(
-                        child.args) >= 2, f'Expected 2 arguments, got {len(child.args)}'
-                    return f'(and {" ".join([self.__to_smt(sp.Not(arg)) for arg in child.args])})'
-                else:
-                    raise ValueError(
-                        f'Unable to reduce negation on: {type(child)}')
-            elif f == 'implies':
-                assert len(
-                    constraint.args) == 2, f'Expected 2 arguments, got {len(constraint.args)}'
-                # return f'(=> {to_smt(constraint.args[0])} {to_smt(constraint.args[1])})'
-                return f'(or {self.__to_smt(sp.Not(constraint.args[0]))} {self.__to_smt(constraint.args[1])})'
+                # Negations of relations and connectives are removed by the normal form
+                raise ValueError(
+                    f'Unable to reduce negation on: {type(constraint.args[0])}')
             else:
                 warn(f'Unsupported function: {f}')
                 return f'({str(constraint.func).lower()} {" ".join([self.__to_smt(arg) for arg in constraint.args])})'
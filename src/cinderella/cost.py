@@ -0,0 +1,433 @@
+"""
+This module estimates the solve time of a constraint system before it is
+solved, so that batch runs can solve the cheap games first and give every
+game a timeout that matches its expected cost.
+
+The estimate is a log-linear model over statistics of the constraint system:
+the number of pairs, the universally quantified variables per pair, the
+hypothesis atoms and the disjuncts of the hypotheses, the unknowns, the
+bilinear terms and the degree in the universally quantified variables. The
+logarithm of the solve time is a linear function of the logarithms of these
+statistics. The default weights are fitted to the solve times recorded in
+`run_all.txt`, which only cover four distinct systems, so they are only
+used to order batch runs. Timeouts are derived from a model only if one is
+passed explicitly, e.g. one refitted with `calibrate` on a larger log for
+another machine or solver configuration; otherwise every run gets
+`DEFAULT_TIMEOUT`.
+"""
+import json
+import math
+import os
+import re
+import time
+from argparse import ArgumentParser
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import sympy as sp
+
+from cinderella import ROOT_DIR, SPECS_DIR
+from cinderella.constraint import ConstraintSystem
+from cinderella.normal_form import dnf_size, to_nnf
+from cinderella.spec import GameSpec, solve_spec
+
+# The timeout of a solver run in seconds without a calibrated cost model
+DEFAULT_TIMEOUT = 300
+
+FEATURES = ('pairs', 'forall_per_pair', 'hypothesis_atoms', 'disjuncts', 'unknowns', 'bilinear_terms', 'degree')
+
+
+class CostFeatures(NamedTuple):
+    """
+    The statistics of a constraint system that determine its solve time.
+
+    Attributes
+    ----------
+    pairs : int
+        The number of constraint pairs.
+    forall_per_pair : float
+        The mean number of universally quantified variables per pair.
+    hypothesis_atoms : int
+        The number of atoms in the hypotheses of all pairs.
+    disjuncts : int
+        The number of disjuncts of the DNFs of all hypotheses, i.e. the number
+        of certificates the solver has to find per conclusion.
+    unknowns : int
+        The number of unknowns.
+    bilinear_terms : int
+        The number of terms that multiply two or more unknowns.
+    degree : int
+        The maximal degree of an atom in the universally quantified variables.
+    """
+    pairs: int
+    forall_per_pair: float
+    hypothesis_atoms: int
+    disjuncts: int
+    unknowns: int
+    bilinear_terms: int
+    degree: int
+
+
+class CostModel(NamedTuple):
+    """
+    A log-linear model of the solve time.
+
+    Attributes
+    ----------
+    intercept : float
+        The logarithm of the solve time of an empty system in seconds.
+    weights : Dict[str, float]
+        The weight of the logarithm of every feature, see `FEATURES`.
+    """
+    intercept: float
+    weights: Dict[str, float]
+
+    def predict(self, features: CostFeatures) -> float:
+        """
+        Estimate the solve time of a constraint system.
+
+        Parameters
+        ----------
+        features : CostFeatures
+            The statistics of the constraint system.
+
+        Returns
+        -------
+        float
+            The estimated solve time in seconds.
+        """
+        x = np.log1p(np.array(features, dtype=float))
+        return float(np.exp(self.intercept + x @ np.array([self.weights[name] for name in FEATURES])))
+
+    def timeout(self, features: CostFeatures, factor: float = 10.0, minimum: float = 30.0,
+                maximum: float = 300.0) -> int:
+        """
+        Get a timeout for a constraint system, a multiple of its estimated
+        solve time.
+
+        Parameters
+        ----------
+        features : CostFeatures
+            The statistics of the constraint system.
+        factor : float
+            The multiple of the estimated solve time.
+        minimum : float
+            The minimal timeout in seconds.
+        maximum : float
+            The maximal timeout in seconds.
+
+        Returns
+        -------
+        int
+            The timeout in seconds.
+        """
+        return math.ceil(min(max(factor * self.predict(features), minimum), maximum))
+
+    def save(self, file_path: str) -> None:
+        """
+        Write the model to a JSON file.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the file.
+        """
+        with open(file_path, 'w') as f:
+            json.dump({'intercept': self.intercept, 'weights': self.weights}, f, indent=2)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'CostModel':
+        """
+        Read a model from a JSON file.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the file.
+
+        Returns
+        -------
+        CostModel
+            The model.
+        """
+        with open(file_path) as f:
+            data = json.load(f)
+        return cls(data['intercept'], data['weights'])
+
+
+# Calibrated with `calibrate_from_log('run_all.txt')` on the specifications in `specs`. The fit is
+# degenerate: the log only has four distinct systems, the disjuncts of the robot cocktail game explain most
+# of the spread, and the non-negativity of the weights drops the pairs, forall_per_pair, unknowns and
+# bilinear_terms features entirely. It is good enough to order a batch, but not to derive timeouts from.
+DEFAULT_MODEL = CostModel(-8.113, {
+    'pairs': 0.0,
+    'forall_per_pair': 0.0,
+    'hypothesis_atoms': 0.144,
+    'disjuncts': 3.223,
+    'unknowns': 0.0,
+    'bilinear_terms': 0.0,
+    'degree': 0.047,
+})
+
+
+class Job(NamedTuple):
+    """
+    A game of a batch run with its estimated cost.
+
+    Attributes
+    ----------
+    spec : GameSpec
+        The game specification.
+    features : CostFeatures
+        The statistics of its compiled constraint system.
+    estimate : float
+        The estimated solve time in seconds.
+    timeout : int
+        The timeout of a solver run in seconds.
+    """
+    spec: GameSpec
+    features: CostFeatures
+    estimate: float
+    timeout: int
+
+
+def cost_features(cs: ConstraintSystem) -> CostFeatures:
+    """
+    Compute the statistics of a constraint system for the cost model.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+
+    Returns
+    -------
+    CostFeatures
+        The statistics of the constraint system.
+    """
+    unknowns = set().union(*[c.get_free_variables() for c in cs.free_constraints + cs.constraint_pairs])
+    forall = hypothesis_atoms = disjuncts = bilinear_terms = degree = 0
+    for pair in cs.constraint_pairs:
+        condition = to_nnf(pair.condition.formula)
+        forall += len(pair.forall_vars)
+        hypothesis_atoms += len(condition.atoms(sp.core.relational.Relational))
+        disjuncts += dnf_size(condition)
+        variables = set(pair.forall_vars)
+        for formula in (condition, pair.implication.formula):
+            for atom in formula.atoms(sp.core.relational.Relational):
+                for term in sp.Add.make_args(sp.expand(atom.lhs - atom.rhs)):
+                    powers = term.as_powers_dict()
+                    if sum(int(e) for s, e in powers.items() if s in unknowns) > 1:
+                        bilinear_terms += 1
+                    degree = max(degree, sum(int(e) for s, e in powers.items() if s in variables))
+    pairs = len(cs.constraint_pairs)
+    return CostFeatures(pairs, forall / max(pairs, 1), hypothesis_atoms, disjuncts, len(unknowns),
+                        bilinear_terms, degree)
+
+
+def solve_timeout(cs: ConstraintSystem, model: Optional[CostModel] = None) -> float:
+    """
+    Get the timeout of a solver run on a constraint system.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    model : Optional[CostModel]
+        A calibrated cost model. Without one, the timeout is `DEFAULT_TIMEOUT`.
+
+    Returns
+    -------
+    float
+        The timeout in seconds.
+    """
+    return DEFAULT_TIMEOUT if model is None else model.timeout(cost_features(cs))
+
+
+def calibrate(features: Sequence[CostFeatures], times: Sequence[float], ridge: float = 0.1) -> CostModel:
+    """
+    Fit the cost model to recorded solve times by ridge regression of the
+    logarithms. The intercept is not regularized, and the weights are kept
+    non-negative, since no statistic makes a system easier to solve: the
+    feature with the most negative weight is dropped until none is left.
+
+    Parameters
+    ----------
+    features : Sequence[CostFeatures]
+        The statistics of the solved constraint systems.
+    times : Sequence[float]
+        Their solve times in seconds.
+    ridge : float
+        The regularization of the weights, which keeps the fit stable when
+        there are fewer distinct systems than features.
+
+    Returns
+    -------
+    CostModel
+        The calibrated model.
+    """
+    X = np.log1p(np.array(features, dtype=float))
+    y = np.log(np.array(times, dtype=float))
+    mean_x, mean_y = X.mean(axis=0), y.mean()
+    centered = X - mean_x
+    weights = np.zeros(len(FEATURES))
+    active = list(range(len(FEATURES)))
+    while active:
+        A = centered[:, active]
+        weights[:] = 0.0
+        weights[active] = np.linalg.solve(A.T @ A + ridge * np.eye(len(active)), A.T @ (y - mean_y))
+        if weights.min() >= 0:
+            break
+        active.remove(int(np.argmin(weights)))
+    return CostModel(float(mean_y - mean_x @ weights), dict(zip(FEATURES, weights.tolist())))
+
+
+def read_run_log(file_path: str) -> Dict[str, float]:
+    """
+    Read the average solve times of the benchmarks from the output of
+    `run_all.sh`.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the log.
+
+    Returns
+    -------
+    Dict[str, float]
+        The average solve time in seconds of every benchmark, by name.
+    """
+    times = {}
+    name = None
+    with open(file_path) as f:
+        for line in f:
+            running = re.match(r'Running (\S+)\.py', line)
+            if running:
+                name = os.path.basename(running.group(1))
+            average = re.match(r'Average time to solve with \w+: ([\d.]+)', line)
+            if average and name is not None:
+                times[name] = float(average.group(1))
+    return times
+
+
+def calibrate_from_log(file_path: str = str(ROOT_DIR / 'run_all.txt'), use_cache: bool = True,
+                       ridge: float = 0.1) -> CostModel:
+    """
+    Fit the cost model to the solve times of a `run_all.sh` log, using the
+    specifications in `specs` with the names of the benchmarks.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the log.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    ridge : float
+        The regularization of the weights, see `calibrate`.
+
+    Returns
+    -------
+    CostModel
+        The calibrated model.
+    """
+    features, times = [], []
+    for name, seconds in read_run_log(file_path).items():
+        path = SPECS_DIR / f'{name}.toml'
+        if path.exists():
+            features.append(cost_features(GameSpec.load(str(path)).compile(use_cache).cs))
+            times.append(seconds)
+    return calibrate(features, times, ridge)
+
+
+def schedule(specs: Sequence[GameSpec], model: Optional[CostModel] = None, use_cache: bool = True,
+             factor: float = 10.0) -> List[Job]:
+    """
+    Order the games of a batch run shortest-first by their estimated solve
+    time, and give every game a timeout.
+
+    Parameters
+    ----------
+    specs : Sequence[GameSpec]
+        The game specifications.
+    model : Optional[CostModel]
+        A calibrated cost model for the estimates and the timeouts. Without
+        one, the games are ordered by `DEFAULT_MODEL` and every game gets
+        `DEFAULT_TIMEOUT`.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    factor : float
+        The timeout as a multiple of the estimated solve time, see
+        `CostModel.timeout`.
+
+    Returns
+    -------
+    List[Job]
+        The jobs in the order they should be solved.
+    """
+    jobs = []
+    for spec in specs:
+        features = cost_features(spec.compile(use_cache).cs)
+        timeout = DEFAULT_TIMEOUT if model is None else model.timeout(features, factor)
+        jobs.append(Job(spec, features, (model or DEFAULT_MODEL).predict(features), timeout))
+    return sorted(jobs, key=lambda job: job.estimate)
+
+
+def run_batch(specs: Sequence[GameSpec], model: Optional[CostModel] = None, use_cache: bool = True,
+              repeat: int = 1, factor: float = 10.0) -> List[Tuple[Job, bool, float]]:
+    """
+    Solve the games of a batch shortest-first, each with its own timeout.
+
+    Parameters
+    ----------
+    specs : Sequence[GameSpec]
+        The game specifications.
+    model : Optional[CostModel]
+        A calibrated cost model, see `schedule`.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    repeat : int
+        The number of solver runs per game.
+    factor : float
+        The timeout as a multiple of the estimated solve time.
+
+    Returns
+    -------
+    List[Tuple[Job, bool, float]]
+        Every job with whether a witness was found and the time it took.
+    """
+    results = []
+    for job in schedule(specs, model, use_cache, factor):
+        print(f"Solving {job.spec.name}: estimated {job.estimate:.2f} s, timeout {job.timeout} s")
+        start = time.time()
+        model_found = solve_spec(job.spec, use_cache, repeat, timeout=job.timeout)
+        results.append((job, model_found is not None, time.time() - start))
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Estimate the solve times of game specifications and solve them shortest-first.")
+    parser.add_argument('specs', nargs='*', help='Paths to TOML or JSON game specifications.')
+    parser.add_argument('--calibrate', metavar='LOG', help='Fit the cost model to a run_all.sh log.')
+    parser.add_argument('--model', help='Read the cost model from a JSON file, or write it with --calibrate.')
+    parser.add_argument('--solve', action='store_true', help='Solve the games shortest-first with per-game timeouts.')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the compiled-spec cache.')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='Number of solver runs per game.')
+    args = parser.parse_args()
+
+    cost_model = None
+    if args.calibrate:
+        cost_model = calibrate_from_log(args.calibrate, use_cache=not args.no_cache)
+        print(f"Calibrated cost model: {cost_model}")
+        if args.model:
+            cost_model.save(args.model)
+    elif args.model:
+        cost_model = CostModel.load(args.model)
+
+    specs = [GameSpec.load(path) for path in args.specs]
+    if args.solve:
+        for job, solved, seconds in run_batch(specs, cost_model, not args.no_cache, args.repeat):
+            print(f"{job.spec.name}: {'sat' if solved else 'no witness'} in {seconds:.2f} s "
+                  f"(estimated {job.estimate:.2f} s)")
+    else:
+        for job in schedule(specs, cost_model, not args.no_cache):
+            print(f"{job.spec.name}: estimated {job.estimate:.2f} s, timeout {job.timeout} s")
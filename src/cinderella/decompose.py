@@ -0,0 +1,172 @@
+"""
+This module decomposes the goal of a game into its disjuncts and solves the
+resulting reachability problems in parallel.
+
+The goals of the Cinderella games are disjunctions of overflow conditions,
+but the reach player only has to force one of them. A witness for a game
+whose goal is a disjunct, or a disjunction of a few disjuncts, is a witness
+for the original game, since reaching the smaller goal reaches the original
+one. The negation of a conjunctive goal is a single disjunction instead of a
+conjunction of disjunctions, which keeps the hypotheses of the rank pairs
+small. The sub-problems are independent, so they run on a process pool and
+the first witness wins: the pool is terminated, so running sub-problems do
+not delay the result.
+"""
+from argparse import ArgumentParser
+from itertools import combinations
+from multiprocessing import Pool
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import sympy as sp
+
+from cinderella.normal_form import dnf_terms, to_nnf
+from cinderella.spec import GameSpec, parse_formula, solve_spec
+
+
+class SubgoalResult(NamedTuple):
+    """
+    The witness of a game restricted to some of its goal disjuncts.
+
+    Attributes
+    ----------
+    name : str
+        The name of the sub-problem.
+    goal : str
+        The goal of the sub-problem.
+    model : Dict[sp.Symbol, Any]
+        The model of the witness.
+    """
+    name: str
+    goal: str
+    model: Dict[sp.Symbol, Any]
+
+
+def goal_disjuncts(spec: GameSpec) -> List[str]:
+    """
+    Get the disjuncts of the DNF of the goal of a specification. Parameters
+    are kept symbolic.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+
+    Returns
+    -------
+    List[str]
+        The disjuncts, as formulas of the specification.
+    """
+    game_variables, aux_vars, _, _ = spec._symbols()
+    goal = parse_formula(spec.data['goal'], {v.name: v for v in game_variables + aux_vars})
+    return [str(sp.And(*sorted(disjunct, key=str))) for disjunct in dnf_terms(to_nnf(goal))]
+
+
+def decompose_goal(spec: GameSpec, max_size: int = 1) -> List[GameSpec]:
+    """
+    Get the games whose goals are the disjunctions of at most `max_size`
+    disjuncts of the goal of a specification, smallest first. Symmetries are
+    dropped, since a part of the goal is in general not symmetric. If
+    `max_size` covers all disjuncts, the specification itself comes last.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    max_size : int
+        The maximal number of disjuncts per sub-problem.
+
+    Returns
+    -------
+    List[GameSpec]
+        The game specifications of the sub-problems, or the specification
+        itself if its goal has a single disjunct.
+    """
+    disjuncts = goal_disjuncts(spec)
+    if len(disjuncts) <= 1:
+        return [spec]
+    base = GameSpec({key: value for key, value in spec.data.items() if key != 'symmetries'})
+    problems = [base.replace(name=f"{spec.name}_goal_{'_'.join(map(str, subset))}",
+                             goal=str(sp.Or(*[parse_formula(disjuncts[i], {}) for i in subset])))
+                for size in range(1, min(max_size, len(disjuncts) - 1) + 1)
+                for subset in combinations(range(len(disjuncts)), size)]
+    if max_size >= len(disjuncts):
+        problems.append(spec)
+    return problems
+
+
+def _solve_subgoal(index: int, spec: GameSpec, use_cache: bool, repeat: int,
+                   timeout: float) -> Tuple[int, Optional[Dict[sp.Symbol, Any]]]:
+    return index, solve_spec(spec, use_cache, repeat, timeout=timeout)
+
+
+def _solve_subgoal_star(arguments: Tuple[int, GameSpec, bool, int, float]) -> Tuple[int, Optional[Dict[sp.Symbol, Any]]]:
+    return _solve_subgoal(*arguments)
+
+
+def solve_decomposed(spec: GameSpec,
+                     max_size: int = 1,
+                     combine: bool = False,
+                     workers: Optional[int] = None,
+                     use_cache: bool = True,
+                     repeat: int = 1,
+                     timeout: float = 300) -> List[SubgoalResult]:
+    """
+    Solve the sub-problems of the goal decomposition of a game in parallel.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    max_size : int
+        The maximal number of goal disjuncts per sub-problem.
+    combine : bool
+        Whether to solve all sub-problems and return the witness of every
+        part of the goal that the reach player can force, instead of the
+        first witness.
+    workers : Optional[int]
+        The number of worker processes, defaults to the number of cores.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    repeat : int
+        The number of solver runs per sub-problem.
+    timeout : float
+        The timeout of a solver run in seconds.
+
+    Returns
+    -------
+    List[SubgoalResult]
+        The first witness, or with `combine` the witnesses of all solved
+        sub-problems in the order of the decomposition. Every witness is a
+        witness of the original game.
+    """
+    problems = decompose_goal(spec, max_size)
+    results: Dict[int, SubgoalResult] = {}
+    # Leaving the pool terminates the workers, including the sub-problems that are still running
+    with Pool(workers) as pool:
+        arguments = [(i, problem, use_cache, repeat, timeout) for i, problem in enumerate(problems)]
+        for index, model in pool.imap_unordered(_solve_subgoal_star, arguments):
+            if model is None:
+                continue
+            problem = problems[index]
+            results[index] = SubgoalResult(problem.name, problem.data['goal'], model)
+            if not combine:
+                break
+    return [results[i] for i in sorted(results)]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Solve a game specification goal disjunct by goal disjunct.")
+    parser.add_argument('spec', help='Path to a TOML or JSON game specification.')
+    parser.add_argument('-k', '--max-size', type=int, default=1, help='Maximal number of goal disjuncts per sub-problem.')
+    parser.add_argument('--combine', action='store_true', help='Solve all sub-problems instead of stopping at the first witness.')
+    parser.add_argument('-w', '--workers', type=int, help='Number of worker processes.')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the compiled-spec cache.')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='Number of solver runs per sub-problem.')
+    args = parser.parse_args()
+
+    witnesses = solve_decomposed(GameSpec.load(args.spec), max_size=args.max_size, combine=args.combine,
+                                 workers=args.workers, use_cache=not args.no_cache, repeat=args.repeat)
+    if not witnesses:
+        print("No sub-problem has a witness")
+    for witness in witnesses:
+        print(f"{witness.name} reaches {witness.goal}")
@@ -3,54 +3,128 @@ This module takes programs in the form of transition systems, creates an .smt2
 file for a ranking witness, and then executes PolyHorn to find a ranking
 function that proves the termination of the program.
 """
+import logging
+import math
 import os
+import subprocess
 import sys
 import time
 from argparse import ArgumentParser
+from typing import Any, Dict, Optional
 
 from polyqent.main import execute, load_config
 
 from cinderella import CONFIGS_DIR
+from cinderella.constraint import ConstraintSystem
 from cinderella.util import set_timeout
+from cinderella.verify import check_model
 
 import numpy as np
+import sympy as sp
 
+logger = logging.getLogger(__name__)
 
-def execute_polyqent(file_path: str, repeat: int = 10):   
+# The PolyQEnt config of every solver run
+DEFAULT_CONFIG = 'farkas-z3.json'
 
-    config = os.path.join(CONFIGS_DIR, 'farkas-z3.json')
+
+def execute_polyqent(file_path: str, repeat: int = 10,
+                     hint: Optional[Dict[Any, Any]] = None, cs: Optional[ConstraintSystem] = None,
+                     timeout: float = 300):
+    """
+    Solve an .smt2 file with PolyQEnt.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the .smt2 file.
+    repeat : int
+        The number of solver runs.
+    hint : Optional[Dict[Any, Any]]
+        A model of a related system, e.g. from a previous run, a neighbouring
+        parameter value or smaller templates. PolyQEnt takes no initial
+        values, so the hint is checked against `cs` with exact LPs first and
+        the solver is only called if it is not a witness. Unknowns the hint
+        does not assign are zero.
+    cs : Optional[ConstraintSystem]
+        The constraint system of the file, required with a hint.
+    timeout : float
+        The timeout of a solver run in seconds, e.g. from
+        `cinderella.cost.CostModel.timeout`.
+
+    Returns
+    -------
+    Tuple[str, Optional[Dict[str, str]]]
+        The result and the model, with values in prefix notation. The result
+        is 'sat', 'unsat' if a run reported unsat, or 'unknown' if every run
+        timed out or the solver process failed.
+
+    Raises
+    ------
+    ValueError
+        If a hint is given without a constraint system.
+    """
+    if hint is not None:
+        if cs is None:
+            raise ValueError('A hint can only be checked against a constraint system')
+        hint = {sp.Symbol(str(key)): value for key, value in hint.items()}
+        unknowns = set().union(*[c.get_free_variables() for c in cs.free_constraints + cs.constraint_pairs])
+        candidate = {unknown: hint.get(unknown, 0) for unknown in unknowns}
+        if check_model(cs, candidate):
+            print("The hint is a witness, skipping PolyQEnt")
+            return 'sat', {unknown.name: _to_prefix(value) for unknown, value in candidate.items()}
+
+    config = os.path.join(CONFIGS_DIR, DEFAULT_CONFIG)
     config_dict = load_config(config)
     print(f"Using config: {config}")
 
     times = []
     
     final_result = None
+    refuted = False
 
     for i in range(repeat):
         
         try:
             start_solve = time.time()
-            result = set_timeout(execute, 300, file_path, config_dict, debug_mode=False)
+            result = set_timeout(execute, math.ceil(timeout), file_path, config_dict, debug_mode=False)
             end_solve = time.time()
         except TimeoutError:
             print(f"Config {config} timed out")
             continue
+        except (subprocess.SubprocessError, OSError) as e:
+            # The external solver crashed or could not be started; anything else is a bug
+            logger.warning("Config %s failed with error %s", config, e)
+            continue
 
         if result[0] == 'sat':
             times.append(end_solve - start_solve)
             final_result = result
         else:
+            refuted |= result[0] == 'unsat'
             print(f"Config {config} failed with result {result[0]}")
             
     if not times:
         print("No successful runs found.")
-        return 'unsat', None
+        return ('unsat' if refuted else 'unknown'), None
     
     avg, std = np.mean(times), np.std(times)
     print(f"Average time to solve with PolyHorn: {avg:.3f} +/- {std:.3f} seconds over {len(times)} runs")
     return final_result[0], final_result[1]
 
 
+def _to_prefix(value: Any) -> str:
+    """
+    Write a number exactly in the prefix notation of PolyQEnt models.
+    """
+    value = sp.Rational(value)
+    if value < 0:
+        return f'(- {_to_prefix(-value)})'
+    if value.q == 1:
+        return str(value.p)
+    return f'(/ {value.p} {value.q})'
+
+
 def execute_polyqent_variable_config(file_path: str):   
 
     for config in sorted(os.listdir(CONFIGS_DIR)):
@@ -0,0 +1,494 @@
+"""
+This module converts games written for other tools into game specifications.
+
+Two formats are supported:
+
+- rpgsolve `.rpg` files, as in `other_benchmarks/rpgsolve`. The game must
+  alternate between one location in which the environment (the reach player)
+  chooses its inputs and one location in which the system (the safety player)
+  chooses an update. Input choices that lead to a safe sink are forbidden for
+  the reach player, reaching a location of value 0 is its goal.
+- gensys `.py` files, as in `other_benchmarks/gensys`. The files are not
+  run as scripts: only the constant assignments and the functions that
+  return a formula are evaluated, and only if their expressions consist of
+  arithmetic, comparisons and calls of `And`, `Or`, `Not`, `Implies` and the
+  functions of the file, without builtins. The functions passed to
+  `reachability_fixedpoint_gensys` are evaluated on sympy symbols.
+
+Both importers produce a `GameSpec` with the ranking offset `M > 0` and linear
+templates, which can be compiled and solved like any other specification.
+"""
+import ast
+import os
+import re
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import sympy as sp
+
+from cinderella.cost import run_batch
+from cinderella.normal_form import to_nnf
+from cinderella.spec import PRIMED_SUFFIX, GameSpec
+
+_TOKEN = re.compile(r'[()]|[^\s()]+')
+
+_RPG_OPERATORS: Dict[str, Callable[..., sp.Basic]] = {
+    '+': lambda *args: sp.Add(*args),
+    '-': lambda first, *rest: -first if not rest else first - sp.Add(*rest),
+    '*': lambda *args: sp.Mul(*args),
+    '/': lambda numerator, denominator: numerator / denominator,
+    '<': sp.StrictLessThan,
+    '<=': sp.LessThan,
+    '>': sp.StrictGreaterThan,
+    '>=': sp.GreaterThan,
+    '=': sp.Eq,
+    'and': lambda *args: sp.And(*args),
+    'or': lambda *args: sp.Or(*args),
+    'not': sp.Not,
+}
+
+
+def _default_spec(name: str, game_variables: List[sp.Symbol], degree: int) -> Dict[str, Any]:
+    return {
+        'name': name,
+        'game_variables': [v.name for v in game_variables],
+        'free_constraints': ['M > 0'],
+        'ranking_offset': 'M',
+        'templates': {'rank_fn': {'degree': degree}, 'reach_updates': {'degree': degree}},
+    }
+
+
+def _primed(var: sp.Symbol) -> sp.Symbol:
+    return sp.Symbol(f'{var.name}{PRIMED_SUFFIX}')
+
+
+# rpgsolve
+
+class _RpgReader:
+    """
+    A recursive descent reader for the S-expressions of an .rpg file.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.tokens = _TOKEN.findall(text)
+        self.position = 0
+
+    def done(self) -> bool:
+        return self.position >= len(self.tokens)
+
+    def peek(self) -> str:
+        return self.tokens[self.position]
+
+    def next(self) -> str:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, expected: str) -> None:
+        token = self.next()
+        if token != expected:
+            raise ValueError(f'Expected {expected!r} but found {token!r} in .rpg file')
+
+    def sexpr(self) -> Any:
+        token = self.next()
+        if token != '(':
+            return token
+        items = []
+        while self.peek() != ')':
+            items.append(self.sexpr())
+        self.next()
+        return items
+
+    def term(self) -> Any:
+        """
+        Read a transition term: a location, `sys (assignments location ...)`
+        or `if condition then term else term`.
+        """
+        token = self.next()
+        if token == 'if':
+            condition = self.sexpr()
+            self.expect('then')
+            then_term = self.term()
+            self.expect('else')
+            return ('if', condition, then_term, self.term())
+        if token == 'sys':
+            self.expect('(')
+            choices = []
+            while self.peek() != ')':
+                choices.append((self.sexpr(), self.next()))
+            self.next()
+            return ('sys', choices)
+        return ('goto', token)
+
+
+def _rpg_expression(sexpr: Any, symbols: Dict[str, sp.Symbol]) -> sp.Basic:
+    if isinstance(sexpr, str):
+        if sexpr in symbols:
+            return symbols[sexpr]
+        if sexpr in ('true', 'false'):
+            return sp.true if sexpr == 'true' else sp.false
+        return sp.Rational(sexpr)
+    operator, *arguments = sexpr
+    if operator not in _RPG_OPERATORS:
+        raise ValueError(f'Unsupported operator {operator!r} in .rpg file')
+    return _RPG_OPERATORS[operator](*[_rpg_expression(a, symbols) for a in arguments])
+
+
+def _rpg_paths(term: Any, guard: sp.Basic, symbols: Dict[str, sp.Symbol]) -> List[Tuple[sp.Basic, Any]]:
+    """
+    Flatten the if-then-else structure of a transition into (guard, outcome)
+    pairs, where the outcome is either a location or a list of system choices.
+    """
+    if term[0] == 'if':
+        condition = _rpg_expression(term[1], symbols)
+        return (_rpg_paths(term[2], sp.And(guard, condition), symbols)
+                + _rpg_paths(term[3], sp.And(guard, sp.Not(condition)), symbols))
+    if term[0] == 'sys':
+        choices = [({symbols[var]: _rpg_expression(value, symbols) for var, value in assignments}, location)
+                   for assignments, location in term[1]]
+        return [(guard, choices)]
+    return [(guard, term[1])]
+
+
+def read_rpg(file_path: str, degree: int = 1) -> GameSpec:
+    """
+    Convert an rpgsolve game into a game specification.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the .rpg file.
+    degree : int
+        The degree of the ranking function and update templates.
+
+    Returns
+    -------
+    GameSpec
+        The game specification, with the initial states of the game.
+    """
+    with open(file_path) as f:
+        reader = _RpgReader(f.read())
+
+    inputs: List[sp.Symbol] = []
+    outputs: List[sp.Symbol] = []
+    location_values: Dict[str, str] = {}
+    transitions: Dict[str, Any] = {}
+    init = None
+    while not reader.done():
+        keyword = reader.next()
+        if keyword in ('input', 'output'):
+            var = sp.Symbol(reader.next())
+            reader.next()
+            (inputs if keyword == 'input' else outputs).append(var)
+        elif keyword == 'type':
+            game_type = reader.next()
+            if game_type != 'Safety':
+                raise ValueError(f'Unsupported .rpg game type {game_type!r}')
+        elif keyword == 'loc':
+            location = reader.next()
+            location_values[location] = reader.next()
+        elif keyword == 'init':
+            init = reader.next()
+        elif keyword == 'trans':
+            location = reader.next()
+            transitions[location] = reader.term()
+        else:
+            raise ValueError(f'Unexpected token {keyword!r} in .rpg file')
+
+    symbols = {v.name: v for v in inputs + outputs}
+    paths = {location: _rpg_paths(term, sp.true, symbols) for location, term in transitions.items()}
+
+    def is_sink(location: str) -> bool:
+        return paths.get(location) in (None, [(sp.true, location)])
+
+    def moves(location: str) -> Tuple[List[sp.Basic], List[sp.Basic], list]:
+        """Split the paths of a location into safe sinks, unsafe sinks and system moves."""
+        safe, unsafe, choices = [], [], []
+        for guard, outcome in paths[location]:
+            if isinstance(outcome, list):
+                choices.append((guard, outcome))
+            elif is_sink(outcome):
+                (unsafe if location_values[outcome] == '0' else safe).append(guard)
+            else:
+                raise ValueError(f'Unsupported transition from {location} to {outcome} in .rpg file')
+        if len(choices) != 1:
+            raise ValueError(f'Location {location} must have exactly one system move in .rpg file')
+        return safe, unsafe, choices[0]
+
+    # The initial location assigns the initial values and moves to the reach player
+    _, _, (_, initial) = moves(init)
+    if len(initial) != 1:
+        raise ValueError('The initial location must have a single successor in .rpg file')
+    initial_values, reach_location = initial[0]
+
+    # The reach player chooses inputs; choices leading to a safe sink are forbidden
+    safe, unsafe, (reach_guard, reach_choices) = moves(reach_location)
+    if unsafe or len(reach_choices) != 1:
+        raise ValueError(f'Unsupported reach player location {reach_location} in .rpg file')
+    reach_assignments, safety_location = reach_choices[0]
+    # Express every input by the updated value of the output it is added to
+    input_values: Dict[sp.Symbol, sp.Basic] = {}
+    for var, value in reach_assignments.items():
+        difference = sp.expand(value - var)
+        if difference in inputs and difference not in input_values:
+            input_values[difference] = _primed(var) - var
+    if set(inputs) - set(input_values):
+        raise ValueError(f'Every input must be added to exactly one output in location {reach_location}')
+    reach_constraint = to_nnf(reach_guard.xreplace(input_values))
+
+    # The safety player chooses an update, unless the goal is reached
+    safe, unsafe, (safety_guard, safety_choices) = moves(safety_location)
+    if safe or any(location != reach_location for _, location in safety_choices):
+        raise ValueError(f'Unsupported safety player location {safety_location} in .rpg file')
+    goal = sp.Or(*unsafe)
+
+    data = _default_spec(Path(file_path).stem, outputs, degree)
+    data.update({
+        'invariants': [],
+        'safety_updates': [{var.name: str(value) for var, value in update.items()} for update, _ in safety_choices],
+        'reach_update_constraints': [str(reach_constraint)],
+        'goal': str(goal),
+        'initial_states': str(sp.And(*[sp.Eq(var, value) for var, value in initial_values.items()])),
+    })
+    return GameSpec(data)
+
+
+# gensys
+
+class _EqualityToCall(ast.NodeTransformer):
+    """
+    Rewrite `a == b` and `a != b` to `Eq(a, b)` and `Ne(a, b)`, since sympy
+    compares expressions structurally.
+    """
+
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        self.generic_visit(node)
+        if len(node.ops) == 1 and isinstance(node.ops[0], (ast.Eq, ast.NotEq)):
+            function = 'Eq' if isinstance(node.ops[0], ast.Eq) else 'Ne'
+            call = ast.Call(ast.Name(function, ast.Load()), [node.left, node.comparators[0]], [])
+            return ast.copy_location(call, node)
+        return node
+
+
+# The node types allowed in the expressions of a gensys file, calls are checked separately
+_GENSYS_NODES = (ast.Expression, ast.Name, ast.Load, ast.Constant, ast.BinOp, ast.UnaryOp, ast.BoolOp,
+                 ast.Compare, ast.Call, ast.Tuple, ast.List, ast.operator, ast.unaryop, ast.boolop, ast.cmpop)
+
+
+def _is_safe_expression(node: ast.AST, functions: Set[str]) -> bool:
+    """
+    Check that an expression only consists of arithmetic, comparisons,
+    numbers and calls of the given functions by name.
+    """
+    for child in ast.walk(node):
+        if not isinstance(child, _GENSYS_NODES):
+            return False
+        if isinstance(child, ast.Call) and (not isinstance(child.func, ast.Name) or child.func.id not in functions
+                                            or child.keywords):
+            return False
+        if isinstance(child, ast.Constant) and not isinstance(child.value, (int, float, bool)):
+            return False
+    return True
+
+
+def _is_safe_function(node: ast.FunctionDef, functions: Set[str]) -> bool:
+    """
+    Check that a function of a gensys file only returns a safe expression of
+    its positional arguments.
+    """
+    arguments = node.args
+    if (node.decorator_list or arguments.vararg or arguments.kwarg or arguments.kwonlyargs
+            or arguments.defaults or arguments.posonlyargs):
+        return False
+    body = node.body
+    # A docstring is allowed before the return statement
+    if len(body) == 2 and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+        body = body[1:]
+    return (len(body) == 1 and isinstance(body[0], ast.Return) and body[0].value is not None
+            and _is_safe_expression(body[0].value, functions))
+
+
+def _gensys_environment(path: str) -> Tuple[Dict[str, Any], ast.Call]:
+    """
+    Evaluate the constants and functions of a gensys file on sympy and find
+    the call of the reachability fixpoint engine. Statements that are not
+    safe expressions, e.g. imports or `sys.argv[1]`, are skipped, and nothing
+    is evaluated with builtins.
+    """
+    with open(path) as f:
+        module = _EqualityToCall().visit(ast.parse(f.read(), path))
+
+    # Functions may be defined at the top level or in the branches of the `simple` specification
+    statements = []
+    for statement in module.body:
+        statements.append(statement)
+        if isinstance(statement, ast.If):
+            statements.extend(statement.body)
+
+    namespace: Dict[str, Any] = {'__builtins__': {}, 'And': sp.And, 'Or': sp.Or, 'Not': sp.Not,
+                                 'Implies': sp.Implies, 'Eq': sp.Eq, 'Ne': sp.Ne}
+    functions = set(namespace) - {'__builtins__'}
+    functions |= {statement.name for statement in statements if isinstance(statement, ast.FunctionDef)}
+    fixpoint = None
+    for statement in statements:
+        if isinstance(statement, ast.FunctionDef) and statement.name not in namespace:
+            if not _is_safe_function(statement, functions):
+                continue
+            code = ast.fix_missing_locations(ast.Module([statement], []))
+            exec(compile(code, path, 'exec'), namespace)
+        elif isinstance(statement, ast.Assign):
+            if not _is_safe_expression(statement.value, functions):
+                # E.g. `spec_type = sys.argv[1]` or `game_type = "Real"`
+                continue
+            try:
+                value = eval(compile(ast.Expression(statement.value), path, 'eval'), namespace)
+            except Exception:
+                continue
+            for target in statement.targets:
+                if isinstance(target, ast.Name):
+                    namespace[target.id] = value
+        elif (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call)
+              and getattr(statement.value.func, 'id', None) == 'reachability_fixedpoint_gensys'):
+            fixpoint = statement.value
+    if fixpoint is None:
+        raise ValueError(f'No call of reachability_fixedpoint_gensys found in {path}')
+    return namespace, fixpoint
+
+
+def _gensys_safety_updates(moves: sp.Basic,
+                           game_variables: List[sp.Symbol],
+                           primed: List[sp.Symbol],
+                           ) -> Tuple[List[Dict[sp.Symbol, sp.Basic]], List[sp.Symbol], List[sp.Basic]]:
+    """
+    Convert the moves of the environment into safety updates. Variables whose
+    new value is not fixed by an equation become auxiliary variables, bounded
+    by the remaining constraints of the move.
+    """
+    updates, aux_vars, bounds = [], [], []
+    for move in sp.Or.make_args(moves):
+        update: Dict[sp.Symbol, sp.Basic] = {}
+        constraints = []
+        for atom in sp.And.make_args(move):
+            if (isinstance(atom, sp.Eq) and atom.lhs in primed and atom.lhs not in update
+                    and not atom.rhs.free_symbols & set(primed)):
+                update[atom.lhs] = atom.rhs
+            else:
+                constraints.append(atom)
+        undetermined = [p for p in primed if p not in update]
+        if undetermined:
+            if aux_vars:
+                raise ValueError('At most one non-deterministic environment move is supported')
+            aux = {p: sp.Symbol(f'{var.name}_env') for var, p in zip(game_variables, primed)}
+            aux_vars = [aux[p] for p in undetermined]
+            update.update({p: aux[p] for p in undetermined})
+            bounds = [c.xreplace(aux) for c in constraints]
+        elif constraints:
+            raise ValueError(f'Unsupported environment move {move}')
+        updates.append({var: update[p] for var, p in zip(game_variables, primed) if update[p] != var})
+    return updates, aux_vars, bounds
+
+
+def read_gensys(file_path: str, degree: int = 1) -> GameSpec:
+    """
+    Convert a gensys reachability game into a game specification.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the gensys .py file.
+    degree : int
+        The degree of the ranking function and update templates.
+
+    Returns
+    -------
+    GameSpec
+        The game specification, with the initial states of the game.
+    """
+    namespace, fixpoint = _gensys_environment(file_path)
+    controller, environment, guarantee = fixpoint.args[:3]
+    init = fixpoint.args[-1]
+    names = [move.id for move in controller.elts] + [environment.id, guarantee.id, init.id]
+    missing = [name for name in names if not callable(namespace.get(name))]
+    if missing:
+        raise ValueError(f'The functions {missing} of {file_path} are missing or not plain formulas')
+    controller_moves = [namespace[move.id] for move in controller.elts]
+
+    parameters = namespace[init.id].__code__.co_varnames[:namespace[init.id].__code__.co_argcount]
+    game_variables = [sp.Symbol(name) for name in parameters]
+    primed = [_primed(var) for var in game_variables]
+
+    def rational(formula: sp.Basic) -> sp.Basic:
+        return formula.xreplace({f: sp.Rational(str(f)) for f in formula.atoms(sp.Float)})
+
+    reach_constraint = rational(sp.Or(*[move(*game_variables, *primed) for move in controller_moves]))
+    environment_moves = rational(namespace[environment.id](*game_variables, *primed))
+    safety_updates, aux_vars, bounds = _gensys_safety_updates(environment_moves, game_variables, primed)
+
+    data = _default_spec(Path(file_path).stem, game_variables, degree)
+    data.update({
+        'invariants': [],
+        'safety_updates': [{var.name: str(value) for var, value in update.items()} for update in safety_updates],
+        'reach_update_constraints': [str(reach_constraint)],
+        'goal': str(rational(namespace[guarantee.id](*game_variables))),
+        'initial_states': str(rational(namespace[init.id](*game_variables))),
+    })
+    if aux_vars:
+        data['non_det_aux_vars'] = [v.name for v in aux_vars]
+        data['non_det_bounds'] = [str(bound) for bound in bounds]
+        data['use_target_not_reached'] = True
+    return GameSpec(data)
+
+
+def import_game(file_path: str, degree: int = 1, infer: Optional[str] = None) -> GameSpec:
+    """
+    Convert a game in rpgsolve or gensys format into a game specification.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the .rpg or gensys .py file.
+    degree : int
+        The degree of the ranking function and update templates.
+    infer : Optional[str]
+        The abstract domain used to infer the invariants from the initial
+        states, e.g. 'interval', or None to leave the invariants empty.
+
+    Returns
+    -------
+    GameSpec
+        The game specification.
+    """
+    if str(file_path).endswith('.rpg'):
+        spec = read_rpg(file_path, degree)
+    elif str(file_path).endswith('.py'):
+        spec = read_gensys(file_path, degree)
+    else:
+        raise ValueError(f'Unknown game format of {file_path}')
+    if infer is not None:
+        spec = spec.with_inferred_invariants(infer)
+    return spec
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Convert rpgsolve and gensys games into game specifications.")
+    parser.add_argument('games', nargs='+', help='Paths to .rpg or gensys .py files.')
+    parser.add_argument('-o', '--output', help='Directory to write the JSON specifications to.')
+    parser.add_argument('-d', '--degree', type=int, default=1, help='Degree of the templates.')
+    parser.add_argument('--domain', default='none', help='Domain for invariant inference, e.g. "interval", or "none".')
+    parser.add_argument('--solve', action='store_true', help='Solve every imported game.')
+    parser.add_argument('-r', '--repeat', type=int, default=10, help='Number of solver runs.')
+    args = parser.parse_args()
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    specs = []
+    for game in args.games:
+        spec = import_game(game, args.degree, None if args.domain == 'none' else args.domain)
+        print(f"Imported {game} as {spec.name}")
+        if args.output:
+            spec.dump(os.path.join(args.output, f'{spec.name}.json'))
+        specs.append(spec)
+    if args.solve:
+        # Solve the cheapest games first, each with a timeout from its estimated cost
+        run_batch(specs, repeat=args.repeat)
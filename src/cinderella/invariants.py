@@ -0,0 +1,263 @@
+"""
+This module infers invariants of a game by abstract interpretation.
+
+The analysis iterates the safety updates and the reach update constraints of
+a game from its initial states in a template polyhedra domain. Each abstract
+state is a vector of upper bounds h for a fixed direction matrix D, i.e. the
+polyhedron D @ x <= h. Interval and octagon domains are obtained from the
+standard direction sets, and the 'polyhedra' domain additionally uses the
+normals of every linear constraint that occurs in the game. Post-images are
+computed with one small LP per direction.
+"""
+from itertools import combinations
+from typing import Callable, Optional, Union
+
+import numpy as np
+import sympy as sp
+
+from cinderella.lp import TOLERANCE, linear_form, linear_rows, linprog_many
+from cinderella.normal_form import to_nnf
+
+
+def infer_invariants(game_variables: list[sp.Symbol],
+                     initial_states: sp.Basic,
+                     reach_update_constraints: list[Callable],
+                     safety_updates: list[dict[sp.Symbol, sp.Basic]],
+                     goal: sp.Basic,
+                     game_variable_invariants: list[sp.Basic] = [],
+                     non_det_aux_vars: list[sp.Symbol] = [],
+                     non_det_bounds: list[sp.Basic] = [],
+                     domain: str = 'interval',
+                     widening_delay: int = 3,
+                     narrowing_steps: int = 2,
+                     max_iterations: int = 100) -> list[sp.Basic]:
+    """
+    Infer linear invariants of the game states before and after each safety
+    move.
+
+    The analysis computes an over-approximation of the states from which a
+    safety move is played: the initial states and every state that results
+    from a safety update followed by a reach update that satisfies the reach
+    update constraints and does not reach the goal. The images of these
+    states under the safety updates are joined into the result, since
+    `construct_constraints` also assumes the invariants after the safety
+    move. The returned constraints can be conjoined into the game variable
+    invariants before constructing the constraint system. Only constraints
+    that are strictly tighter than the given invariants are returned.
+
+    Parameters
+    ----------
+    game_variables : list[sp.Symbol]
+        The variables of the game.
+    initial_states : sp.Basic
+        A formula over the game variables describing the initial states.
+    reach_update_constraints : list[Callable]
+        The constraints over the updated variables, as passed to
+        `construct_constraints`.
+    safety_updates : list[dict[sp.Symbol, sp.Basic]]
+        The updates of the safety player.
+    goal : sp.Basic
+        The goal of the reach player.
+    game_variable_invariants : list[sp.Basic]
+        The invariants given for the game variables.
+    non_det_aux_vars : list[sp.Symbol]
+        The auxiliary variables for non-deterministic safety updates.
+    non_det_bounds : list[sp.Basic]
+        The bounds of the auxiliary variables.
+    domain : str
+        The abstract domain: 'interval', 'octagon' or 'polyhedra'.
+    widening_delay : int
+        The number of iterations before widening is applied.
+    narrowing_steps : int
+        The number of descending iterations after the fixpoint is reached.
+    max_iterations : int
+        The maximal number of ascending iterations.
+
+    Returns
+    -------
+    list[sp.Basic]
+        The inferred invariants as linear inequalities over the game variables.
+    """
+    n = len(game_variables)
+    pre = [sp.Dummy(f'{v.name}_pre') for v in game_variables]
+    post = [sp.Dummy(f'{v.name}_post') for v in game_variables]
+    # LP variables: state before the safety move, state after the reach move, aux variables
+    lp_variables = pre + post + list(non_det_aux_vars)
+    to_pre = dict(zip(game_variables, pre))
+    to_post = dict(zip(game_variables, post))
+
+    invariant_atoms = _atoms(game_variable_invariants)
+    goal_negation = _atoms([sp.Not(goal)])
+    reach_atoms = _atoms([constraint(*post) for constraint in reach_update_constraints])
+
+    directions = _directions(n, domain, invariant_atoms + goal_negation + _atoms([initial_states]),
+                             game_variables)
+
+    def rows_of(atoms, substitution=None):
+        rows = []
+        for atom in atoms:
+            if substitution:
+                atom = atom.subs(substitution, simultaneous=True)
+            atom_rows = linear_rows(atom, lp_variables)
+            if atom_rows is not None:
+                rows.extend(atom_rows)
+        return rows
+
+    step_rows = (rows_of(invariant_atoms, to_pre) + rows_of(invariant_atoms, to_post)
+                 + rows_of(goal_negation, to_post) + rows_of(_atoms(non_det_bounds)))
+    update_rows = []
+    safety_rows = []
+    safety_objectives = []
+    for update in safety_updates:
+        # The state after the safety move, expressed over the state before it
+        after_safety = {var: sp.sympify(update.get(var, var)).subs(to_pre, simultaneous=True)
+                        for var in game_variables}
+        update_rows.append(rows_of(invariant_atoms + reach_atoms, after_safety))
+        safety_rows.append(rows_of(invariant_atoms, to_pre) + rows_of(invariant_atoms, after_safety)
+                           + rows_of(_atoms(non_det_bounds)))
+        forms = [linear_form(after_safety[var], lp_variables) for var in game_variables]
+        # Directions over a non-linear safety update cannot be bounded by an LP
+        safety_objectives.append(None if any(form is None for form in forms)
+                                 else (np.array([form[0] for form in forms]), np.array([form[1] for form in forms])))
+
+    pre_block = slice(0, n)
+    post_block = slice(n, 2 * n)
+
+    def maximize(rows, block, bounds=None):
+        A_ub = np.array([a for a, _ in rows]).reshape(-1, len(lp_variables))
+        b_ub = np.array([b for _, b in rows])
+        if bounds is not None:
+            finite = np.isfinite(bounds)
+            state_rows = np.zeros((finite.sum(), len(lp_variables)))
+            state_rows[:, pre_block] = directions[finite]
+            A_ub = np.vstack([A_ub, state_rows])
+            b_ub = np.concatenate([b_ub, bounds[finite]])
+        objectives = np.zeros((len(directions), len(lp_variables)))
+        objectives[:, block] = -directions
+        results = linprog_many(objectives, A_ub, b_ub)
+        if results[0].status == 'infeasible':
+            return None
+        return np.array([np.inf if lp.status == 'unbounded' else -lp.fun for lp in results])
+
+    def post_image(bounds):
+        if bounds is None:
+            return None
+        images = [maximize(step_rows + rows, post_block, bounds) for rows in update_rows]
+        return _join(*images)
+
+    def safety_image(bounds):
+        images = []
+        for rows, objective in zip(safety_rows, safety_objectives):
+            if objective is None:
+                return np.full(len(directions), np.inf)
+            # direction @ update(x) = (direction @ matrix) @ variables + direction @ offsets
+            matrix, offsets = objective
+            A_ub = np.array([a for a, _ in rows]).reshape(-1, len(lp_variables))
+            b_ub = np.array([b for _, b in rows])
+            finite = np.isfinite(bounds)
+            state_rows = np.zeros((finite.sum(), len(lp_variables)))
+            state_rows[:, pre_block] = directions[finite]
+            results = linprog_many(-directions @ matrix, np.vstack([A_ub, state_rows]),
+                                   np.concatenate([b_ub, bounds[finite]]))
+            if results[0].status == 'infeasible':
+                continue
+            images.append(np.array([np.inf if lp.status == 'unbounded' else -lp.fun for lp in results])
+                          + directions @ offsets)
+        return _join(*images)
+
+    initial = maximize(rows_of(_atoms([initial_states]) + invariant_atoms, to_pre), pre_block)
+    if initial is None:
+        return []
+
+    state = initial
+    for iteration in range(max_iterations):
+        new_state = _join(state, post_image(state))
+        if np.all(new_state <= state + _margin(state)):
+            break
+        if iteration >= widening_delay:
+            new_state = np.where(new_state > state + _margin(state), np.inf, new_state)
+        state = new_state
+    else:
+        raise RuntimeError(f'Invariant inference did not converge within {max_iterations} iterations')
+
+    for _ in range(narrowing_steps):
+        state = np.minimum(state, _join(initial, post_image(state)))
+    # The invariants are assumed before and after the safety move
+    state = _join(state, safety_image(state))
+
+    baseline = maximize(rows_of(invariant_atoms, to_pre), pre_block)
+    invariants = []
+    for direction, bound, base in zip(directions, state, baseline if baseline is not None else state):
+        if np.isfinite(bound) and bound < base - _margin(base):
+            expression = sum(sp.nsimplify(a) * v for a, v in zip(direction, game_variables) if a)
+            invariants.append(expression <= _round_up(bound))
+    return invariants
+
+
+def _atoms(formulas: list[sp.Basic]) -> list[sp.Basic]:
+    """
+    Get the conjuncts of the given formulas.
+    Negations are pushed to the atoms; disjunctions are kept as single atoms.
+    """
+    atoms = []
+    for formula in formulas:
+        formula = to_nnf(sp.sympify(formula))
+        atoms.extend(sp.And.make_args(formula))
+    return atoms
+
+
+def _directions(n: int, domain: str, atoms: list[sp.Basic],
+                variables: list[sp.Symbol]) -> np.ndarray:
+    """
+    Get the direction matrix of the given template domain.
+    """
+    directions = [sign * np.eye(n)[i] for i in range(n) for sign in (1, -1)]
+    if domain in ('octagon', 'polyhedra'):
+        for i, j in combinations(range(n), 2):
+            for si in (1, -1):
+                for sj in (1, -1):
+                    direction = np.zeros(n)
+                    direction[i], direction[j] = si, sj
+                    directions.append(direction)
+    elif domain != 'interval':
+        raise ValueError(f'Unknown abstract domain: {domain}')
+    if domain == 'polyhedra':
+        for atom in atoms:
+            if not atom.is_Relational:
+                continue
+            form = linear_form(atom.lhs - atom.rhs, variables)
+            if form is not None and np.count_nonzero(form[0]) > 2:
+                directions.extend([form[0], -form[0]])
+    unique = {tuple(d): d for d in directions}
+    return np.array(list(unique.values()))
+
+
+def _join(*states: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """
+    Join abstract states, where None is the empty state.
+    """
+    states = [s for s in states if s is not None]
+    if not states:
+        return None
+    return np.maximum.reduce(states)
+
+
+def _margin(values: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+    """
+    Get the LP tolerance relative to the magnitude of finite bounds.
+    """
+    return TOLERANCE * np.maximum(1.0, np.abs(np.where(np.isfinite(values), values, 0.0)))
+
+
+def _round_up(bound: float) -> sp.Rational:
+    """
+    Round an LP bound outward to a rational. The LP is only accurate up to a
+    relative margin, so the bound is raised by it first; a simple rational
+    between the bound and the raised bound, e.g. an exact vertex value, is
+    kept.
+    """
+    upper = sp.Rational(bound + float(_margin(bound)))
+    rational = sp.Rational(bound).limit_denominator(10**6)
+    if sp.Rational(bound) <= rational <= upper:
+        return rational
+    return sp.ceiling(upper * 10**6) / 10**6
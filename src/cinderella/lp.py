@@ -0,0 +1,487 @@
+"""
+A small dense linear programming toolkit built on NumPy.
+
+The analyses in this package only ever need to solve small LPs (a few dozen
+to a few hundred variables), so a two-phase tableau simplex is sufficient
+and avoids a dependency on an external LP solver. Its results are only
+correct up to `TOLERANCE`, so decisions that weaken a constraint system or
+accept a witness are confirmed with `exact_linprog`, which uses the rational
+simplex of sympy.
+"""
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import sympy as sp
+from sympy.solvers.simplex import InfeasibleLPError, UnboundedLPError
+from sympy.solvers.simplex import linprog as rational_linprog
+
+TOLERANCE = 1e-9
+# Smaller pivots amplify rounding errors until the tableau is infeasible
+PIVOT_TOLERANCE = 1e-7
+
+
+class LPResult(NamedTuple):
+    """
+    The result of a linear program.
+
+    Attributes
+    ----------
+    status : str
+        One of 'optimal', 'infeasible' or 'unbounded'.
+    x : Optional[np.ndarray]
+        The optimal assignment of the variables, if any.
+    fun : Optional[float]
+        The optimal objective value, if any.
+    """
+    status: str
+    x: Optional[np.ndarray]
+    fun: Optional[float]
+
+
+def linprog(c: Sequence[float],
+            A_ub: Optional[np.ndarray] = None,
+            b_ub: Optional[Sequence[float]] = None,
+            A_eq: Optional[np.ndarray] = None,
+            b_eq: Optional[Sequence[float]] = None,
+            bounds: Optional[Sequence[Tuple[Optional[float], Optional[float]]]] = None,
+            max_iterations: int = 10000) -> LPResult:
+    """
+    Minimize c @ x subject to A_ub @ x <= b_ub, A_eq @ x == b_eq and the
+    variable bounds.
+
+    Parameters
+    ----------
+    c : Sequence[float]
+        The objective coefficients.
+    A_ub : Optional[np.ndarray]
+        The inequality constraint matrix.
+    b_ub : Optional[Sequence[float]]
+        The inequality right-hand side.
+    A_eq : Optional[np.ndarray]
+        The equality constraint matrix.
+    b_eq : Optional[Sequence[float]]
+        The equality right-hand side.
+    bounds : Optional[Sequence[Tuple[Optional[float], Optional[float]]]]
+        A (lower, upper) pair per variable, None meaning unbounded.
+        Variables are free if no bounds are given.
+    max_iterations : int
+        The maximal number of pivots per simplex phase.
+
+    Returns
+    -------
+    LPResult
+        The status, optimal assignment and optimal value.
+    """
+    c = np.asarray(c, dtype=float)
+    return linprog_many(c.reshape(1, -1), A_ub, b_ub, A_eq, b_eq, bounds, max_iterations)[0]
+
+
+def linprog_many(costs: np.ndarray,
+                 A_ub: Optional[np.ndarray] = None,
+                 b_ub: Optional[Sequence[float]] = None,
+                 A_eq: Optional[np.ndarray] = None,
+                 b_eq: Optional[Sequence[float]] = None,
+                 bounds: Optional[Sequence[Tuple[Optional[float], Optional[float]]]] = None,
+                 max_iterations: int = 10000) -> List[LPResult]:
+    """
+    Minimize several objectives over the same feasible region.
+    The feasibility phase is solved once and every objective is optimized
+    starting from the resulting feasible basis.
+
+    Parameters
+    ----------
+    costs : np.ndarray
+        The objective coefficients, one objective per row.
+    A_ub, b_ub, A_eq, b_eq, bounds, max_iterations
+        As for `linprog`.
+
+    Returns
+    -------
+    List[LPResult]
+        The result for every objective.
+    """
+    costs = np.atleast_2d(np.asarray(costs, dtype=float))
+    n = costs.shape[1]
+    A_ub = np.zeros((0, n)) if A_ub is None else np.asarray(A_ub, dtype=float).reshape(-1, n)
+    b_ub = np.zeros(0) if b_ub is None else np.asarray(b_ub, dtype=float)
+    A_eq = np.zeros((0, n)) if A_eq is None else np.asarray(A_eq, dtype=float).reshape(-1, n)
+    b_eq = np.zeros(0) if b_eq is None else np.asarray(b_eq, dtype=float)
+    bounds = [(None, None)] * n if bounds is None else list(bounds)
+
+    # Rewrite every variable as x = offset + T @ y with y >= 0
+    columns, offset, extra_rows = [], np.zeros(n), []
+    for j, (lo, hi) in enumerate(bounds):
+        if lo is not None and np.isfinite(lo):
+            offset[j] = lo
+            columns.append((j, 1.0))
+            if hi is not None and np.isfinite(hi):
+                extra_rows.append((len(columns) - 1, hi - lo))
+        elif hi is not None and np.isfinite(hi):
+            offset[j] = hi
+            columns.append((j, -1.0))
+        else:
+            columns.append((j, 1.0))
+            columns.append((j, -1.0))
+    T = np.zeros((n, len(columns)))
+    for k, (j, sign) in enumerate(columns):
+        T[j, k] = sign
+
+    ub_rows = A_ub @ T
+    ub_rhs = b_ub - A_ub @ offset
+    if extra_rows:
+        bound_rows = np.zeros((len(extra_rows), len(columns)))
+        for i, (k, width) in enumerate(extra_rows):
+            bound_rows[i, k] = 1.0
+        ub_rows = np.vstack([ub_rows, bound_rows])
+        ub_rhs = np.concatenate([ub_rhs, [width for _, width in extra_rows]])
+
+    # Standard form with slack variables for the inequalities
+    m_ub, k = len(ub_rhs), len(columns)
+    A = np.zeros((m_ub + len(b_eq), k + m_ub))
+    A[:m_ub, :k] = ub_rows
+    A[:m_ub, k:] = np.eye(m_ub)
+    A[m_ub:, :k] = A_eq @ T
+    b = np.concatenate([ub_rhs, b_eq - A_eq @ offset])
+
+    feasible = _phase_one(A, b, max_iterations)
+    if feasible is None:
+        return [LPResult('infeasible', None, None)] * len(costs)
+
+    results = []
+    for c in costs:
+        cost = np.concatenate([c @ T, np.zeros(m_ub)])
+        y = _phase_two(cost, *feasible, max_iterations)
+        if y is None:
+            results.append(LPResult('unbounded', None, None))
+            continue
+        x = offset + T @ y[:k]
+        results.append(LPResult('optimal', x, float(c @ x)))
+    return results
+
+
+def exact_linprog(c: Sequence[sp.Rational],
+                  A_ub: Optional[Sequence[Sequence[sp.Rational]]] = None,
+                  b_ub: Optional[Sequence[sp.Rational]] = None) -> LPResult:
+    """
+    Minimize c @ x subject to A_ub @ x <= b_ub over free variables in exact
+    rational arithmetic. Floats are converted to the rationals they represent.
+
+    Parameters
+    ----------
+    c : Sequence[sp.Rational]
+        The objective coefficients.
+    A_ub : Optional[Sequence[Sequence[sp.Rational]]]
+        The inequality constraint matrix.
+    b_ub : Optional[Sequence[sp.Rational]]
+        The inequality right-hand side.
+
+    Returns
+    -------
+    LPResult
+        The status, optimal assignment and optimal value, the latter two
+        as sympy rationals.
+    """
+    c = [sp.Rational(v) for v in c]
+    n = len(c)
+    rows = [] if A_ub is None else [[sp.Rational(v) for v in row] for row in A_ub]
+    if not rows:
+        if any(c):
+            return LPResult('unbounded', None, None)
+        return LPResult('optimal', np.array([sp.S.Zero] * n, dtype=object), sp.S.Zero)
+    # The rational simplex keeps its variables nonnegative, so every variable is split into x = u - v
+    A = sp.Matrix([row + [-v for v in row] for row in rows])
+    b = sp.Matrix([sp.Rational(v) for v in b_ub])
+    try:
+        fun, y = rational_linprog(sp.Matrix([c + [-v for v in c]]), A, b)
+    except InfeasibleLPError:
+        return LPResult('infeasible', None, None)
+    except UnboundedLPError:
+        return LPResult('unbounded', None, None)
+    x = np.array([y[j] - y[n + j] for j in range(n)], dtype=object)
+    return LPResult('optimal', x, sp.Rational(fun))
+
+
+def _phase_one(A: np.ndarray, b: np.ndarray,
+               max_iterations: int) -> Optional[Tuple[np.ndarray, List[int]]]:
+    """
+    Find a feasible basis of A @ y == b, y >= 0 by minimizing the sum of
+    artificial variables. Returns the tableau and basis, or None if the
+    system is infeasible.
+    """
+    m, n = A.shape
+    negative = b < 0
+    A, b = A.copy(), b.copy()
+    A[negative] *= -1
+    b[negative] *= -1
+
+    # Rows with a unit column, e.g. the slack of an inequality with b >= 0, start with it in the basis
+    unit = {}
+    nonzero = A != 0
+    for column in np.nonzero(nonzero.sum(axis=0) == 1)[0]:
+        row = int(np.argmax(nonzero[:, column]))
+        if A[row, column] == 1.0 and row not in unit:
+            unit[row] = int(column)
+    artificial = [row for row in range(m) if row not in unit]
+    k = len(artificial)
+
+    tableau = np.zeros((m + 1, n + k + 1))
+    tableau[:m, :n] = A
+    tableau[artificial, n + np.arange(k)] = 1.0
+    tableau[:m, -1] = b
+    tableau[m, :n] = -A[artificial].sum(axis=0)
+    tableau[m, -1] = -b[artificial].sum()
+    basis = [0] * m
+    for row, column in unit.items():
+        basis[row] = column
+    for i, row in enumerate(artificial):
+        basis[row] = n + i
+
+    # Any basis without artificial mass is feasible, degenerate pivots beyond it are wasted
+    threshold = TOLERANCE * max(1.0, np.abs(b).max(initial=0.0))
+    _pivot_until_optimal(tableau, basis, n + k, max_iterations, target=threshold)
+    if -tableau[m, -1] > threshold:
+        return None
+
+    # Drive the remaining artificial variables out of the basis
+    for row, var in enumerate(basis):
+        if var < n:
+            continue
+        candidates = np.nonzero(np.abs(tableau[row, :n]) > PIVOT_TOLERANCE)[0]
+        if len(candidates):
+            _pivot(tableau, basis, row, candidates[0])
+
+    # Artificial variables never re-enter the basis
+    tableau[:m, n:n + k] = 0.0
+    return tableau, basis
+
+
+def _phase_two(cost: np.ndarray, tableau: np.ndarray, basis: List[int],
+               max_iterations: int) -> Optional[np.ndarray]:
+    """
+    Minimize cost @ y starting from a feasible tableau.
+    Returns the optimal assignment, or None if the problem is unbounded.
+    """
+    tableau, basis = tableau.copy(), list(basis)
+    m, n = tableau.shape[0] - 1, len(cost)
+    tableau[m, :] = 0.0
+    tableau[m, :n] = cost
+    for row, var in enumerate(basis):
+        if var < n:
+            tableau[m, :] -= cost[var] * tableau[row, :]
+    if not _pivot_until_optimal(tableau, basis, n, max_iterations):
+        return None
+
+    y = np.zeros(n)
+    for row, var in enumerate(basis):
+        if var < n:
+            y[var] = tableau[row, -1]
+    return y
+
+
+def _pivot_until_optimal(tableau: np.ndarray, basis: List[int], allowed: int,
+                         max_iterations: int, target: Optional[float] = None) -> bool:
+    """
+    Pivot on the tableau until the objective row is optimal, or the objective
+    value is at most the target. Uses Dantzig's rule and switches to Bland's
+    rule after degenerate pivots to avoid cycling. Returns False if the
+    problem is unbounded.
+    """
+    m = tableau.shape[0] - 1
+    degenerate_steps = 0
+    for _ in range(max_iterations):
+        if target is not None and -tableau[m, -1] <= target:
+            return True
+        reduced = tableau[m, :allowed]
+        if degenerate_steps > 20:
+            entering_candidates = np.nonzero(reduced < -TOLERANCE)[0]
+            if not len(entering_candidates):
+                return True
+            entering = entering_candidates[0]
+        else:
+            entering = int(np.argmin(reduced))
+            if reduced[entering] >= -TOLERANCE:
+                return True
+
+        column = tableau[:m, entering]
+        positive = column > PIVOT_TOLERANCE
+        if not positive.any():
+            return False
+        ratios = np.full(m, np.inf)
+        ratios[positive] = tableau[:m, -1][positive] / column[positive]
+        best = ratios.min()
+        ties = np.nonzero(ratios <= best + TOLERANCE)[0]
+        leaving = min(ties, key=lambda row: basis[row])
+
+        degenerate_steps = degenerate_steps + 1 if best <= TOLERANCE else 0
+        _pivot(tableau, basis, leaving, entering)
+    raise RuntimeError(f'Simplex did not converge within {max_iterations} iterations')
+
+
+def _pivot(tableau: np.ndarray, basis: List[int], row: int, column: int) -> None:
+    """
+    Pivot the tableau on the given entry.
+    """
+    tableau[row, :] /= tableau[row, column]
+    factors = tableau[:, column].copy()
+    factors[row] = 0.0
+    tableau -= np.outer(factors, tableau[row, :])
+    basis[row] = column
+
+
+def linear_form(expr: sp.Basic, variables: List[sp.Symbol],
+                exact: bool = False) -> Optional[Tuple[np.ndarray, float]]:
+    """
+    Decompose an expression into a @ variables + constant.
+
+    Parameters
+    ----------
+    expr : sp.Basic
+        The expression to be decomposed.
+    variables : List[sp.Symbol]
+        The variables of the linear form.
+    exact : bool
+        Whether to keep the coefficients as sympy rationals, in an object
+        array, instead of converting them to floats.
+
+    Returns
+    -------
+    Optional[Tuple[np.ndarray, float]]
+        The coefficient vector and the constant, or None if the expression is
+        not affine in the variables with numeric coefficients.
+    """
+    number = sp.Rational if exact else float
+    index = {v: i for i, v in enumerate(variables)}
+    coefficients = np.array([number(0)] * len(variables), dtype=object if exact else float)
+    constant = number(0)
+    for term, coefficient in sp.expand(sp.sympify(expr)).as_coefficients_dict().items():
+        if not coefficient.is_Number:
+            return None
+        if term == 1:
+            constant += number(coefficient)
+        elif term in index:
+            coefficients[index[term]] += number(coefficient)
+        else:
+            return None
+    return coefficients, constant
+
+
+def linear_rows(atom: sp.Basic, variables: List[sp.Symbol],
+                exact: bool = False) -> Optional[List[Tuple[np.ndarray, float]]]:
+    """
+    Convert a relational atom into rows a @ variables <= b.
+    Strict inequalities are relaxed to their closure.
+
+    Parameters
+    ----------
+    atom : sp.Basic
+        The relational atom.
+    variables : List[sp.Symbol]
+        The variables of the rows.
+    exact : bool
+        Whether to keep the coefficients as sympy rationals.
+
+    Returns
+    -------
+    Optional[List[Tuple[np.ndarray, float]]]
+        The rows (a, b), or None if the atom is not a linear (in)equality with
+        numeric coefficients.
+    """
+    if atom == sp.true:
+        return []
+    if not atom.is_Relational or atom.rel_op == '!=':
+        return None
+    form = linear_form(atom.lhs - atom.rhs, variables, exact)
+    if form is None:
+        return None
+    a, constant = form
+    if atom.rel_op in ('<=', '<'):
+        return [(a, -constant)]
+    if atom.rel_op in ('>=', '>'):
+        return [(-a, constant)]
+    return [(a, -constant), (-a, constant)]
+
+
+def is_feasible(atoms: Sequence[sp.Basic], variables: List[sp.Symbol], ignore_nonlinear: bool = False,
+                exact: bool = False) -> Optional[bool]:
+    """
+    Check whether a conjunction of linear atoms is feasible, taking strict
+    inequalities into account.
+
+    Parameters
+    ----------
+    atoms : Sequence[sp.Basic]
+        The relational atoms of the conjunction.
+    variables : List[sp.Symbol]
+        The variables of the atoms.
+    ignore_nonlinear : bool
+        Whether to ignore atoms that are not linear, so that the check may
+        only err on the side of feasibility.
+    exact : bool
+        Whether to decide the check in exact rational arithmetic instead of
+        up to `TOLERANCE`.
+
+    Returns
+    -------
+    Optional[bool]
+        Whether the conjunction is feasible, or None if an atom is not linear
+        and not ignored.
+    """
+    rows = []
+    strict = []
+    for atom in atoms:
+        atom_rows = linear_rows(atom, variables, exact)
+        if atom_rows is None:
+            if ignore_nonlinear:
+                continue
+            return None
+        rows.extend(atom_rows)
+        strict.extend([atom.rel_op in ('<', '>')] * len(atom_rows))
+    if not rows:
+        return True
+
+    if exact:
+        # The same LP with the slack bound as a row, a feasible strict region has a positive slack
+        A_ub = [list(a) + [int(s)] for (a, _), s in zip(rows, strict)] + [[0] * len(variables) + [1]]
+        b_ub = [b for _, b in rows] + [1]
+        lp = exact_linprog([0] * len(variables) + [-1], A_ub, b_ub)
+        if lp.status == 'infeasible':
+            return False
+        return not any(strict) or bool(-lp.fun > 0)
+
+    # Maximize a slack t <= 1 that every strict row has to satisfy with a @ x + t <= b
+    A_ub = np.hstack([np.array([a for a, _ in rows]).reshape(len(rows), len(variables)),
+                      np.array(strict, dtype=float).reshape(-1, 1)])
+    b_ub = np.array([b for _, b in rows])
+    c = np.zeros(len(variables) + 1)
+    c[-1] = -1
+    bounds = [(None, None)] * len(variables) + [(None, 1)]
+    lp = linprog(c, A_ub, b_ub, bounds=bounds)
+    if lp.status == 'infeasible':
+        return False
+    return not any(strict) or -lp.fun > TOLERANCE
+
+
+def is_infeasible(atoms: Sequence[sp.Basic], variables: List[sp.Symbol], ignore_nonlinear: bool = False) -> bool:
+    """
+    Check whether a conjunction of linear atoms is provably infeasible.
+    The floating point LP screens the atoms and an infeasible result is
+    confirmed in exact arithmetic, so that formulas are only dropped as
+    vacuous if they are.
+
+    Parameters
+    ----------
+    atoms : Sequence[sp.Basic]
+        The relational atoms of the conjunction.
+    variables : List[sp.Symbol]
+        The variables of the atoms.
+    ignore_nonlinear : bool
+        Whether to ignore atoms that are not linear.
+
+    Returns
+    -------
+    bool
+        True if the conjunction is infeasible, False if it is feasible or
+        the check is inconclusive.
+    """
+    return (is_feasible(atoms, variables, ignore_nonlinear) is False
+            and is_feasible(atoms, variables, ignore_nonlinear, exact=True) is False)
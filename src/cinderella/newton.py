@@ -0,0 +1,240 @@
+"""
+This module prunes template monomials that cannot occur in any certificate
+of the Positivstellensatz used by PolyQEnt.
+
+For a constraint pair, every conclusion atom p >= 0 (or > 0, == 0) has to be
+written as a combination of products of the hypotheses g_i >= 0. A monomial of
+p can only have a non-zero coefficient if it lies in the Newton polytope of
+the monomials of these products, i.e. the convex hull of the Minkowski sums
+of the supports of the hypotheses (Handelman, Farkas for degree 1), or the
+monomials up to the degree bound of the multipliers (Putinar). If the
+coefficient of a monomial outside the polytope is a single template unknown,
+that unknown is zero in every certificate and is removed from the system.
+The floating point LPs only propose such unknowns: an unknown is removed
+once an exact LP confirms that its hypotheses are feasible and a rational
+hyperplane separates its monomial from the polytope.
+"""
+import json
+from fractions import Fraction
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import sympy as sp
+
+from cinderella import CONFIGS_DIR
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.lp import is_feasible, linear_rows, linprog
+from cinderella.normal_form import dnf_size, dnf_terms, to_nnf
+from cinderella.template import get_monomial_exponents
+
+MAX_DISJUNCTS = 64
+
+_Support = Set[Tuple[int, ...]]
+
+
+def prune_monomials(cs: ConstraintSystem,
+                    theorem: str = 'handelman',
+                    degree: int = 2,
+                    max_rounds: int = 10) -> Tuple[ConstraintSystem, Dict[sp.Symbol, int]]:
+    """
+    Remove the template unknowns whose monomials lie outside the Newton
+    polytope of every certificate. Removing unknowns can shrink the supports
+    of the hypotheses, so the analysis is repeated until nothing changes.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    theorem : str
+        The Positivstellensatz: 'farkas', 'handelman' or 'putinar'.
+    degree : int
+        The degree of the certificates, see `degree_of_sat` in the configs.
+    max_rounds : int
+        The maximal number of pruning rounds.
+
+    Returns
+    -------
+    Tuple[ConstraintSystem, Dict[sp.Symbol, int]]
+        The pruned constraint system and the unknowns that were set to zero.
+        The zeros have to be added to the model to recover the witness.
+    """
+    if theorem == 'farkas':
+        theorem, degree = 'handelman', 1
+    zeros: Dict[sp.Symbol, int] = {}
+    for _ in range(max_rounds):
+        forced: Set[sp.Symbol] = set()
+        for pair in cs.constraint_pairs:
+            forced |= forced_zeros(pair, theorem, degree)
+        if not forced:
+            break
+        substitution = {unknown: 0 for unknown in forced}
+        zeros.update(substitution)
+        cs = cs.instantiate(substitution)
+    return cs, zeros
+
+
+def prune_for_config(cs: ConstraintSystem, config: str = 'handelman-z3.json') -> Tuple[ConstraintSystem, Dict[sp.Symbol, int]]:
+    """
+    Prune the template monomials for the certificates of a PolyQEnt config.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    config : str
+        The name of the config file in the configs directory.
+
+    Returns
+    -------
+    Tuple[ConstraintSystem, Dict[sp.Symbol, int]]
+        The pruned constraint system and the unknowns that were set to zero.
+    """
+    with open(CONFIGS_DIR / config) as f:
+        settings = json.load(f)
+    return prune_monomials(cs, settings['theorem_name'], settings['degree_of_sat'])
+
+
+def forced_zeros(pair: ConstraintPair, theorem: str = 'handelman', degree: int = 2) -> Set[sp.Symbol]:
+    """
+    Get the template unknowns of a constraint pair that are zero in every
+    certificate of the pair.
+
+    Parameters
+    ----------
+    pair : ConstraintPair
+        The constraint pair.
+    theorem : str
+        The Positivstellensatz: 'handelman' or 'putinar'.
+    degree : int
+        The degree of the certificates.
+
+    Returns
+    -------
+    Set[sp.Symbol]
+        The unknowns that have to be zero.
+    """
+    variables = list(pair.forall_vars)
+    implication = to_nnf(pair.implication.formula)
+    if isinstance(implication, sp.Or):
+        return set()
+    conclusions = []
+    for atom in sp.And.make_args(implication):
+        if atom == sp.true:
+            continue
+        if not atom.is_Relational or atom.rel_op == '!=':
+            return set()
+        terms = _terms(atom.lhs - atom.rhs, variables)
+        if terms is None:
+            return set()
+        conclusions.append(terms)
+
+    condition = to_nnf(pair.condition.formula)
+    if dnf_size(condition) > MAX_DISJUNCTS:
+        return set()
+
+    forced: Set[sp.Symbol] = set()
+    for disjunct in dnf_terms(condition):
+        support = _certificate_support(tuple(disjunct), variables, theorem, degree)
+        if support is None:
+            continue
+        points = np.array(sorted(support), dtype=float)
+        candidates = [(monomial, unknown) for terms in conclusions for monomial, unknown in terms.items()
+                      if unknown is not None and unknown not in forced and monomial not in support
+                      and not _in_hull(monomial, points)]
+        # Only feasible hypotheses need a certificate, and rounding must not put a monomial outside the hull
+        if candidates and is_feasible(list(disjunct), variables, exact=True):
+            forced |= {unknown for monomial, unknown in candidates if _separated(monomial, points)}
+    return forced
+
+
+def _terms(expr: sp.Basic, variables: List[sp.Symbol]) -> Optional[Dict[Tuple[int, ...], Optional[sp.Symbol]]]:
+    """
+    Get the monomials of an expression as a polynomial in the variables.
+    Every monomial is mapped to u if its coefficient is c * u for a number c
+    and a single unknown u, and to None otherwise. Returns None if the
+    expression is not a polynomial.
+    """
+    unknowns = sorted(expr.free_symbols - set(variables), key=str)
+    # Sparse polynomial arithmetic is much faster than expanding with sympy
+    ring = sp.ring(list(variables) + unknowns, sp.QQ)[0]
+    try:
+        polynomial = ring.from_expr(expr)
+    except (ValueError, sp.polys.polyerrors.CoercionFailed):
+        return None
+    n = len(variables)
+    terms: Dict[Tuple[int, ...], Optional[sp.Symbol]] = {}
+    for monomial, _ in polynomial.terms():
+        key, rest = monomial[:n], monomial[n:]
+        single = sum(rest) == 1 and key not in terms
+        terms[key] = unknowns[rest.index(1)] if single else None
+    return terms
+
+
+def _certificate_support(hypotheses: Tuple[sp.Basic, ...], variables: List[sp.Symbol],
+                         theorem: str, degree: int) -> Optional[_Support]:
+    """
+    Get the monomials that can occur in a certificate over the hypotheses.
+    Returns None if the hypotheses are not understood or their feasibility
+    cannot be established, since infeasible hypotheses are certified
+    differently.
+    """
+    supports = []
+    rows = []
+    for atom in hypotheses:
+        if atom == sp.true:
+            continue
+        if not atom.is_Relational or atom.rel_op == '!=':
+            return None
+        terms = _terms(atom.lhs - atom.rhs, variables)
+        atom_rows = linear_rows(atom, variables)
+        if terms is None or atom_rows is None:
+            return None
+        supports.append(set(terms))
+        rows.extend(atom_rows)
+
+    if rows:
+        A_ub = np.array([a for a, _ in rows])
+        if linprog(np.zeros(len(variables)), A_ub, np.array([b for _, b in rows])).status == 'infeasible':
+            return None
+
+    zero = (0,) * len(variables)
+    if theorem == 'putinar':
+        bound = degree + max([max(map(sum, s)) for s in supports], default=0)
+        return {tuple(e) for e in get_monomial_exponents(len(variables), bound).tolist()}
+    if theorem != 'handelman':
+        raise ValueError(f'Unknown theorem {theorem}')
+
+    generators = set().union(*supports) if supports else set()
+    support, level = {zero}, {zero}
+    for _ in range(degree):
+        level = {tuple(a + b for a, b in zip(x, y)) for x in level for y in generators}
+        support |= level
+    return support
+
+
+def _in_hull(point: Tuple[int, ...], points: np.ndarray) -> bool:
+    """
+    Check whether a point lies in the convex hull of the given points.
+    """
+    k = len(points)
+    A_eq = np.vstack([points.T, np.ones((1, k))])
+    b_eq = np.concatenate([np.array(point, dtype=float), [1.0]])
+    return linprog(np.zeros(k), A_eq=A_eq, b_eq=b_eq, bounds=[(0, None)] * k).status != 'infeasible'
+
+
+def _separated(point: Tuple[int, ...], points: np.ndarray, max_denominator: int = 10 ** 6) -> bool:
+    """
+    Check whether a point lies outside the convex hull of the given points.
+    A separating hyperplane is found with an LP, rounded to rationals and
+    checked in exact arithmetic, so False only means no proof was found.
+    """
+    n = points.shape[1]
+    # Maximize w @ point - c subject to w @ p <= c for all points, with w in the unit box
+    cost = np.concatenate([-np.array(point, dtype=float), [1.0]])
+    A_ub = np.hstack([points, -np.ones((len(points), 1))])
+    result = linprog(cost, A_ub, np.zeros(len(points)), bounds=[(-1, 1)] * n + [(None, None)])
+    if result.status != 'optimal':
+        return False
+    w = [Fraction(v).limit_denominator(max_denominator) for v in result.x[:n]]
+    value = sum(a * e for a, e in zip(w, point))
+    return all(sum(a * int(e) for a, e in zip(w, p)) < value for p in points)
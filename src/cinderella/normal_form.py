@@ -0,0 +1,133 @@
+"""
+This module normalizes boolean combinations of polynomial (in)equalities.
+
+sympy's `simplify` and `to_nnf` are general-purpose and slow on the formulas
+built by `construct_constraints`. The normal forms here only push negations
+into the relations, flip them and flatten And/Or. Every subformula is
+normalized at most once per polarity, so the running time is linear in the
+size of the formula DAG.
+"""
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import sympy as sp
+
+_NEGATED_RELATIONS = {
+    '>=': sp.StrictLessThan,
+    '>': sp.LessThan,
+    '<=': sp.StrictGreaterThan,
+    '<': sp.GreaterThan,
+    '==': sp.Unequality,
+    '!=': sp.Equality,
+}
+
+
+def to_nnf(formula: sp.Basic, memo: Optional[Dict[Tuple[sp.Basic, bool], sp.Basic]] = None) -> sp.Basic:
+    """
+    Convert a formula to negation normal form: negations of relations are
+    flipped, Implies and Equivalent are expanded and nested And/Or are
+    flattened. Relations that sympy can decide are folded into true or false.
+
+    Parameters
+    ----------
+    formula : sp.Basic
+        The formula.
+    memo : Optional[Dict[Tuple[sp.Basic, bool], sp.Basic]]
+        The normal forms of already normalized subformulas, keyed by the
+        subformula and whether it is negated. Can be shared between calls.
+
+    Returns
+    -------
+    sp.Basic
+        The formula in negation normal form.
+    """
+    return _nnf(sp.sympify(formula), False, {} if memo is None else memo)
+
+
+def _nnf(formula: sp.Basic, negated: bool, memo: Dict[Tuple[sp.Basic, bool], sp.Basic]) -> sp.Basic:
+    key = (formula, negated)
+    if key in memo:
+        return memo[key]
+
+    if formula.is_Relational:
+        result = _NEGATED_RELATIONS[formula.rel_op](formula.lhs, formula.rhs) if negated else formula
+    elif formula == sp.true or formula == sp.false:
+        result = sp.sympify(bool(formula) != negated)
+    elif isinstance(formula, sp.Not):
+        result = _nnf(formula.args[0], not negated, memo)
+    elif isinstance(formula, (sp.And, sp.Or)):
+        # De Morgan swaps the connective under a negation
+        connective = (sp.Or if isinstance(formula, sp.And) else sp.And) if negated else formula.func
+        result = connective(*[_nnf(arg, negated, memo) for arg in formula.args])
+    elif isinstance(formula, sp.Implies):
+        antecedent, consequent = formula.args
+        if negated:
+            result = sp.And(_nnf(antecedent, False, memo), _nnf(consequent, True, memo))
+        else:
+            result = sp.Or(_nnf(antecedent, True, memo), _nnf(consequent, False, memo))
+    elif isinstance(formula, sp.Equivalent) and len(formula.args) == 2:
+        a, b = formula.args
+        result = sp.Or(sp.And(_nnf(a, False, memo), _nnf(b, negated, memo)),
+                       sp.And(_nnf(a, True, memo), _nnf(b, not negated, memo)))
+    elif formula.is_Boolean and not formula.is_Atom and not isinstance(formula, sp.Symbol):
+        # Rare connectives such as Xor or ITE
+        result = sp.to_nnf(sp.Not(formula) if negated else formula, simplify=False)
+    else:
+        result = sp.Not(formula) if negated else formula
+
+    memo[key] = result
+    return result
+
+
+def dnf_size(formula: sp.Basic) -> int:
+    """
+    Get the number of disjuncts of the DNF of a formula in negation normal
+    form without building it.
+
+    Parameters
+    ----------
+    formula : sp.Basic
+        The formula in negation normal form.
+
+    Returns
+    -------
+    int
+        The number of disjuncts.
+    """
+    if isinstance(formula, sp.Or):
+        return sum(dnf_size(arg) for arg in formula.args)
+    if isinstance(formula, sp.And):
+        size = 1
+        for arg in formula.args:
+            size *= dnf_size(arg)
+        return size
+    return 1
+
+
+def dnf_terms(formula: sp.Basic) -> List[FrozenSet[sp.Basic]]:
+    """
+    Get the disjuncts of the DNF of a formula in negation normal form as sets
+    of literals. Disjuncts containing false are dropped, true is the empty
+    disjunct.
+
+    Parameters
+    ----------
+    formula : sp.Basic
+        The formula in negation normal form.
+
+    Returns
+    -------
+    List[FrozenSet[sp.Basic]]
+        The disjuncts.
+    """
+    if isinstance(formula, sp.Or):
+        return [d for arg in formula.args for d in dnf_terms(arg)]
+    if isinstance(formula, sp.And):
+        disjuncts: List[FrozenSet[sp.Basic]] = [frozenset()]
+        for arg in formula.args:
+            disjuncts = [d | e for d in disjuncts for e in dnf_terms(arg)]
+        return disjuncts
+    if formula == sp.false:
+        return []
+    if formula == sp.true:
+        return [frozenset()]
+    return [frozenset([formula])]
@@ -0,0 +1,266 @@
+"""
+This module stores witnesses that are valid for a whole range of parameter
+values and instantiates them for concrete games without calling the solver.
+
+A parameter of a specification, e.g. `eps` in the Cinderella games, is lifted
+to a game variable that no player updates and whose range is added to the
+invariants, as in `cinderella_vareps`. A witness of the lifted game is a
+witness of the game for every parameter value in the range, its validity
+domain. The witness is stored with its domain and the templates it was
+solved with. A game with the same structure and parameter values inside the
+domain instantiates the stored templates at these values, maps them onto its
+own templates and only verifies the result with `check_model`.
+"""
+import json
+import os
+from argparse import ArgumentParser
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import sympy as sp
+
+from cinderella import OUT_DIR
+from cinderella.executor import execute_polyqent
+from cinderella.prefix_parser.parser import parse_expression
+from cinderella.presolve import complete_model
+from cinderella.spec import CompiledSpec, GameSpec, parse_formula, solve_spec
+from cinderella.support import structure_hash
+from cinderella.verify import check_model
+
+PARAMETRIC_DIR = OUT_DIR / "parametric"
+
+
+def lift_parameters(spec: GameSpec, domain: Dict[str, Tuple[float, float]]) -> GameSpec:
+    """
+    Lift parameters of a specification to game variables that are bounded by
+    their domain and kept unchanged by the reach player.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    domain : Dict[str, Tuple[float, float]]
+        The closed range of every lifted parameter.
+
+    Returns
+    -------
+    GameSpec
+        The lifted game specification.
+    """
+    data = spec.data
+    missing = set(domain) - set(data.get('parameters', {}))
+    if missing:
+        raise ValueError(f'Game specification {spec.name} has no parameters {sorted(missing)}')
+    templates = {key: dict(value) for key, value in data.get('templates', {}).items()}
+    updates = templates.setdefault('reach_updates', {})
+    updates['fixed'] = {**updates.get('fixed', {}), **{name: name for name in domain}}
+    return spec.replace(
+        name=f'{spec.name}_parametric',
+        game_variables=data['game_variables'] + list(domain),
+        parameters={k: v for k, v in data.get('parameters', {}).items() if k not in domain},
+        invariants=data.get('invariants', []) + [f'And({name} >= {lo}, {name} <= {hi})'
+                                                 for name, (lo, hi) in domain.items()],
+        templates=templates,
+    )
+
+
+def save_parametric_witness(spec: GameSpec, domain: Dict[str, Tuple[float, float]],
+                            compiled: CompiledSpec, model: Dict[sp.Symbol, Any]) -> None:
+    """
+    Store the witness of a lifted game with its validity domain.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The original game specification.
+    domain : Dict[str, Tuple[float, float]]
+        The range of every lifted parameter.
+    compiled : CompiledSpec
+        The compiled lifted specification.
+    model : Dict[sp.Symbol, Any]
+        The model of the witness of the lifted game.
+    """
+    coefficients = {coeff.name for coeff in compiled.registry.unknowns()}
+    values = {str(key): value for key, value in model.items()}
+    os.makedirs(PARAMETRIC_DIR, exist_ok=True)
+    with open(PARAMETRIC_DIR / f'{spec.name}.json', 'w') as f:
+        json.dump({
+            'name': spec.name,
+            'structure': structure_hash(spec),
+            'parameters': {k: v for k, v in spec.data.get('parameters', {}).items() if k not in domain},
+            'domain': {name: list(bounds) for name, bounds in domain.items()},
+            'templates': {owner: {
+                'variables': [v.name for v in block.variables],
+                'exponents': block.exponents.tolist(),
+                'coefficients': [str(values.get(coeff.name, 0)) for coeff in block.coefficients],
+            } for owner, block in compiled.registry.blocks.items()},
+            'unknowns': {key: str(value) for key, value in values.items() if key not in coefficients},
+        }, f, indent=2)
+
+
+def load_parametric_witnesses(spec: GameSpec) -> List[Dict[str, Any]]:
+    """
+    Get the stored parametric witnesses whose validity domain contains the
+    parameter values of a game with the same structure.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        The stored witnesses that cover the game.
+    """
+    if not PARAMETRIC_DIR.exists():
+        return []
+    structure = structure_hash(spec)
+    parameters = spec.data.get('parameters', {})
+    witnesses = []
+    for file_name in sorted(os.listdir(PARAMETRIC_DIR)):
+        with open(PARAMETRIC_DIR / file_name) as f:
+            witness = json.load(f)
+        if witness['structure'] != structure:
+            continue
+        fixed = {k: v for k, v in parameters.items() if k not in witness['domain']}
+        if fixed == witness['parameters'] and all(
+                name in parameters and lo <= parameters[name] <= hi for name, (lo, hi) in witness['domain'].items()):
+            witnesses.append(witness)
+    return witnesses
+
+
+def instantiate_witness(witness: Dict[str, Any], spec: GameSpec, compiled: CompiledSpec) -> Optional[Dict[sp.Symbol, Any]]:
+    """
+    Instantiate a stored parametric witness at the parameter values of a game
+    and express it in the templates of the game.
+
+    Parameters
+    ----------
+    witness : Dict[str, Any]
+        The stored parametric witness.
+    spec : GameSpec
+        The game specification.
+    compiled : CompiledSpec
+        The compiled specification.
+
+    Returns
+    -------
+    Optional[Dict[sp.Symbol, Any]]
+        The model of the game, or None if the instantiated witness does not
+        fit its templates.
+    """
+    values = {sp.Symbol(name): parse_formula(spec.data['parameters'][name], {}) for name in witness['domain']}
+    model: Dict[sp.Symbol, Any] = {sp.Symbol(key): parse_formula(value, {}) for key, value in witness['unknowns'].items()}
+    for owner, block in compiled.registry.blocks.items():
+        stored = witness['templates'].get(owner)
+        if stored is None:
+            return None
+        variables = [sp.Symbol(v) for v in stored['variables']]
+        expression = sp.Add(*[parse_formula(c, {}) * sp.Mul(*[v ** int(e) for v, e in zip(variables, exponents)])
+                              for c, exponents in zip(stored['coefficients'], stored['exponents'])])
+        terms = sp.Poly(expression.xreplace(values), *block.variables).as_dict()
+        rows = {tuple(int(e) for e in exponents): i for i, exponents in enumerate(block.exponents)}
+        if any(monomial not in rows and coefficient != 0 for monomial, coefficient in terms.items()):
+            return None
+        coefficients = np.zeros(len(block.coefficients), dtype=object)
+        for monomial, coefficient in terms.items():
+            if monomial in rows:
+                coefficients[rows[monomial]] = coefficient
+        model.update(zip(block.coefficients, coefficients))
+    return model
+
+
+def solve_parametric(spec: GameSpec, domain: Dict[str, Tuple[float, float]],
+                     use_cache: bool = True, repeat: int = 10) -> Optional[Dict[sp.Symbol, Any]]:
+    """
+    Solve a game for a whole range of parameter values and store the witness.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    domain : Dict[str, Tuple[float, float]]
+        The closed range of every lifted parameter.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    repeat : int
+        The number of solver runs.
+
+    Returns
+    -------
+    Optional[Dict[sp.Symbol, Any]]
+        The model of the witness of the lifted game, if one was found.
+    """
+    compiled = lift_parameters(spec, domain).compile(use_cache)
+    witness_path = os.path.join(OUT_DIR, f'{compiled.name}.smt2')
+    compiled.cs.write_smt2(witness_path)
+    result, model = execute_polyqent(witness_path, repeat)
+    if result != 'sat':
+        return None
+    model = complete_model({sp.Symbol(key): parse_expression(value) for key, value in model.items()},
+                           compiled.eliminated)
+    compiled.print_witness(model)
+    save_parametric_witness(spec, domain, compiled, model)
+    return model
+
+
+def solve_with_parametric(spec: GameSpec, use_cache: bool = True, repeat: int = 10) -> Optional[Dict[sp.Symbol, Any]]:
+    """
+    Solve a game by instantiating a stored parametric witness whose domain
+    contains its parameter values, and only call the solver if there is none
+    or it fails verification. The witness is printed.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    repeat : int
+        The number of solver runs.
+
+    Returns
+    -------
+    Optional[Dict[sp.Symbol, Any]]
+        The model of the witness, if one was found.
+    """
+    witnesses = load_parametric_witnesses(spec)
+    if witnesses:
+        compiled = spec.compile(use_cache)
+        for witness in witnesses:
+            model = instantiate_witness(witness, spec, compiled)
+            if model is not None and check_model(compiled.cs, model):
+                print(f"Instantiated the parametric witness of {witness['name']} for {witness['domain']}")
+                compiled.print_witness(model)
+                return model
+        print("No stored parametric witness verifies, falling back to the solver")
+    return solve_spec(spec, use_cache, repeat)
+
+
+def _parse_domain(ranges: List[str]) -> Dict[str, Tuple[float, float]]:
+    """
+    Parse parameter ranges of the form `eps=0.1:0.9`.
+    """
+    domain = {}
+    for item in ranges:
+        name, bounds = item.split('=')
+        lo, hi = bounds.split(':')
+        domain[name] = (float(lo), float(hi))
+    return domain
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Solve a game for a parameter range, or instantiate a stored witness.")
+    parser.add_argument('spec', help='Path to a TOML or JSON game specification.')
+    parser.add_argument('--domain', nargs='+', metavar='NAME=LO:HI',
+                        help='Solve for these parameter ranges and store the witness.')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the compiled-spec cache.')
+    parser.add_argument('-r', '--repeat', type=int, default=10, help='Number of solver runs.')
+    args = parser.parse_args()
+
+    if args.domain:
+        solve_parametric(GameSpec.load(args.spec), _parse_domain(args.domain), use_cache=not args.no_cache,
+                         repeat=args.repeat)
+    else:
+        solve_with_parametric(GameSpec.load(args.spec), use_cache=not args.no_cache, repeat=args.repeat)
@@ -0,0 +1,164 @@
+"""
+This module rejects templates that are too weak before the solver is called,
+by checking a sampled relaxation of the constraint system with an LP.
+
+A constraint pair has to hold for every state that satisfies its hypotheses.
+Enforcing its conclusions only at finitely many sampled states is a
+relaxation, and so is dropping conclusion atoms and whole pairs. Pairs whose
+hypotheses contain unknowns, e.g. the negated goal after the reach update,
+are dropped, as are conclusion atoms that are not linear in the unknowns,
+e.g. the bilinear rank decrease for update templates. Strict inequalities are
+relaxed to their closure. What remains is a linear feasibility problem over
+the unknowns: if it is infeasible, so is the constraint system.
+
+The states of a pair are sampled uniformly from the bounding box of its
+linear hypotheses, together with the extreme points of that box found by the
+LPs, and only the samples that satisfy all hypotheses are kept. The
+conclusions are evaluated at all samples at once with NumPy.
+"""
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.lp import TOLERANCE, linear_rows, linprog, linprog_many
+from cinderella.normal_form import to_nnf
+
+
+class PrescreenResult(NamedTuple):
+    """
+    The result of the sampled relaxation of a constraint system.
+
+    Attributes
+    ----------
+    feasible : bool
+        Whether the sampled relaxation is feasible. If not, the constraint
+        system is unsat.
+    samples : int
+        The number of sampled states in the hypotheses of the pairs.
+    rows : int
+        The number of linear constraints of the relaxation.
+    skipped : List[int]
+        The indices of the pairs that were dropped from the relaxation.
+    """
+    feasible: bool
+    samples: int
+    rows: int
+    skipped: List[int]
+
+    def __str__(self) -> str:
+        verdict = 'feasible' if self.feasible else 'infeasible, the templates are too weak'
+        return (f'Sampled relaxation with {self.samples} states and {self.rows} constraints: {verdict} '
+                f'({len(self.skipped)} pairs skipped)')
+
+
+def prescreen(cs: ConstraintSystem, samples: int = 64, bound: float = 100.0, seed: int = 0) -> PrescreenResult:
+    """
+    Check the feasibility of a sampled relaxation of a constraint system.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    samples : int
+        The number of uniform samples per pair, before rejecting the samples
+        that violate its hypotheses.
+    bound : float
+        The bound on the absolute value of unbounded state variables.
+    seed : int
+        The seed of the random samples.
+
+    Returns
+    -------
+    PrescreenResult
+        The feasibility of the relaxation.
+    """
+    unknowns = sorted(set().union(*[c.get_free_variables() for c in cs.free_constraints + cs.constraint_pairs]),
+                      key=str)
+    if not unknowns:
+        return PrescreenResult(True, 0, 0, [])
+    rng = np.random.default_rng(seed)
+    rows: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    for constraint in cs.free_constraints:
+        for atom in sp.And.make_args(to_nnf(constraint.formula)):
+            atom_rows = linear_rows(atom, unknowns)
+            if atom_rows:
+                rows.extend((a.reshape(1, -1), np.array([b])) for a, b in atom_rows)
+
+    skipped = []
+    total = 0
+    for index, pair in enumerate(cs.constraint_pairs):
+        if pair.condition.formula.free_symbols & set(unknowns):
+            skipped.append(index)
+            continue
+        states = _sample_states(pair, samples, bound, rng)
+        if states is None:
+            skipped.append(index)
+            continue
+        total += len(states)
+        for atom in sp.And.make_args(to_nnf(pair.implication.formula)):
+            atom_rows = _sampled_rows(atom, pair.forall_vars, unknowns, states)
+            if atom_rows is not None:
+                rows.append(atom_rows)
+
+    if not rows:
+        return PrescreenResult(True, total, 0, skipped)
+    A = np.vstack([a for a, _ in rows])
+    b = np.concatenate([b for _, b in rows])
+    # By Farkas' lemma, A @ x <= b is infeasible iff some y >= 0 has A^T y = 0 and b @ y < 0.
+    # The dual has one row per unknown instead of one per sampled constraint.
+    result = linprog(b, np.ones((1, len(b))), [1.0], A.T, np.zeros(len(unknowns)), [(0, None)] * len(b))
+    feasible = result.fun >= -TOLERANCE * max(1.0, np.abs(b).max())
+    return PrescreenResult(feasible, total, len(b), skipped)
+
+
+def _sample_states(pair: ConstraintPair, samples: int, bound: float,
+                   rng: np.random.Generator) -> Optional[np.ndarray]:
+    """
+    Sample states in the hypotheses of a pair, one row per state. Returns
+    None if no sample satisfies the hypotheses.
+    """
+    variables = list(pair.forall_vars)
+    condition = to_nnf(pair.condition.formula)
+    box = [(-bound, bound)] * len(variables)
+    linear = [row for atom in sp.And.make_args(condition) for row in (linear_rows(atom, variables) or [])]
+    extremes = np.zeros((0, len(variables)))
+    if linear:
+        A_ub = np.array([a for a, _ in linear]).reshape(len(linear), len(variables))
+        b_ub = np.array([b for _, b in linear])
+        costs = np.vstack([np.eye(len(variables)), -np.eye(len(variables))])
+        results = linprog_many(costs, A_ub, b_ub, bounds=box)
+        if results[0].status == 'infeasible':
+            return None
+        box = [(results[i].x[i], results[i + len(variables)].x[i]) for i in range(len(variables))]
+        extremes = np.array([r.x for r in results])
+
+    lower, upper = np.array(box).T
+    states = np.vstack([extremes, rng.uniform(lower, upper, size=(samples, len(variables)))])
+    holds = np.broadcast_to(sp.lambdify(variables, condition, 'numpy')(*states.T), len(states))
+    return states[holds] if holds.any() else None
+
+
+def _sampled_rows(atom: sp.Basic, variables: List[sp.Symbol], unknowns: List[sp.Symbol],
+                  states: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Instantiate a conclusion atom that is linear in the unknowns at every
+    sampled state, as rows A @ unknowns <= b of its closure.
+    """
+    if not atom.is_Relational or atom.rel_op == '!=':
+        return None
+    difference = sp.expand(atom.lhs - atom.rhs)
+    if sp.Poly(difference, *unknowns).total_degree() > 1:
+        return None
+    # difference = gradient(x) @ unknowns + constant(x) at every state x
+    parts = [difference.diff(u) for u in unknowns] + [difference.xreplace({u: 0 for u in unknowns})]
+    values = sp.lambdify(variables, parts, 'numpy')(*states.T)
+    values = np.column_stack([np.broadcast_to(np.asarray(v, dtype=float), len(states)) for v in values])
+    gradient, constant = values[:, :-1], values[:, -1]
+    if atom.rel_op in ('>=', '>'):
+        return -gradient, constant
+    if atom.rel_op in ('<=', '<'):
+        return gradient, -constant
+    return np.vstack([gradient, -gradient]), np.concatenate([-constant, constant])
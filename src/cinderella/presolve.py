@@ -0,0 +1,224 @@
+"""
+This module presolves constraint systems before they are emitted, so that
+PolyQEnt sees fewer unknowns and universally quantified variables.
+
+* Linear equalities among the unknowns in the free constraints are solved for
+  one of their unknowns, which is substituted everywhere. The eliminated
+  unknowns have to be restored in the model with `complete_model`.
+* Linear equalities among the universally quantified variables in the
+  hypotheses of a pair are solved for one of the variables, which is
+  substituted in the pair and removed from its forall list.
+* Constants are folded: true free constraints are dropped, as are pairs with
+  a false hypothesis or a true conclusion and variables that no longer occur
+  in a pair.
+
+The pass only rewrites explicit equalities and trivially true or false
+formulas. The shipped specifications contain neither, so it leaves them
+unchanged; it is meant for imported games and hand-written equalities.
+Identity-updated game variables, such as eps in the vareps games, stay
+universally quantified, since the witness has to hold for every value they
+take. Equalities that remain in a conclusion are still emitted as two
+inequalities.
+
+`remove_redundant_hypotheses` is an optional, more expensive pass that
+removes the linear hypotheses implied by the other linear hypotheses of a
+pair, each of which would otherwise get its own certificate multiplier.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.lp import TOLERANCE, exact_linprog, is_infeasible, linear_rows, linprog
+from cinderella.normal_form import to_nnf
+
+
+def presolve(cs: ConstraintSystem, keep: Sequence[sp.Symbol] = ()) -> Tuple[ConstraintSystem, Dict[sp.Symbol, sp.Expr]]:
+    """
+    Presolve a constraint system.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    keep : Sequence[sp.Symbol]
+        Unknowns that must not be eliminated.
+
+    Returns
+    -------
+    Tuple[ConstraintSystem, Dict[sp.Symbol, sp.Expr]]
+        The presolved constraint system and the eliminated unknowns, mapped
+        to their values in terms of the remaining unknowns.
+    """
+    cs = cs.copy()
+    eliminated: Dict[sp.Symbol, sp.Expr] = {}
+    while True:
+        found = _free_equality(cs, set(keep))
+        if found is None:
+            break
+        index, atom, unknown, value = found
+        cs.free_constraints[index].formula = sp.And(
+            *[a for a in sp.And.make_args(to_nnf(cs.free_constraints[index].formula)) if a != atom])
+        substitution = {unknown: value}
+        eliminated = {u: v.xreplace(substitution) for u, v in eliminated.items()}
+        eliminated[unknown] = value
+        cs = cs.instantiate(substitution)
+
+    cs.free_constraints = [c for c in cs.free_constraints if c.formula != sp.true]
+    pairs = []
+    for pair in cs.constraint_pairs:
+        pair = _eliminate_forall_equalities(pair)
+        if pair.condition.formula == sp.false or pair.implication.formula == sp.true:
+            continue
+        used = pair.condition.formula.free_symbols | pair.implication.formula.free_symbols
+        pair.forall_vars = [var for var in pair.forall_vars if var in used]
+        pairs.append(pair)
+    cs.constraint_pairs = pairs
+    return cs, eliminated
+
+
+def complete_model(model: Dict[sp.Symbol, sp.Basic], eliminated: Dict[sp.Symbol, sp.Expr]) -> Dict[sp.Symbol, sp.Basic]:
+    """
+    Restore the unknowns eliminated by `presolve` in a model of the
+    presolved system.
+
+    Parameters
+    ----------
+    model : Dict[sp.Symbol, sp.Basic]
+        The model of the presolved system.
+    eliminated : Dict[sp.Symbol, sp.Expr]
+        The eliminated unknowns returned by `presolve`.
+
+    Returns
+    -------
+    Dict[sp.Symbol, sp.Basic]
+        The model of the original system.
+    """
+    # Unknowns that only occurred in eliminated equalities are unconstrained
+    free = {s: 0 for value in eliminated.values() for s in value.free_symbols if s not in model}
+    completed = {**free, **model}
+    completed.update({unknown: value.xreplace(completed) for unknown, value in eliminated.items()})
+    return completed
+
+
+def remove_redundant_hypotheses(cs: ConstraintSystem) -> Tuple[ConstraintSystem, int]:
+    """
+    Remove the linear hypotheses of every pair that are implied by its other
+    linear hypotheses, each checked by maximizing it over the others. Pairs
+    whose linear hypotheses are infeasible hold trivially and are dropped.
+    Both checks are screened with floating point LPs and confirmed in exact
+    arithmetic, so the constraint system is never weakened by rounding.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+
+    Returns
+    -------
+    Tuple[ConstraintSystem, int]
+        The constraint system without redundant hypotheses and the number of
+        removed hypotheses.
+    """
+    cs = cs.copy()
+    pairs = []
+    removed = 0
+    for pair in cs.constraint_pairs:
+        conjuncts = list(sp.And.make_args(to_nnf(pair.condition.formula)))
+        linear = [c for c in conjuncts if linear_rows(c, pair.forall_vars)]
+        if linear and is_infeasible(linear, pair.forall_vars):
+            removed += len(conjuncts)
+            continue
+        for conjunct in list(linear):
+            others = [c for c in linear if c != conjunct]
+            if _is_implied(conjunct, others, pair.forall_vars) \
+                    and _is_implied(conjunct, others, pair.forall_vars, exact=True):
+                linear.remove(conjunct)
+                conjuncts.remove(conjunct)
+                removed += 1
+        pair.condition.formula = sp.And(*conjuncts)
+        pairs.append(pair)
+    cs.constraint_pairs = pairs
+    return cs, removed
+
+
+def _is_implied(atom: sp.Basic, others: List[sp.Basic], variables: List[sp.Symbol], exact: bool = False) -> bool:
+    """
+    Check whether the rows a @ x <= b of an atom are implied by the closure
+    of the other atoms, i.e. whether their maxima over the others are at
+    most b. Without `exact`, the check holds up to `TOLERANCE` and only
+    screens the candidates.
+    """
+    rows = [row for other in others for row in linear_rows(other, variables, exact)]
+    strict = atom.rel_op in ('<', '>')
+    for a, b in linear_rows(atom, variables, exact):
+        if exact:
+            result = exact_linprog(-a, [list(c) for c, _ in rows], [d for _, d in rows])
+            if result.status != 'optimal':
+                return False
+            maximum = -result.fun
+            if maximum > b or (strict and maximum >= b):
+                return False
+            continue
+        A_ub = np.array([c for c, _ in rows]).reshape(len(rows), len(variables)) if rows else None
+        b_ub = np.array([d for _, d in rows]) if rows else None
+        result = linprog(-a, A_ub, b_ub)
+        if result.status != 'optimal':
+            return False
+        maximum = -result.fun
+        if maximum > b + TOLERANCE or (strict and maximum > b - TOLERANCE):
+            return False
+    return True
+
+
+def _free_equality(cs: ConstraintSystem, keep: set) -> Optional[Tuple[int, sp.Basic, sp.Symbol, sp.Expr]]:
+    """
+    Find a linear equality in the free constraints with an unknown that has a
+    numeric coefficient, and solve it for that unknown.
+    """
+    for index, constraint in enumerate(cs.free_constraints):
+        for atom in sp.And.make_args(to_nnf(constraint.formula)):
+            if not (atom.is_Relational and atom.rel_op == '=='):
+                continue
+            solved = _solve_linear(atom, sorted(atom.free_symbols - keep, key=str))
+            if solved is not None:
+                return (index, atom, *solved)
+    return None
+
+
+def _eliminate_forall_equalities(pair: ConstraintPair) -> ConstraintPair:
+    """
+    Substitute the universally quantified variables that are determined by a
+    linear equality in the hypotheses of a pair.
+    """
+    forall_vars = list(pair.forall_vars)
+    condition = to_nnf(pair.condition.formula)
+    implication = pair.implication.formula
+    while True:
+        for atom in sp.And.make_args(condition):
+            if not (atom.is_Relational and atom.rel_op == '=='):
+                continue
+            solved = _solve_linear(atom, [var for var in forall_vars if var in atom.free_symbols])
+            # Only substitute values over the forall variables to keep the hypotheses free of unknowns
+            if solved is not None and solved[1].free_symbols <= set(forall_vars):
+                var, value = solved
+                substitution = {var: value}
+                condition = sp.And(*[a.xreplace(substitution) for a in sp.And.make_args(condition) if a != atom])
+                implication = implication.xreplace(substitution)
+                forall_vars.remove(var)
+                break
+        else:
+            return ConstraintPair(forall_vars, condition, implication, pair.label)
+
+
+def _solve_linear(atom: sp.Basic, candidates: List[sp.Symbol]) -> Optional[Tuple[sp.Symbol, sp.Expr]]:
+    """
+    Solve an equality for the first candidate with a numeric coefficient.
+    """
+    difference = sp.expand(atom.lhs - atom.rhs)
+    for var in candidates:
+        coefficient = difference.diff(var)
+        if coefficient.is_Number and coefficient != 0:
+            return var, sp.expand(var - difference / coefficient)
+    return None
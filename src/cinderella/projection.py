@@ -0,0 +1,211 @@
+"""
+This module projects bounded nondeterministic auxiliary variables out of the
+constraint pairs before they are emitted.
+
+Auxiliary variables, e.g. the spillage chosen by the environment, are
+universally quantified in every pair they occur in. If they only occur
+linearly, a pair can be replaced by an equivalent pair without them:
+
+* If they only occur in the hypotheses, ∀s. H(x, s) -> C(x) is equivalent to
+  (∃s. H(x, s)) -> C(x), and ∃s is eliminated by Fourier-Motzkin.
+* If they only occur in the conclusions, which are affine in them, and in
+  hypotheses that bound them to a polytope independent of the other
+  variables, the conclusions hold for all values in the polytope iff they
+  hold at its vertices.
+
+Pairs where an auxiliary variable occurs together with other variables in a
+hypothesis and in the conclusion, e.g. in the negated goal after the
+environment move, are kept.
+"""
+from itertools import combinations
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.lp import linear_rows, linprog
+from cinderella.normal_form import to_nnf
+
+_Inequality = Tuple[sp.Expr, bool]
+
+
+class ProjectionDecision(NamedTuple):
+    """
+    The projection of the auxiliary variables of a single constraint pair.
+
+    Attributes
+    ----------
+    index : int
+        The index of the pair in the constraint system.
+    eliminated : List[sp.Symbol]
+        The auxiliary variables that were eliminated.
+    method : str
+        'unused', 'fourier-motzkin', 'vertices' or the reason the remaining
+        auxiliary variables were kept.
+    """
+    index: int
+    eliminated: List[sp.Symbol]
+    method: str
+
+
+def project_aux_vars(cs: ConstraintSystem, aux_vars: Sequence[sp.Symbol]) -> Tuple[ConstraintSystem, List[ProjectionDecision]]:
+    """
+    Eliminate the auxiliary variables from the constraint pairs where this
+    gives an equivalent pair.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    aux_vars : Sequence[sp.Symbol]
+        The nondeterministic auxiliary variables.
+
+    Returns
+    -------
+    Tuple[ConstraintSystem, List[ProjectionDecision]]
+        The projected constraint system and the decision for every pair with
+        auxiliary variables.
+    """
+    result = cs.copy()
+    decisions = []
+    for index, pair in enumerate(result.constraint_pairs):
+        aux = [var for var in pair.forall_vars if var in aux_vars]
+        if not aux:
+            continue
+        used = pair.condition.formula.free_symbols | pair.implication.formula.free_symbols
+        unused = [var for var in aux if var not in used]
+        aux = [var for var in aux if var in used]
+        projected, method = _project(pair, aux) if aux else (None, 'unused')
+        if projected is None:
+            pair.forall_vars = [var for var in pair.forall_vars if var not in unused]
+            eliminated = unused
+            method = method if not unused else f'unused, other {method}'
+        else:
+            result.constraint_pairs[index] = projected
+            eliminated = unused + aux
+        decisions.append(ProjectionDecision(index, eliminated, method))
+    return result, decisions
+
+
+def _project(pair: ConstraintPair, aux: List[sp.Symbol]) -> Tuple[Optional[ConstraintPair], str]:
+    """
+    Project the auxiliary variables out of a pair in which all of them occur.
+    Returns None and the reason if this is not possible.
+    """
+    condition = to_nnf(pair.condition.formula)
+    conclusions = sp.And.make_args(to_nnf(pair.implication.formula))
+    if isinstance(condition, sp.Or) or any(isinstance(c, sp.Or) for c in conclusions):
+        return None, 'disjunction'
+    forall_vars = [var for var in pair.forall_vars if var not in aux]
+    aux_set = set(aux)
+    hypotheses = [atom for atom in sp.And.make_args(condition) if atom != sp.true]
+    independent = [atom for atom in hypotheses if not atom.free_symbols & aux_set]
+    dependent = [atom for atom in hypotheses if atom.free_symbols & aux_set]
+
+    if not any(c.free_symbols & aux_set for c in conclusions):
+        inequalities = _inequalities(dependent, aux)
+        if inequalities is None:
+            return None, 'non-linear hypothesis'
+        for var in aux:
+            inequalities = _eliminate(inequalities, var)
+        projected = [sp.StrictGreaterThan(e, 0) if strict else sp.GreaterThan(e, 0) for e, strict in inequalities]
+        return ConstraintPair(forall_vars, sp.And(*independent, *projected), pair.implication.formula,
+                              pair.label), 'fourier-motzkin'
+
+    if any(atom.free_symbols - aux_set for atom in dependent):
+        return None, 'auxiliary variable in hypothesis and conclusion'
+    if not all(_is_affine(c, aux) for c in conclusions):
+        return None, 'non-affine conclusion'
+    if any(atom.is_Relational and atom.rel_op in ('<', '>') for atom in dependent) \
+            and any(c.is_Relational and c.rel_op in ('<', '>') for c in conclusions):
+        return None, 'strict bounds and strict conclusion'
+    vertices = _vertices(dependent, aux)
+    if vertices is None:
+        return None, 'unbounded'
+    implication = sp.And(*[c.xreplace(vertex) for vertex in vertices for c in conclusions])
+    return ConstraintPair(forall_vars, sp.And(*independent), implication, pair.label), 'vertices'
+
+
+def _inequalities(atoms: List[sp.Basic], aux: List[sp.Symbol]) -> Optional[List[_Inequality]]:
+    """
+    Convert atoms that are linear in the auxiliary variables with numeric
+    coefficients into inequalities e >= 0 (or e > 0 if strict).
+    """
+    inequalities: List[_Inequality] = []
+    for atom in atoms:
+        if not atom.is_Relational or atom.rel_op == '!=':
+            return None
+        difference = atom.lhs - atom.rhs
+        if not all(sp.expand(difference.diff(var)).is_Number for var in aux):
+            return None
+        if atom.rel_op in ('>=', '>', '=='):
+            inequalities.append((difference, atom.rel_op == '>'))
+        if atom.rel_op in ('<=', '<', '=='):
+            inequalities.append((-difference, atom.rel_op == '<'))
+    return inequalities
+
+
+def _eliminate(inequalities: List[_Inequality], var: sp.Symbol) -> List[_Inequality]:
+    """
+    Eliminate a variable with numeric coefficients from a conjunction of
+    inequalities by Fourier-Motzkin.
+    """
+    lower, upper, rest = [], [], []
+    for expr, strict in inequalities:
+        coefficient = sp.expand(expr.diff(var))
+        remainder = expr.xreplace({var: 0})
+        if coefficient > 0:
+            lower.append((coefficient, remainder, strict))
+        elif coefficient < 0:
+            upper.append((-coefficient, remainder, strict))
+        else:
+            rest.append((expr, strict))
+    # c_l * var + r_l >= 0 and -c_u * var + r_u >= 0 combine to c_l * r_u + c_u * r_l >= 0
+    for (c_l, r_l, strict_l), (c_u, r_u, strict_u) in ((l, u) for l in lower for u in upper):
+        rest.append((c_l * r_u + c_u * r_l, strict_l or strict_u))
+    return rest
+
+
+def _is_affine(atom: sp.Basic, aux: List[sp.Symbol]) -> bool:
+    """
+    Check whether a relational atom is affine in the auxiliary variables.
+    """
+    if not atom.is_Relational or atom.rel_op == '!=':
+        return False
+    difference = atom.lhs - atom.rhs
+    return all(sp.expand(difference.diff(a, b)) == 0 for a in aux for b in aux)
+
+
+def _vertices(atoms: List[sp.Basic], aux: List[sp.Symbol]) -> Optional[List[Dict[sp.Symbol, sp.Basic]]]:
+    """
+    Enumerate the vertices of the polytope of linear atoms over the auxiliary
+    variables. Returns None if the polytope is unbounded.
+    """
+    rows = []
+    for atom in atoms:
+        atom_rows = linear_rows(atom, aux)
+        if atom_rows is None:
+            return None
+        rows.extend(atom_rows)
+    A_ub = np.array([a for a, _ in rows]).reshape(len(rows), len(aux))
+    b_ub = np.array([b for _, b in rows])
+    for i in range(len(aux)):
+        for sign in (1, -1):
+            c = np.zeros(len(aux))
+            c[i] = sign
+            if linprog(c, A_ub, b_ub).status == 'unbounded':
+                return None
+
+    # The vertices of the closure, strict atoms are only excluded when the conclusions are not strict
+    closure = [sp.LessThan(atom.lhs, atom.rhs) if atom.rel_op == '<' else
+               sp.GreaterThan(atom.lhs, atom.rhs) if atom.rel_op == '>' else atom for atom in atoms]
+    vertices: List[Dict[sp.Symbol, sp.Basic]] = []
+    for subset in combinations(closure, len(aux)):
+        solution = sp.solve([sp.Eq(atom.lhs, atom.rhs) for atom in subset], aux, dict=True)
+        if len(solution) != 1 or len(solution[0]) != len(aux):
+            continue
+        vertex = solution[0]
+        if all(atom.xreplace(vertex) == sp.true for atom in closure) and vertex not in vertices:
+            vertices.append(vertex)
+    return vertices
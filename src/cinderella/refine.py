@@ -0,0 +1,242 @@
+"""
+This module refines the templates of a game guided by the constraint pairs
+that make its constraint system unsat.
+
+PolyQEnt only reports 'unsat', so the unsat core is computed by deletion:
+chunks of constraint pairs, halving in size, are removed in turn and stay
+removed if the remaining system is still unsat. The number of solver calls
+is capped, and a call that times out or fails keeps its pairs, so the core
+is always unsat but not necessarily minimal. The pairs of the core are labelled with their origin
+(update correctness, rank non-negativity or the rank decrease for a safety
+update), and only the templates whose coefficients occur in them are
+enlarged, first by dropping their sparsity restrictions, then by increasing
+their degree.
+"""
+import os
+from argparse import ArgumentParser
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import sympy as sp
+
+from cinderella import OUT_DIR
+from cinderella.constraint import ConstraintSystem
+from cinderella.cost import CostModel, solve_timeout
+from cinderella.executor import execute_polyqent
+from cinderella.prefix_parser.parser import parse_expression
+from cinderella.presolve import complete_model
+from cinderella.spec import CompiledSpec, GameSpec
+
+# Template keys whose restrictions are dropped before the degree is increased
+SPARSITY_KEYS = ('mask', 'max_degrees', 'monomials', 'shape')
+
+
+class CoreReport(NamedTuple):
+    """
+    The unsat core of a compiled specification.
+
+    Attributes
+    ----------
+    pairs : List[int]
+        The indices of the constraint pairs in the core.
+    labels : List[str]
+        The labels of the pairs in the core.
+    templates : List[str]
+        The templates whose coefficients occur in the core, as keys of the
+        `templates` table of the specification.
+    solves : int
+        The number of solver calls needed to compute the core.
+    """
+    pairs: List[int]
+    labels: List[str]
+    templates: List[str]
+    solves: int
+
+    def __str__(self) -> str:
+        origins = ', '.join(f'{count}x {label}' if count > 1 else label
+                            for label, count in Counter(self.labels).items())
+        return (f'Unsat core of {len(self.pairs)} pairs ({self.solves} solver calls): {origins or "free constraints"}\n'
+                f'  Templates in the core: {", ".join(self.templates) or "none"}')
+
+
+def unsat_core(cs: ConstraintSystem, is_sat: Callable[[ConstraintSystem], Optional[bool]],
+               max_solves: int = 8) -> Tuple[List[int], int]:
+    """
+    Compute a set of constraint pairs that is unsat together with the free
+    constraints, by deleting chunks of pairs whose size is halved after every
+    pass. Pairs are only deleted if the solver proves the rest unsat, so a
+    timeout keeps them. The core is minimal if the passes with single pairs
+    finish within the solver calls.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The unsat constraint system.
+    is_sat : Callable[[ConstraintSystem], Optional[bool]]
+        The solver, returning whether a constraint system is sat, or None if
+        it timed out or failed.
+    max_solves : int
+        The maximal number of solver calls.
+
+    Returns
+    -------
+    Tuple[List[int], int]
+        The indices of the pairs in the core and the number of solver calls.
+    """
+    core = list(range(len(cs.constraint_pairs)))
+    solves = 0
+    size = max(len(core) // 2, 1)
+    while solves < max_solves:
+        start = 0
+        while start < len(core) and solves < max_solves:
+            candidate = core[:start] + core[start + size:]
+            reduced = cs.copy()
+            reduced.constraint_pairs = [reduced.constraint_pairs[i] for i in candidate]
+            solves += 1
+            if is_sat(reduced) is False:
+                core = candidate
+            else:
+                start += size
+        if size == 1:
+            break
+        size = max(size // 2, 1)
+    return core, solves
+
+
+def core_templates(compiled: CompiledSpec, pairs: Sequence[int]) -> List[str]:
+    """
+    Get the templates whose coefficients occur in some of the constraint pairs.
+
+    Parameters
+    ----------
+    compiled : CompiledSpec
+        The compiled specification.
+    pairs : Sequence[int]
+        The indices of the constraint pairs.
+
+    Returns
+    -------
+    List[str]
+        The keys of the templates, i.e. 'rank_fn', 'reach_updates' or 'guards'.
+    """
+    unknowns = set().union(*[compiled.cs.constraint_pairs[i].get_free_variables() for i in pairs])
+    templates = [_template_key(owner) for owner, block in compiled.registry.blocks.items()
+                 if unknowns & set(block.coefficients)]
+    return list(dict.fromkeys(templates))
+
+
+def enlarge_templates(spec: GameSpec, templates: Sequence[str]) -> GameSpec:
+    """
+    Enlarge some templates of a specification. A template with sparsity
+    restrictions loses them, otherwise its degree is increased by one.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    templates : Sequence[str]
+        The keys of the templates to enlarge.
+
+    Returns
+    -------
+    GameSpec
+        The specification with the enlarged templates.
+    """
+    tables = {key: dict(value) for key, value in spec.data.get('templates', {}).items()}
+    for key in templates:
+        table = tables.setdefault(key, {})
+        restrictions = [k for k in SPARSITY_KEYS if k in table]
+        for k in restrictions:
+            del table[k]
+        if not restrictions:
+            table['degree'] = table.get('degree', 1) + 1
+    return spec.replace(templates=tables)
+
+
+def refine_templates(spec: GameSpec,
+                     max_steps: int = 3,
+                     use_cache: bool = True,
+                     repeat: int = 1,
+                     max_solves: int = 8,
+                     cost_model: Optional[CostModel] = None) -> Optional[Dict[sp.Symbol, Any]]:
+    """
+    Solve a game, and whenever it is unsat, enlarge the templates that occur
+    in its unsat core and solve again. The witness is printed.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    max_steps : int
+        The maximal number of refinements.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    repeat : int
+        The number of solver runs per call.
+    max_solves : int
+        The maximal number of solver calls per unsat core, see `unsat_core`.
+    cost_model : Optional[CostModel]
+        A calibrated cost model for the timeouts of the core solves, see
+        `cinderella.cost.solve_timeout`.
+
+    Returns
+    -------
+    Optional[Dict[sp.Symbol, Any]]
+        The model of the witness, if one was found.
+    """
+    for step in range(max_steps + 1):
+        compiled = spec.compile(use_cache)
+        witness_path = os.path.join(OUT_DIR, f'{compiled.name}.smt2')
+        compiled.cs.write_smt2(witness_path)
+        result, model = execute_polyqent(witness_path, repeat)
+        if result == 'sat':
+            model = complete_model({sp.Symbol(key): parse_expression(value) for key, value in model.items()},
+                                   compiled.eliminated)
+            compiled.print_witness(model)
+            return model
+        if step == max_steps:
+            break
+
+        if result == 'unknown':
+            print("The solver timed out, only pairs that are proven unnecessary are dropped from the core")
+        core_path = os.path.join(OUT_DIR, f'{compiled.name}_core.smt2')
+
+        def is_sat(cs: ConstraintSystem) -> Optional[bool]:
+            cs.write_smt2(core_path)
+            result = execute_polyqent(core_path, repeat, timeout=solve_timeout(cs, cost_model))[0]
+            return None if result == 'unknown' else result == 'sat'
+
+        pairs, solves = unsat_core(compiled.cs, is_sat, max_solves)
+        report = CoreReport(pairs, [compiled.cs.constraint_pairs[i].label for i in pairs],
+                            core_templates(compiled, pairs), solves)
+        print(report)
+        if not report.templates:
+            print("The core contains no templates, refining them does not help")
+            break
+        spec = enlarge_templates(spec, report.templates)
+        print(f"Refined templates: {spec.data['templates']}")
+    return None
+
+
+def _template_key(owner: str) -> str:
+    """
+    Get the key of the template table that describes a registered template.
+    """
+    if owner == 'rank_fn':
+        return 'rank_fn'
+    if owner.startswith('guard_'):
+        return 'guards'
+    return 'reach_updates'
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Solve a game specification, enlarging the templates in the unsat core.")
+    parser.add_argument('spec', help='Path to a TOML or JSON game specification.')
+    parser.add_argument('-s', '--steps', type=int, default=3, help='Maximal number of refinements.')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the compiled-spec cache.')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='Number of solver runs per call.')
+    parser.add_argument('--max-solves', type=int, default=8, help='Maximal number of solver calls per unsat core.')
+    args = parser.parse_args()
+
+    refine_templates(GameSpec.load(args.spec), max_steps=args.steps, use_cache=not args.no_cache,
+                     repeat=args.repeat, max_solves=args.max_solves)
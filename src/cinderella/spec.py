@@ -0,0 +1,574 @@
+"""
+This module describes games declaratively and compiles them to constraint
+systems.
+
+A game specification is a plain TOML or JSON document. All formulas are
+given as strings over the game variables, the parameters and the unknowns of
+the witness (e.g. `M`). In reach update constraints, the updated value of a
+game variable `x` is referred to as `x_p`. Formulas are parsed with
+`parse_formula`, which only allows arithmetic and logic. Compiled
+specifications are cached on disk, keyed by the hash of the specification
+and of the sources of the package, so that unchanged games are not rebuilt
+with sympy.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import pickle
+import tomllib
+from argparse import ArgumentParser
+from functools import lru_cache
+from pathlib import Path
+from tokenize import OP
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import sympy as sp
+from sympy.parsing.sympy_parser import parse_expr, standard_transformations
+
+from cinderella import OUT_DIR
+from cinderella.alternating import solve_alternating
+from cinderella.constraint import ConstraintSystem
+from cinderella.executor import DEFAULT_CONFIG, execute_polyqent
+from cinderella.invariants import infer_invariants
+from cinderella.newton import prune_for_config
+from cinderella.prefix_parser.parser import parse_expression
+from cinderella.prescreen import prescreen as prescreen_templates
+from cinderella.presolve import complete_model, presolve, remove_redundant_hypotheses
+from cinderella.projection import project_aux_vars
+from cinderella.split import split_disjunctions
+from cinderella.template import TemplateRegistry, get_polynomial_expression, get_template
+from cinderella.witness import construct_constraints, get_offset_scale
+
+CACHE_DIR = OUT_DIR / "cache"
+# Bump whenever the format of the cache entries changes
+CACHE_VERSION = 7
+
+PRIMED_SUFFIX = "_p"
+
+# The only names visible when parsing a formula, besides its symbols
+_FORMULA_GLOBALS: Dict[str, Any] = {
+    '__builtins__': {},
+    'Symbol': sp.Symbol, 'Integer': sp.Integer, 'Float': sp.Float, 'Rational': sp.Rational,
+    'Add': sp.Add, 'Mul': sp.Mul, 'Pow': sp.Pow,
+    'Eq': sp.Eq, 'Ne': sp.Ne, 'Lt': sp.Lt, 'Le': sp.Le, 'Gt': sp.Gt, 'Ge': sp.Ge,
+    'And': sp.And, 'Or': sp.Or, 'Not': sp.Not, 'Implies': sp.Implies,
+}
+
+
+def _reject_attributes(tokens: List[Tuple[int, str]], local_dict: Dict[str, Any],
+                       global_dict: Dict[str, Any]) -> List[Tuple[int, str]]:
+    """
+    Reject attribute access, which could reach objects outside the allowed
+    names.
+    """
+    if (OP, '.') in tokens:
+        raise ValueError('Attribute access is not allowed in formulas')
+    return tokens
+
+
+def parse_formula(expression: Any, symbols: Dict[str, Any]) -> sp.Basic:
+    """
+    Parse a formula of a specification. Only arithmetic, comparisons, `And`,
+    `Or`, `Not`, `Implies`, `Eq` and `Ne` are allowed, nothing is evaluated
+    with builtins, and names other than the given symbols become new symbols.
+
+    Parameters
+    ----------
+    expression : Any
+        The formula, as a string or a number.
+    symbols : Dict[str, Any]
+        The symbols and parameter values by name.
+
+    Returns
+    -------
+    sp.Basic
+        The formula.
+    """
+    if isinstance(expression, (bool, int, float)):
+        return sp.sympify(expression)
+    return sp.sympify(parse_expr(str(expression), local_dict=dict(symbols), global_dict=dict(_FORMULA_GLOBALS),
+                                 transformations=(_reject_attributes, *standard_transformations)))
+
+
+@lru_cache(maxsize=None)
+def _source_hash() -> str:
+    """
+    Get a hash of the sources of the package, without the benchmarks, so that
+    any change of the compilation invalidates the cache.
+    """
+    package = Path(__file__).parent
+    digest = hashlib.sha256()
+    for path in sorted(package.rglob('*.py')):
+        relative = path.relative_to(package)
+        if relative.parts[0] == 'benchmarks':
+            continue
+        digest.update(relative.as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class GameSpec:
+    """
+    A class representing the declarative specification of a game.
+
+    Attributes
+    ----------
+    data : Dict[str, Any]
+        The raw specification. Supported keys are `name`, `game_variables`,
+        `parameters`, `free_constraints`, `invariants`, `safety_updates`,
+        `reach_update_constraints`, `goal`, `ranking_offset`,
+        `use_target_not_reached`, `non_det_aux_vars`, `non_det_bounds`,
+        `initial_states`, `normalization`, `symmetries`, `split_disjunctions`,
+        `project_aux_vars`, `presolve`, `remove_redundant`, `prune_monomials`
+        and `templates`. `prune_monomials` is true to prune the template
+        monomials for the PolyQEnt config of the solver runs, or the name of
+        another config.
+    """
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        missing = {'name', 'game_variables', 'goal', 'ranking_offset'} - set(data)
+        if missing:
+            raise ValueError(f'Game specification is missing the keys: {sorted(missing)}')
+        self.data = data
+
+    def __str__(self) -> str:
+        return json.dumps(self.data, indent=2, sort_keys=True)
+
+    @property
+    def name(self) -> str:
+        return self.data['name']
+
+    @classmethod
+    def load(cls, file_path: str) -> GameSpec:
+        """
+        Load a game specification from a TOML or JSON file.
+
+        Parameters
+        ----------
+        file_path : str
+            The path to the specification file.
+
+        Returns
+        -------
+        GameSpec
+            The game specification.
+        """
+        with open(file_path, 'rb') as f:
+            if str(file_path).endswith('.json'):
+                return cls(json.load(f))
+            return cls(tomllib.load(f))
+
+    def dump(self, file_path: str) -> None:
+        """
+        Write the game specification to a JSON file.
+
+        Parameters
+        ----------
+        file_path : str
+            The path to the specification file.
+        """
+        with open(file_path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+
+    def replace(self, **changes: Any) -> GameSpec:
+        """
+        Get a copy of the specification with some keys replaced.
+
+        Parameters
+        ----------
+        changes : Any
+            The keys to be replaced and their new values.
+
+        Returns
+        -------
+        GameSpec
+            The modified game specification.
+        """
+        data = copy.deepcopy(self.data)
+        data.update(copy.deepcopy(changes))
+        return GameSpec(data)
+
+    def hash(self) -> str:
+        """
+        Get a hash that identifies the compiled form of the specification.
+        It covers the sources of the package, so cache entries of other
+        versions of the compilation are never reused.
+
+        Returns
+        -------
+        str
+            The hexadecimal SHA-256 hash.
+        """
+        canonical = json.dumps({'version': CACHE_VERSION, 'source': _source_hash(), 'spec': self.data}, sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def compile(self, use_cache: bool = True) -> CompiledSpec:
+        """
+        Compile the specification to a constraint system.
+
+        Parameters
+        ----------
+        use_cache : bool
+            Whether to load and store the result in the compiled-spec cache.
+
+        Returns
+        -------
+        CompiledSpec
+            The compiled specification.
+        """
+        cache_path = CACHE_DIR / f'{self.hash()}.pkl'
+        if use_cache and cache_path.exists():
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+
+        compiled = self._build()
+        if use_cache:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(compiled, f)
+        return compiled
+
+    def with_inferred_invariants(self, domain: str = 'interval') -> GameSpec:
+        """
+        Get a copy of the specification whose invariants are strengthened by
+        the invariants inferred from its initial states.
+
+        Parameters
+        ----------
+        domain : str
+            The abstract domain, see `infer_invariants`.
+
+        Returns
+        -------
+        GameSpec
+            The specification with the inferred invariants appended.
+        """
+        if 'initial_states' not in self.data:
+            raise ValueError(f'Game specification {self.name} has no initial states')
+        data = self.data
+        game_variables, aux_vars, primed, parse = self._symbols()
+        invariants = [parse(inv) for inv in data.get('invariants', [])]
+        inferred = infer_invariants(
+            game_variables,
+            parse(data['initial_states']),
+            [_primed_constraint(parse(c), primed) for c in data.get('reach_update_constraints', [])],
+            [{sp.Symbol(var): parse(value) for var, value in update.items()}
+             for update in data.get('safety_updates', [])],
+            parse(data['goal']),
+            game_variable_invariants=invariants,
+            non_det_aux_vars=aux_vars,
+            non_det_bounds=[parse(bound) for bound in data.get('non_det_bounds', [])],
+            domain=domain,
+        )
+        return self.replace(invariants=data.get('invariants', []) + [str(inv) for inv in inferred])
+
+    def _symbols(self) -> Tuple[List[sp.Symbol], List[sp.Symbol], List[sp.Symbol], Callable[[Any], sp.Basic]]:
+        """
+        Get the game, auxiliary and primed variables and a parser for the
+        formulas of the specification.
+        """
+        data = self.data
+        game_variables = [sp.Symbol(v) for v in data['game_variables']]
+        aux_vars = [sp.Symbol(v) for v in data.get('non_det_aux_vars', [])]
+        primed = [sp.Symbol(f'{v.name}{PRIMED_SUFFIX}') for v in game_variables]
+        namespace: Dict[str, Any] = {v.name: v for v in game_variables + aux_vars + primed}
+        namespace.update({name: parse_formula(value, {}) for name, value in data.get('parameters', {}).items()})
+
+        def parse(expression: Any) -> sp.Basic:
+            return parse_formula(expression, namespace)
+
+        return game_variables, aux_vars, primed, parse
+
+    def _build(self) -> CompiledSpec:
+        data = self.data
+        game_variables, aux_vars, primed, parse = self._symbols()
+
+        templates = data.get('templates', {})
+        rank_template = templates.get('rank_fn', {})
+        registry = TemplateRegistry()
+        rank_fn = self._template('rank_fn', rank_template, game_variables, registry)
+
+        update_template = templates.get('reach_updates', {})
+        fixed_updates = update_template.get('fixed', {})
+
+        def updates(suffix: str) -> Dict[sp.Symbol, sp.Expr]:
+            return {var: parse(fixed_updates[var.name]) if var.name in fixed_updates
+                    else self._template(f'{var}_upd{suffix}', update_template, game_variables, registry, var)
+                    for var in game_variables}
+
+        pieces = update_template.get('pieces', 1)
+        if pieces == 1:
+            reach_updates = updates('')
+        else:
+            # Piecewise updates with template guards, the last piece is the default
+            guard_template = templates.get('guards', {})
+            guard_variables = [sp.Symbol(v) for v in guard_template.get('variables', [v.name for v in game_variables])]
+            reach_updates = [
+                (sp.true if i == pieces - 1 else
+                 get_template(f'guard_{i}', guard_variables, guard_template.get('degree', 1), 1, 1, registry),
+                 updates(str(i)))
+                for i in range(pieces)
+            ]
+
+        reach_update_constraints = [
+            _primed_constraint(parse(constraint), primed)
+            for constraint in data.get('reach_update_constraints', [])
+        ]
+
+        safety_updates = [
+            {sp.Symbol(var): parse(value) for var, value in update.items()}
+            for update in data.get('safety_updates', [])
+        ]
+
+        ranking_offset = parse(data['ranking_offset'])
+        cs = construct_constraints(
+            game_variables,
+            [parse(inv) for inv in data.get('invariants', [])],
+            [parse(fc) for fc in data.get('free_constraints', [])],
+            reach_updates,
+            reach_update_constraints,
+            safety_updates,
+            parse(data['goal']),
+            rank_fn,
+            ranking_offset,
+            non_det_aux_vars=aux_vars,
+            non_det_bounds=[parse(bound) for bound in data.get('non_det_bounds', [])],
+            use_target_not_reached=data.get('use_target_not_reached', False),
+            normalization=data.get('normalization'),
+            symmetries=[{sp.Symbol(k): sp.Symbol(v) for k, v in permutation.items()}
+                        for permutation in data.get('symmetries', [])],
+        )
+        if data.get('split_disjunctions', False):
+            cs, report = split_disjunctions(cs)
+            print(report)
+        if data.get('project_aux_vars', False):
+            cs, decisions = project_aux_vars(cs, aux_vars)
+            for decision in decisions:
+                print(f'[Pair {decision.index + 1}] Projected {decision.eliminated}: {decision.method}')
+        eliminated: Dict[sp.Symbol, sp.Expr] = {}
+        if data.get('presolve', False):
+            cs, eliminated = presolve(cs)
+        if data.get('remove_redundant', False):
+            cs, removed = remove_redundant_hypotheses(cs)
+            print(f'Removed {removed} redundant hypotheses')
+        prune = data.get('prune_monomials', False)
+        if prune:
+            cs, zeros = prune_for_config(cs, DEFAULT_CONFIG if prune is True else prune)
+            print(f'Pruned {len(zeros)} template coefficients')
+            eliminated.update({unknown: sp.S.Zero for unknown in zeros})
+        if data.get('normalization') == 'offset':
+            ranking_offset = ranking_offset.subs(get_offset_scale(ranking_offset, game_variables + aux_vars), 1)
+        return CompiledSpec(self.name, cs, game_variables, rank_fn, reach_updates, ranking_offset, registry,
+                            eliminated)
+
+    @staticmethod
+    def _template(name: str, template: Dict[str, Any], game_variables: List[sp.Symbol],
+                  registry: TemplateRegistry, updated: Optional[sp.Symbol] = None) -> sp.Expr:
+        """
+        Construct a template from its description. Besides `variables` and
+        `degree`, a template may restrict its monomials by a `mask` of
+        variables, per-variable `max_degrees` and a list of allowed
+        `monomials`. The shape `diagonal` restricts an update template to
+        the updated variable.
+        """
+        variables = [sp.Symbol(v) for v in template.get('variables', [v.name for v in game_variables])]
+        symbols = {v.name: v for v in variables}
+        mask = template.get('mask')
+        if template.get('shape') == 'diagonal' and updated is not None:
+            mask = [updated.name]
+        monomials = template.get('monomials')
+        return get_polynomial_expression(
+            name,
+            variables,
+            degree=template.get('degree', 1),
+            mask=None if mask is None else [symbols[v] for v in mask if v in symbols],
+            max_degrees={symbols[v]: d for v, d in template.get('max_degrees', {}).items()},
+            monomials=None if monomials is None else [parse_formula(m, symbols) for m in monomials],
+            registry=registry,
+        )
+
+
+class CompiledSpec:
+    """
+    A class representing a game specification compiled to a constraint system.
+
+    Attributes
+    ----------
+    name : str
+        The name of the game.
+    cs : ConstraintSystem
+        The constraint system of the witness.
+    game_variables : List[sp.Symbol]
+        The variables of the game.
+    rank_fn : sp.Expr
+        The ranking function template.
+    reach_updates : Union[Dict[sp.Symbol, sp.Expr], List[Tuple[sp.Basic, Dict[sp.Symbol, sp.Expr]]]]
+        The update templates of the reach player, or its (guard, update)
+        pieces.
+    ranking_offset : sp.Expr
+        The offset by which the ranking function decreases.
+    registry : TemplateRegistry
+        The coefficient blocks of the rank function and update templates.
+    eliminated : Dict[sp.Symbol, sp.Expr]
+        The unknowns eliminated by presolving and monomial pruning, in terms
+        of the remaining ones.
+    """
+
+    def __init__(self,
+                 name: str,
+                 cs: ConstraintSystem,
+                 game_variables: List[sp.Symbol],
+                 rank_fn: sp.Expr,
+                 reach_updates: Union[Dict[sp.Symbol, sp.Expr], List[Tuple[sp.Basic, Dict[sp.Symbol, sp.Expr]]]],
+                 ranking_offset: sp.Expr,
+                 registry: TemplateRegistry,
+                 eliminated: Optional[Dict[sp.Symbol, sp.Expr]] = None,
+                 ) -> None:
+        self.name = name
+        self.cs = cs
+        self.game_variables = game_variables
+        self.rank_fn = rank_fn
+        self.reach_updates = reach_updates
+        self.ranking_offset = ranking_offset
+        self.registry = registry
+        self.eliminated = eliminated or {}
+
+    def print_witness(self, model: Dict[sp.Symbol, Any]) -> None:
+        """
+        Print the witness described by a solver model.
+
+        Parameters
+        ----------
+        model : Dict[sp.Symbol, Any]
+            The model, mapping unknowns to their values.
+        """
+        print("Witness found:")
+        print("Ranking Offset:")
+        print(self.ranking_offset.subs(model, simultaneous=True))
+        print("Rank Function:")
+        print(self.rank_fn.subs(model, simultaneous=True))
+        print("Reach Player Update:")
+        if isinstance(self.reach_updates, dict):
+            for key, value in self.reach_updates.items():
+                print(f"{key}: {value.subs(model, simultaneous=True)}")
+            return
+        for guard, updates in self.reach_updates:
+            print(f"If {guard.subs(model, simultaneous=True)}:")
+            for key, value in updates.items():
+                print(f"  {key}: {value.subs(model, simultaneous=True)}")
+
+
+def _primed_constraint(constraint: sp.Basic, primed: List[sp.Symbol]) -> Callable[..., sp.Basic]:
+    """
+    Turn a constraint over primed variables into a function of the updated
+    values, as expected by `construct_constraints`.
+    """
+    def substitute(*updated: sp.Basic) -> sp.Basic:
+        return constraint.xreplace(dict(zip(primed, updated)))
+    return substitute
+
+
+def solve_spec(spec: GameSpec, use_cache: bool = True, repeat: int = 10,
+               engine: str = 'polyqent', hint: Optional[Dict[Any, Any]] = None,
+               prescreen: bool = False, timeout: float = 300) -> Optional[Dict[sp.Symbol, Any]]:
+    """
+    Compile a game specification, solve it and print the witness.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    repeat : int
+        The number of solver runs.
+    engine : str
+        'polyqent', or 'alternating' to try `solve_alternating` with the rank
+        function and the remaining templates as blocks first, falling back to
+        PolyQEnt if it finds no witness.
+    hint : Optional[Dict[Any, Any]]
+        A model of a related game that is checked before the solver is
+        called, see `execute_polyqent`.
+    prescreen : bool
+        Whether to check a sampled LP relaxation first and skip the solver if
+        it is infeasible, see `cinderella.prescreen.prescreen`.
+    timeout : float
+        The timeout of a PolyQEnt run in seconds.
+
+    Returns
+    -------
+    Optional[Dict[sp.Symbol, Any]]
+        The model of the witness, if one was found.
+    """
+    if engine not in ('polyqent', 'alternating'):
+        raise ValueError(f'Unknown engine {engine}')
+    compiled = spec.compile(use_cache)
+    if prescreen:
+        report = prescreen_templates(compiled.cs)
+        print(report)
+        if not report.feasible:
+            return None
+    if engine == 'alternating':
+        blocks = compiled.registry.blocks
+        result = solve_alternating(compiled.cs, [blocks['rank_fn'].coefficients,
+                                                 [c for owner, block in blocks.items() if owner != 'rank_fn'
+                                                  for c in block.coefficients]])
+        if result.model is not None:
+            model = complete_model(result.model, compiled.eliminated)
+            compiled.print_witness(model)
+            return model
+        print(f'Alternating LPs found no witness (violation {result.violation:.3g}), falling back to PolyQEnt')
+
+    witness_path = os.path.join(OUT_DIR, f'{compiled.name}.smt2')
+    compiled.cs.write_smt2(witness_path)
+
+    result, model = execute_polyqent(witness_path, repeat, hint=hint, cs=compiled.cs, timeout=timeout)
+    if result != 'sat':
+        return None
+    model = complete_model({sp.Symbol(key): parse_expression(value) for key, value in model.items()},
+                           compiled.eliminated)
+    compiled.print_witness(model)
+    return model
+
+
+def run_spec(file_path: str, use_cache: bool = True, repeat: int = 10,
+             engine: str = 'polyqent', prescreen: bool = False) -> Optional[Dict[sp.Symbol, Any]]:
+    """
+    Load a game specification from a file, solve it and print the witness.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the specification file.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    repeat : int
+        The number of solver runs.
+    engine : str
+        'polyqent' or 'alternating', see `solve_spec`.
+    prescreen : bool
+        Whether to check a sampled LP relaxation first, see `solve_spec`.
+
+    Returns
+    -------
+    Optional[Dict[sp.Symbol, Any]]
+        The model of the witness, if one was found.
+    """
+    return solve_spec(GameSpec.load(file_path), use_cache, repeat, engine, prescreen=prescreen)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Synthesize a witness for a game specification.")
+    parser.add_argument('spec', help='Path to a TOML or JSON game specification.')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the compiled-spec cache.')
+    parser.add_argument('-r', '--repeat', type=int, default=10, help='Number of solver runs.')
+    parser.add_argument('--engine', choices=['polyqent', 'alternating'], default='polyqent',
+                        help='Solve with PolyQEnt, or with alternating LPs and PolyQEnt as fallback.')
+    parser.add_argument('--prescreen', action='store_true',
+                        help='Skip the solver if a sampled LP relaxation shows that the templates are too weak.')
+    args = parser.parse_args()
+
+    run_spec(args.spec, use_cache=not args.no_cache, repeat=args.repeat, engine=args.engine, prescreen=args.prescreen)
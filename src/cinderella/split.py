@@ -0,0 +1,156 @@
+"""
+This module splits constraint pairs with disjunctive conditions into pairs
+with conjunctive conditions.
+
+Negated goals and substituted guards turn into disjunctions in the conditions
+of the constraint pairs, e.g. the rank decrease pairs of the robot cocktail
+game. The Positivstellensatz encodings need a conjunction of hypotheses, so
+the solver has to normalize such a pair into one certificate per disjunct of
+the DNF of its condition. Splitting the pair ourselves allows dropping the
+disjuncts whose linear atoms are infeasible and the disjuncts that are
+subsumed by smaller ones. A pair is only split if this makes the encoding
+cheaper and its DNF stays below a size cap.
+"""
+from math import comb
+from typing import List, NamedTuple, Optional, Tuple
+
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.lp import is_infeasible
+from cinderella.normal_form import dnf_size, dnf_terms, to_nnf
+
+MAX_DISJUNCTS = 64
+
+
+class SplitDecision(NamedTuple):
+    """
+    The decision for a single constraint pair.
+
+    Attributes
+    ----------
+    index : int
+        The index of the pair in the original constraint system.
+    disjuncts : int
+        The number of disjuncts of the DNF of the condition.
+    pairs : int
+        The number of pairs the pair was replaced by.
+    cost_keep : Optional[int]
+        The estimated number of certificate multipliers without splitting,
+        None if the DNF exceeds the size cap.
+    cost_split : Optional[int]
+        The estimated number of certificate multipliers after splitting,
+        None if the DNF exceeds the size cap.
+    split : bool
+        Whether the pair was split.
+    """
+    index: int
+    disjuncts: int
+    pairs: int
+    cost_keep: Optional[int]
+    cost_split: Optional[int]
+    split: bool
+
+
+class SplitReport(NamedTuple):
+    """
+    The report of a case split of a constraint system.
+
+    Attributes
+    ----------
+    decisions : List[SplitDecision]
+        The decision for every pair with a disjunctive condition.
+    pairs_before : int
+        The number of pairs before splitting.
+    pairs_after : int
+        The number of pairs after splitting.
+    """
+    decisions: List[SplitDecision]
+    pairs_before: int
+    pairs_after: int
+
+    def __str__(self) -> str:
+        lines = [f'Split {sum(d.split for d in self.decisions)} of {len(self.decisions)} disjunctive pairs, '
+                 f'{self.pairs_before} -> {self.pairs_after} pairs']
+        for d in self.decisions:
+            action = f'split into {d.pairs}' if d.split else 'kept'
+            lines.append(f'  [Pair {d.index + 1}] {d.disjuncts} disjuncts, '
+                         f'cost {d.cost_keep} -> {d.cost_split}: {action}')
+        return '\n'.join(lines)
+
+
+def split_disjunctions(cs: ConstraintSystem,
+                       degree: int = 1,
+                       max_disjuncts: int = MAX_DISJUNCTS) -> Tuple[ConstraintSystem, SplitReport]:
+    """
+    Split the constraint pairs with disjunctive conditions into one pair per
+    disjunct of the DNF of the condition. Disjuncts whose linear atoms are
+    infeasible in exact arithmetic and subsumed disjuncts are dropped, which
+    may remove a pair entirely.
+
+    The cost of a certificate for a conjunction of m hypotheses and c
+    conclusion atoms is estimated as the c * binomial(m + degree, degree)
+    multipliers of the Handelman products up to the degree. A pair is split
+    if the cost of the remaining disjuncts is lower than that of all disjuncts.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    degree : int
+        The degree of the certificates, 1 for Farkas.
+    max_disjuncts : int
+        The maximal size of the DNF of a condition to split.
+
+    Returns
+    -------
+    Tuple[ConstraintSystem, SplitReport]
+        The split constraint system and the report of the decisions.
+    """
+    result = cs.copy()
+    result.constraint_pairs = []
+    decisions = []
+    for index, pair in enumerate(cs.constraint_pairs):
+        condition = to_nnf(pair.condition.formula)
+        size = dnf_size(condition)
+        if size <= 1:
+            result.constraint_pairs.append(pair.copy())
+            continue
+        if size > max_disjuncts:
+            decisions.append(SplitDecision(index, size, 1, None, None, False))
+            result.constraint_pairs.append(pair.copy())
+            continue
+
+        conclusions = len(sp.And.make_args(to_nnf(pair.implication.formula)))
+        disjuncts = dnf_terms(condition)
+        kept = _drop_subsumed([d for d in disjuncts if not is_infeasible(d, pair.forall_vars, ignore_nonlinear=True)])
+        cost_keep = sum(_certificate_cost(len(d), conclusions, degree) for d in disjuncts)
+        cost_split = sum(_certificate_cost(len(d), conclusions, degree) for d in kept)
+        split = cost_split < cost_keep
+        if split:
+            result.constraint_pairs.extend(
+                ConstraintPair(list(pair.forall_vars), sp.And(*d), pair.implication.formula, pair.label) for d in kept)
+        else:
+            result.constraint_pairs.append(pair.copy())
+        decisions.append(SplitDecision(index, size, len(kept) if split else 1, cost_keep, cost_split, split))
+    return result, SplitReport(decisions, len(cs.constraint_pairs), len(result.constraint_pairs))
+
+
+def _drop_subsumed(disjuncts: List[frozenset]) -> List[frozenset]:
+    """
+    Drop duplicate disjuncts and disjuncts that contain all atoms of another
+    disjunct, since their pairs are implied by the pair of the smaller one.
+    """
+    kept: List[frozenset] = []
+    for d in sorted(set(disjuncts), key=len):
+        if not any(k <= d for k in kept):
+            kept.append(d)
+    # Preserve the original order of the disjuncts
+    return [d for d in dict.fromkeys(disjuncts) if d in kept]
+
+
+def _certificate_cost(hypotheses: int, conclusions: int, degree: int) -> int:
+    """
+    Estimate the number of multipliers of the certificates of a pair.
+    """
+    return conclusions * comb(hypotheses + degree, degree)
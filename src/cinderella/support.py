@@ -0,0 +1,172 @@
+"""
+This module reuses the support of stored witnesses to solve related games.
+
+Witnesses of related games, e.g. the Cinderella games for different bucket
+sizes, tend to use the same few template coefficients. After a game is solved,
+the non-zero coefficients of its witness are stored. When a game with the
+same structure (the same specification up to its name and parameters) is
+solved, all other template coefficients are first fixed to zero, which gives
+a much smaller instance. Only if that instance is unsat is the full template
+used.
+"""
+import hashlib
+import json
+import os
+from argparse import ArgumentParser
+from typing import Any, Dict, List, Optional
+
+import sympy as sp
+
+from cinderella import OUT_DIR
+from cinderella.executor import execute_polyqent
+from cinderella.prefix_parser.parser import parse_expression
+from cinderella.presolve import complete_model
+from cinderella.spec import CompiledSpec, GameSpec
+
+WITNESS_DIR = OUT_DIR / "witnesses"
+
+
+def structure_hash(spec: GameSpec) -> str:
+    """
+    Get a hash of the specification that ignores its name and parameters.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+
+    Returns
+    -------
+    str
+        The hexadecimal SHA-256 hash.
+    """
+    data = {key: value for key, value in spec.data.items() if key not in ('name', 'parameters')}
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def save_witness(spec: GameSpec, compiled: CompiledSpec, model: Dict[sp.Symbol, Any]) -> None:
+    """
+    Store the witness of a game together with the support of its templates.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    compiled : CompiledSpec
+        The compiled specification.
+    model : Dict[sp.Symbol, Any]
+        The model of the witness.
+    """
+    coefficients = compiled.registry.decode(model)
+    support = {owner: [coeff.name for coeff, value in zip(block.coefficients, coefficients[owner]) if value != 0]
+               for owner, block in compiled.registry.blocks.items()}
+    os.makedirs(WITNESS_DIR, exist_ok=True)
+    with open(WITNESS_DIR / f'{spec.name}.json', 'w') as f:
+        json.dump({
+            'name': spec.name,
+            'structure': structure_hash(spec),
+            'parameters': spec.data.get('parameters', {}),
+            'support': support,
+            'model': {str(key): str(value) for key, value in model.items()},
+        }, f, indent=2)
+
+
+def load_witnesses(spec: GameSpec) -> List[Dict[str, Any]]:
+    """
+    Get the stored witnesses of games with the same structure.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        The stored witnesses, the one of the same game first.
+    """
+    if not WITNESS_DIR.exists():
+        return []
+    structure = structure_hash(spec)
+    witnesses = []
+    for file_name in sorted(os.listdir(WITNESS_DIR)):
+        with open(WITNESS_DIR / file_name) as f:
+            witness = json.load(f)
+        if witness['structure'] == structure:
+            witnesses.append(witness)
+    return sorted(witnesses, key=lambda witness: witness['name'] != spec.name)
+
+
+def restrict_to_support(compiled: CompiledSpec, support: Dict[str, List[str]]) -> Dict[sp.Symbol, int]:
+    """
+    Get the substitution that fixes every template coefficient outside a
+    support to zero.
+
+    Parameters
+    ----------
+    compiled : CompiledSpec
+        The compiled specification.
+    support : Dict[str, List[str]]
+        The names of the non-zero coefficients of every template.
+
+    Returns
+    -------
+    Dict[sp.Symbol, int]
+        The coefficients outside the support, mapped to zero.
+    """
+    return {coeff: 0 for owner, block in compiled.registry.blocks.items()
+            for coeff in block.coefficients if coeff.name not in support.get(owner, [])}
+
+
+def solve_with_support(spec: GameSpec, use_cache: bool = True, repeat: int = 10) -> Optional[Dict[sp.Symbol, Any]]:
+    """
+    Solve a game, first restricted to the support of a stored witness of a
+    game with the same structure, then with the full templates. The witness
+    is printed and stored.
+
+    Parameters
+    ----------
+    spec : GameSpec
+        The game specification.
+    use_cache : bool
+        Whether to use the compiled-spec cache.
+    repeat : int
+        The number of solver runs per attempt.
+
+    Returns
+    -------
+    Optional[Dict[sp.Symbol, Any]]
+        The model of the witness, if one was found.
+    """
+    compiled = spec.compile(use_cache)
+    # The stored witness is also tried as a hint, it verifies instantly when the game is rerun
+    attempts = [(f'{compiled.name}_support', restrict_to_support(compiled, witness['support']),
+                 {key: sp.sympify(value) for key, value in witness['model'].items()})
+                for witness in load_witnesses(spec)[:1]]
+    attempts.append((compiled.name, {}, None))
+
+    for file_name, zeros, hint in attempts:
+        witness_path = os.path.join(OUT_DIR, f'{file_name}.smt2')
+        instance = compiled.cs.instantiate(zeros)
+        instance.write_smt2(witness_path)
+        result, model = execute_polyqent(witness_path, repeat, hint=hint, cs=instance)
+        if result != 'sat':
+            if zeros:
+                print("No witness with the stored support, falling back to the full templates")
+            continue
+        model = {sp.Symbol(key): parse_expression(value) for key, value in model.items()}
+        model = complete_model({**model, **zeros}, compiled.eliminated)
+        compiled.print_witness(model)
+        save_witness(spec, compiled, model)
+        return model
+    return None
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Solve a game specification, reusing the support of stored witnesses.")
+    parser.add_argument('spec', help='Path to a TOML or JSON game specification.')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the compiled-spec cache.')
+    parser.add_argument('-r', '--repeat', type=int, default=10, help='Number of solver runs.')
+    args = parser.parse_args()
+
+    solve_with_support(GameSpec.load(args.spec), use_cache=not args.no_cache, repeat=args.repeat)
@@ -0,0 +1,192 @@
+"""
+This module runs a constraint system for many values of its game parameters.
+
+The constraint system is constructed once with the parameters left symbolic.
+Every sweep point only substitutes the parameter values, writes the .smt2
+file and solves it. Points are distributed over a process pool, so sympy is
+imported once per worker instead of once per point.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import sympy as sp
+
+from cinderella import OUT_DIR
+from cinderella.constraint import ConstraintSystem
+from cinderella.cost import CostModel, solve_timeout
+from cinderella.executor import execute_polyqent
+from cinderella.prefix_parser.parser import parse_expression
+
+
+class SweepResult(NamedTuple):
+    """
+    The result of a single sweep point.
+
+    Attributes
+    ----------
+    point : Dict[sp.Symbol, float]
+        The parameter values of the point.
+    result : str
+        The solver result, e.g. 'sat' or 'unsat'.
+    model : Optional[Dict[sp.Symbol, float]]
+        The model returned by the solver, if any.
+    instantiate_time : float
+        The time to instantiate and write the constraint system in seconds.
+    solve_time : float
+        The time to solve the constraint system in seconds.
+    """
+    point: Dict[sp.Symbol, float]
+    result: str
+    model: Optional[Dict[sp.Symbol, float]]
+    instantiate_time: float
+    solve_time: float
+
+
+_worker_system: Optional[ConstraintSystem] = None
+
+
+def _init_worker(cs: ConstraintSystem) -> None:
+    global _worker_system
+    _worker_system = cs
+
+
+def _solve_point(point: Dict[sp.Symbol, float], file_path: str, repeat: int,
+                 hint: Optional[Dict[sp.Symbol, float]] = None, timeout: float = 300) -> SweepResult:
+    return solve_point(_worker_system, point, file_path, repeat, hint, timeout)
+
+
+def solve_point(cs: ConstraintSystem,
+                point: Dict[sp.Symbol, float],
+                file_path: str,
+                repeat: int = 1,
+                hint: Optional[Dict[sp.Symbol, float]] = None,
+                timeout: float = 300) -> SweepResult:
+    """
+    Instantiate a parametric constraint system at a point and solve it.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system with symbolic parameters.
+    point : Dict[sp.Symbol, float]
+        The parameter values.
+    file_path : str
+        The path of the .smt2 file to be written.
+    repeat : int
+        The number of solver runs.
+    hint : Optional[Dict[sp.Symbol, float]]
+        A model of a related instance, see `execute_polyqent`.
+    timeout : float
+        The timeout of a solver run in seconds.
+
+    Returns
+    -------
+    SweepResult
+        The result of the point.
+    """
+    start = time.time()
+    instance = cs.instantiate(point)
+    instance.write_smt2(file_path)
+    instantiated = time.time()
+    result, model = execute_polyqent(file_path, repeat, hint=hint, cs=instance, timeout=timeout)
+    solved = time.time()
+    if model is not None:
+        model = {sp.Symbol(key): parse_expression(value) for key, value in model.items()}
+    return SweepResult(point, result, model, instantiated - start, solved - instantiated)
+
+
+def sweep_points(parameters: Dict[sp.Symbol, Sequence[float]], grid: bool = True) -> List[Dict[sp.Symbol, float]]:
+    """
+    Get the points of a parameter sweep.
+
+    Parameters
+    ----------
+    parameters : Dict[sp.Symbol, Sequence[float]]
+        The values of every parameter.
+    grid : bool
+        Whether to take the cartesian product of the values, or to zip them.
+
+    Returns
+    -------
+    List[Dict[sp.Symbol, float]]
+        The sweep points.
+    """
+    symbols = list(parameters)
+    combine = product if grid else zip
+    return [dict(zip(symbols, values)) for values in combine(*parameters.values())]
+
+
+def sweep(cs: ConstraintSystem,
+          parameters: Dict[sp.Symbol, Sequence[float]],
+          name: str,
+          grid: bool = True,
+          workers: Optional[int] = None,
+          repeat: int = 1,
+          timeout: Optional[float] = None,
+          cost_model: Optional[CostModel] = None) -> List[SweepResult]:
+    """
+    Solve a parametric constraint system for every point of a parameter sweep.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system with symbolic parameters.
+    parameters : Dict[sp.Symbol, Sequence[float]]
+        The values of every parameter.
+    name : str
+        The name of the sweep, used for the generated .smt2 files.
+    grid : bool
+        Whether to take the cartesian product of the values, or to zip them.
+    workers : Optional[int]
+        The number of worker processes, defaults to the number of cores.
+    repeat : int
+        The number of solver runs per point.
+    timeout : Optional[float]
+        The timeout of a solver run in seconds, defaults to the estimate of
+        the cost model, or `cinderella.cost.DEFAULT_TIMEOUT` without one.
+    cost_model : Optional[CostModel]
+        A calibrated cost model, see `cinderella.cost.solve_timeout`.
+
+    Returns
+    -------
+    List[SweepResult]
+        The results in the order of the sweep points.
+    """
+    points = sweep_points(parameters, grid)
+    if timeout is None:
+        # All points share the structure of the parametric system, and so their estimated cost
+        timeout = solve_timeout(cs, cost_model)
+    paths = [os.path.join(OUT_DIR, f'{name}_{i}.smt2') for i in range(len(points))]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cs,)) as pool:
+        futures = [pool.submit(_solve_point, point, path, repeat, None, timeout) for point, path in zip(points, paths)]
+        return [future.result() for future in futures]
+
+
+def format_results(results: List[SweepResult]) -> str:
+    """
+    Format sweep results as a table.
+
+    Parameters
+    ----------
+    results : List[SweepResult]
+        The sweep results.
+
+    Returns
+    -------
+    str
+        The table with one row per sweep point.
+    """
+    if not results:
+        return ''
+    symbols = list(results[0].point)
+    header = [s.name for s in symbols] + ['result', 'instantiate [s]', 'solve [s]']
+    rows = [[f'{float(r.point[s]):g}' for s in symbols]
+            + [r.result, f'{r.instantiate_time:.3f}', f'{r.solve_time:.3f}'] for r in results]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    lines = [' | '.join(cell.rjust(w) for cell, w in zip(row, widths)) for row in [header] + rows]
+    lines.insert(1, '-+-'.join('-' * w for w in widths))
+    return '\n'.join(lines)
@@ -1,10 +1,12 @@
-from itertools import product
-from typing import List
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
+import numpy as np
 import sympy as sp
 
 
-def get_template(coeffs_name: str, variables: List[sp.Symbol], degree: int, c: int, d: int) -> sp.Expr:
+def get_template(coeffs_name: str, variables: List[sp.Symbol], degree: int, c: int, d: int,
+                 registry: Optional["TemplateRegistry"] = None) -> sp.Expr:
     """
     Get a template over the given variables with the given degree.
     Coefficients are named with the given name and indexed for unique identification.
@@ -22,6 +24,8 @@ def get_template(coeffs_name: str, variables: List[sp.Symbol], degree: int, c: i
         The number of conjunctions in the template.
     d : int
         The number of disjunctions in the template.
+    registry : Optional[TemplateRegistry]
+        The registry to record the coefficients of the template in.
 
     Returns
     -------
@@ -29,14 +33,15 @@ def get_template(coeffs_name: str, variables: List[sp.Symbol], degree: int, c: i
         The template expression.
     """
     if degree == 1:
-        get_expression = lambda name: get_linear_expression(name, variables)
+        get_expression = lambda name: get_linear_expression(name, variables, registry)
     else:
-        get_expression = lambda name: get_polynomial_expression(name, variables, degree)
+        get_expression = lambda name: get_polynomial_expression(name, variables, degree, registry=registry)
     expressions = [get_expression(f'{coeffs_name}_{i}') >= 0 for i in range(c * d)]
     conjunctions = [sp.Or(*expressions[i * d:(i + 1) * d]) for i in range(c)]
     return sp.And(*conjunctions)
 
-def get_linear_expression(coeffs_name: str, variables: List[sp.Symbol]) -> sp.Expr:
+def get_linear_expression(coeffs_name: str, variables: List[sp.Symbol],
+                          registry: Optional["TemplateRegistry"] = None) -> sp.Expr:
     """
     Get a linear expression given the coefficients and the variables.
 
@@ -46,6 +51,8 @@ def get_linear_expression(coeffs_name: str, variables: List[sp.Symbol]) -> sp.Ex
         The name of the coefficients.
     variables : List[sp.Symbol]
         The variables of the linear expression.
+    registry : Optional[TemplateRegistry]
+        The registry to record the coefficients of the expression in.
 
     Returns
     -------
@@ -54,13 +61,24 @@ def get_linear_expression(coeffs_name: str, variables: List[sp.Symbol]) -> sp.Ex
     """
     coeffs = [sp.Symbol(f'{coeffs_name}_{i}')
               for i in range(len(variables) + 1)]
+    if registry is not None:
+        exponents = np.vstack([np.zeros((1, len(variables)), dtype=int), np.eye(len(variables), dtype=int)])
+        registry.register(coeffs_name, coeffs, variables, exponents)
     return coeffs[0] + sum([coeff * variable for variable, coeff in zip(variables, coeffs[1:])])
 
 
-def get_polynomial_expression(coeffs_name: str, variables: List[sp.Symbol], degree: int) -> sp.Expr:
+def get_polynomial_expression(coeffs_name: str,
+                              variables: List[sp.Symbol],
+                              degree: int,
+                              mask: Optional[Sequence[sp.Symbol]] = None,
+                              max_degrees: Optional[Dict[sp.Symbol, int]] = None,
+                              monomials: Optional[Sequence[sp.Expr]] = None,
+                              registry: Optional["TemplateRegistry"] = None) -> sp.Expr:
     """
     Get a polynomial expression over the given variables with the given degree.
     Coefficients are named with the given name and indexed for unique identification. 
+    The template can be restricted to a subset of the monomials, in which case
+    the coefficients keep the indices they have in the full template.
 
     Parameters
     ----------
@@ -70,16 +88,53 @@ def get_polynomial_expression(coeffs_name: str, variables: List[sp.Symbol], degr
         The variables of the polynomial expression.
     degree : int
         The degree of the polynomial expression.
+    mask : Optional[Sequence[sp.Symbol]]
+        The variables that may occur in the expression, all by default.
+    max_degrees : Optional[Dict[sp.Symbol, int]]
+        The maximal degree of individual variables.
+    monomials : Optional[Sequence[sp.Expr]]
+        The monomials that may occur in the expression, all by default.
+    registry : Optional[TemplateRegistry]
+        The registry to record the coefficients of the expression in.
 
     Returns
     -------
     sp.Expr
         The polynomial expression.
     """
-    monomials = get_all_monomials(variables, degree)
+    basis = get_monomial_basis(tuple(variables), degree)
+    if mask is not None or max_degrees or monomials is not None:
+        basis = basis.restrict(mask, max_degrees, monomials)
     coeffs = [sp.Symbol(f'{coeffs_name}_{i}')
-              for i in range(len(monomials))]
-    return sum([coeff * monomial for coeff, monomial in zip(coeffs, monomials)])
+              for i in basis.indices]
+    if registry is not None:
+        registry.register(coeffs_name, coeffs, variables, basis.exponents)
+    return sp.Add(*[coeff * monomial for coeff, monomial in zip(coeffs, basis)])
+
+
+def get_diagonal_updates(variables: List[sp.Symbol], degree: int = 1,
+                         registry: Optional["TemplateRegistry"] = None) -> Dict[sp.Symbol, sp.Expr]:
+    """
+    Get update templates in which every variable only depends on itself,
+    e.g. x' = c_0 + c_1 * x for degree 1.
+    The coefficients of the update of x are named x_upd.
+
+    Parameters
+    ----------
+    variables : List[sp.Symbol]
+        The variables to be updated.
+    degree : int
+        The degree of the updates.
+    registry : Optional[TemplateRegistry]
+        The registry to record the coefficients of the updates in.
+
+    Returns
+    -------
+    Dict[sp.Symbol, sp.Expr]
+        The update template of every variable.
+    """
+    return {var: get_polynomial_expression(f'{var}_upd', variables, degree, mask=[var], registry=registry)
+            for var in variables}
 
 
 def get_all_monomials(variables: List[sp.Symbol], degree: int) -> List[sp.Expr]:
@@ -98,9 +153,292 @@ def get_all_monomials(variables: List[sp.Symbol], degree: int) -> List[sp.Expr]:
     List[sp.Expr]
         The list of monomials.
     """
-    monomials = []
-    for exponents in product(range(degree + 1), repeat=len(variables)):
-        if sum(exponents) <= degree:
-            monomials.append(sp.prod(
-                [variable**exponent for variable, exponent in zip(variables, exponents)]))
-    return monomials
+    return list(get_monomial_basis(tuple(variables), degree))
+
+
+def get_guarded_updates(variables: List[sp.Symbol],
+                        pieces: int,
+                        degree: int = 1,
+                        guard_degree: int = 1,
+                        registry: Optional["TemplateRegistry"] = None) -> List[Tuple[sp.Basic, Dict[sp.Symbol, sp.Expr]]]:
+    """
+    Get a piecewise update template. Every piece but the last is guarded by a
+    template inequality, the first piece whose guard holds is played.
+    The guard of piece i is named guard_i and the update of x in piece i is
+    named x_upd{i}.
+
+    Parameters
+    ----------
+    variables : List[sp.Symbol]
+        The variables to be updated.
+    pieces : int
+        The number of pieces.
+    degree : int
+        The degree of the updates.
+    guard_degree : int
+        The degree of the guards.
+    registry : Optional[TemplateRegistry]
+        The registry to record the coefficients of the templates in.
+
+    Returns
+    -------
+    List[Tuple[sp.Basic, Dict[sp.Symbol, sp.Expr]]]
+        The (guard, update) pieces, the last guard being true.
+    """
+    guarded = []
+    for i in range(pieces):
+        guard = sp.true if i == pieces - 1 else get_template(f'guard_{i}', variables, guard_degree, 1, 1, registry)
+        updates = {var: get_polynomial_expression(f'{var}_upd{i}', variables, degree, registry=registry)
+                   for var in variables}
+        guarded.append((guard, updates))
+    return guarded
+
+
+@lru_cache(maxsize=None)
+def get_monomial_exponents(n: int, degree: int) -> np.ndarray:
+    """
+    Get the exponents of all monomials of at most the given degree in n
+    variables. The monomials are ordered lexicographically by their exponents,
+    the first variable being the most significant, so that the indices of
+    template coefficients do not depend on how the monomials are enumerated.
+
+    Parameters
+    ----------
+    n : int
+        The number of variables.
+    degree : int
+        The maximal total degree.
+
+    Returns
+    -------
+    np.ndarray
+        A read-only integer matrix with one row of exponents per monomial.
+    """
+    if n == 0:
+        exponents = np.zeros((1, 0), dtype=int)
+    else:
+        blocks = []
+        for first in range(degree + 1):
+            rest = get_monomial_exponents(n - 1, degree - first)
+            blocks.append(np.hstack([np.full((len(rest), 1), first), rest]))
+        exponents = np.vstack(blocks)
+    exponents.setflags(write=False)
+    return exponents
+
+
+@lru_cache(maxsize=None)
+def get_monomial_basis(variables: Sequence[sp.Symbol], degree: int) -> "MonomialBasis":
+    """
+    Get the basis of all monomials of at most the given degree over the variables.
+
+    Parameters
+    ----------
+    variables : Sequence[sp.Symbol]
+        The variables of the monomials, as a tuple.
+    degree : int
+        The maximal total degree.
+
+    Returns
+    -------
+    MonomialBasis
+        The monomial basis.
+    """
+    return MonomialBasis(variables, get_monomial_exponents(len(variables), degree))
+
+
+class MonomialBasis:
+    """
+    A class representing a list of monomials by their exponent matrix.
+    The sympy monomials are only constructed when they are accessed.
+
+    Attributes
+    ----------
+    variables : Sequence[sp.Symbol]
+        The variables of the monomials.
+    exponents : np.ndarray
+        The exponents, one row per monomial and one column per variable.
+    indices : np.ndarray
+        The position of every monomial in the full basis of its degree.
+    """
+
+    def __init__(self, variables: Sequence[sp.Symbol], exponents: np.ndarray,
+                 indices: Optional[np.ndarray] = None) -> None:
+        self.variables = tuple(variables)
+        self.exponents = exponents
+        self.indices = np.arange(len(exponents)) if indices is None else indices
+        self._monomials: List[sp.Expr] = [None] * len(exponents)
+
+    def __len__(self) -> int:
+        return len(self.exponents)
+
+    def __getitem__(self, index: int) -> sp.Expr:
+        if self._monomials[index] is None:
+            self._monomials[index] = sp.Mul(*[variable**int(exponent) for variable, exponent
+                                              in zip(self.variables, self.exponents[index]) if exponent])
+        return self._monomials[index]
+
+    def __iter__(self) -> Iterator[sp.Expr]:
+        return (self[i] for i in range(len(self)))
+
+    def evaluate(self, points: np.ndarray) -> np.ndarray:
+        """
+        Evaluate every monomial at the given points.
+
+        Parameters
+        ----------
+        points : np.ndarray
+            The points, one row per point and one column per variable.
+
+        Returns
+        -------
+        np.ndarray
+            The values, one row per point and one column per monomial.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        return np.prod(points[:, None, :] ** self.exponents[None, :, :], axis=2)
+
+    def restrict(self,
+                 mask: Optional[Sequence[sp.Symbol]] = None,
+                 max_degrees: Optional[Dict[sp.Symbol, int]] = None,
+                 monomials: Optional[Sequence[sp.Expr]] = None) -> "MonomialBasis":
+        """
+        Get the sub-basis of the monomials that satisfy all given restrictions.
+
+        Parameters
+        ----------
+        mask : Optional[Sequence[sp.Symbol]]
+            The variables that may occur in the monomials.
+        max_degrees : Optional[Dict[sp.Symbol, int]]
+            The maximal degree of individual variables.
+        monomials : Optional[Sequence[sp.Expr]]
+            The monomials to be kept.
+
+        Returns
+        -------
+        MonomialBasis
+            The restricted basis.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if mask is not None:
+            masked = np.array([var not in set(mask) for var in self.variables], dtype=bool)
+            keep &= ~self.exponents[:, masked].any(axis=1)
+        for var, max_degree in (max_degrees or {}).items():
+            keep &= self.exponents[:, self.variables.index(var)] <= max_degree
+        if monomials is not None:
+            rows = {tuple(row): i for i, row in enumerate(self.exponents.tolist())}
+            allowed = np.zeros(len(self), dtype=bool)
+            for monomial in monomials:
+                terms = sp.Poly(monomial, *self.variables).monoms()
+                if len(terms) != 1 or terms[0] not in rows:
+                    raise ValueError(f'{monomial} is not a monomial of the template')
+                allowed[rows[terms[0]]] = True
+            keep &= allowed
+        return MonomialBasis(self.variables, self.exponents[keep], self.indices[keep])
+
+
+class TemplateBlock(NamedTuple):
+    """
+    The coefficients of a single template.
+
+    Attributes
+    ----------
+    owner : str
+        The name of the template, e.g. 'rank_fn' or 'x0_upd'.
+    coefficients : List[sp.Symbol]
+        The coefficient unknowns, one per monomial.
+    variables : Tuple[sp.Symbol, ...]
+        The variables of the template.
+    exponents : np.ndarray
+        The exponents of the monomials, one row per coefficient.
+    """
+    owner: str
+    coefficients: List[sp.Symbol]
+    variables: Tuple[sp.Symbol, ...]
+    exponents: np.ndarray
+
+
+class TemplateRegistry:
+    """
+    A class recording the coefficient blocks of templates, so that solver
+    models can be decoded into coefficient vectors and witnesses can be
+    evaluated with NumPy.
+
+    Attributes
+    ----------
+    blocks : Dict[str, TemplateBlock]
+        The coefficient block of every template by its owner.
+    """
+
+    def __init__(self) -> None:
+        self.blocks: Dict[str, TemplateBlock] = {}
+
+    def register(self, owner: str, coefficients: List[sp.Symbol], variables: Sequence[sp.Symbol],
+                 exponents: np.ndarray) -> None:
+        """
+        Record the coefficient block of a template.
+
+        Parameters
+        ----------
+        owner : str
+            The name of the template.
+        coefficients : List[sp.Symbol]
+            The coefficient unknowns, one per monomial.
+        variables : Sequence[sp.Symbol]
+            The variables of the template.
+        exponents : np.ndarray
+            The exponents of the monomials, one row per coefficient.
+        """
+        if owner in self.blocks:
+            raise ValueError(f'Template {owner} is already registered')
+        self.blocks[owner] = TemplateBlock(owner, list(coefficients), tuple(variables), exponents)
+
+    def unknowns(self) -> List[sp.Symbol]:
+        """
+        Get the coefficient unknowns of all templates, in registration order.
+
+        Returns
+        -------
+        List[sp.Symbol]
+            The coefficient unknowns.
+        """
+        return [coeff for block in self.blocks.values() for coeff in block.coefficients]
+
+    def decode(self, model: Dict[Any, Any]) -> Dict[str, np.ndarray]:
+        """
+        Decode a model into the coefficient vector of every template.
+        Coefficients that the model does not assign are zero.
+
+        Parameters
+        ----------
+        model : Dict[Any, Any]
+            The model, mapping unknowns or their names to numeric values.
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            The coefficient vector of every template by its owner.
+        """
+        values = {str(key): value for key, value in model.items()}
+        return {owner: np.array([float(values.get(coeff.name, 0)) for coeff in block.coefficients])
+                for owner, block in self.blocks.items()}
+
+    def evaluate(self, owner: str, coefficients: np.ndarray, points: np.ndarray) -> np.ndarray:
+        """
+        Evaluate a template with the given coefficients at a batch of points.
+
+        Parameters
+        ----------
+        owner : str
+            The name of the template.
+        coefficients : np.ndarray
+            The coefficient vector of the template, e.g. from `decode`.
+        points : np.ndarray
+            The points, one row per point and one column per template variable.
+
+        Returns
+        -------
+        np.ndarray
+            The value of the template at every point.
+        """
+        block = self.blocks[owner]
+        return MonomialBasis(block.variables, block.exponents).evaluate(points) @ coefficients
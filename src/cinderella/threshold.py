@@ -0,0 +1,182 @@
+"""
+This module searches for the threshold of a game parameter at which a witness
+starts to exist, e.g. the largest bucket size for which the stepmother wins.
+
+The constraint system is constructed once with the parameter symbolic. Each
+probe instantiates it, first checks the model of the closest satisfiable
+probe found so far and only calls the solver if that warm-start model does not
+already satisfy the instance. Every round probes several points of the
+current interval in parallel, so with k workers the interval shrinks by a
+factor of k + 1 per round instead of 2. Probes that time out or fail are
+inconclusive: they bound the threshold on neither side, and the search stops
+early if a round only produces inconclusive probes.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import sympy as sp
+
+from cinderella import OUT_DIR
+from cinderella.constraint import ConstraintSystem
+from cinderella.cost import CostModel, solve_timeout
+from cinderella.sweep import SweepResult, _init_worker, _solve_point
+
+
+class ThresholdResult(NamedTuple):
+    """
+    The result of a threshold search.
+
+    Attributes
+    ----------
+    lower : float
+        The lower end of the final interval containing the threshold.
+    upper : float
+        The upper end of the final interval containing the threshold.
+    point : Optional[float]
+        The satisfiable probe closest to the threshold, if any.
+    model : Optional[Dict[sp.Symbol, float]]
+        The witness found at that probe, if any.
+    probes : List[SweepResult]
+        All probes in the order they were run.
+    inconclusive : List[float]
+        The probes that timed out or failed. If the search stopped on them,
+        the final interval is wider than the tolerance.
+    """
+    lower: float
+    upper: float
+    point: Optional[float]
+    model: Optional[Dict[sp.Symbol, float]]
+    probes: List[SweepResult]
+    inconclusive: List[float]
+
+
+def find_threshold(cs: ConstraintSystem,
+                   parameter: sp.Symbol,
+                   lower: float,
+                   upper: float,
+                   sat_above: bool = True,
+                   tolerance: float = 1e-3,
+                   workers: Optional[int] = None,
+                   max_gallop: int = 8,
+                   name: str = 'threshold',
+                   timeout: Optional[float] = None,
+                   cost_model: Optional[CostModel] = None) -> ThresholdResult:
+    """
+    Find the threshold of a game parameter by bisection.
+
+    The satisfiability of the instances is assumed to be monotone in the
+    parameter. If the initial interval does not bracket the threshold, it is
+    extended by galloping, doubling its width in every step. A probe that
+    times out or fails bounds the threshold on neither side; the search stops
+    with a wider interval if a round yields only such probes.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system with the parameter symbolic.
+    parameter : sp.Symbol
+        The parameter to search over.
+    lower : float
+        The lower end of the initial interval.
+    upper : float
+        The upper end of the initial interval.
+    sat_above : bool
+        Whether the instances are satisfiable above the threshold (otherwise
+        below it).
+    tolerance : float
+        The width of the final interval.
+    workers : Optional[int]
+        The number of parallel probes per round, defaults to the number of cores.
+    max_gallop : int
+        The maximal number of galloping steps per side.
+    name : str
+        The name of the search, used for the generated .smt2 files.
+    timeout : Optional[float]
+        The timeout of a probe in seconds, defaults to the estimate of the
+        cost model, or `cinderella.cost.DEFAULT_TIMEOUT` without one.
+    cost_model : Optional[CostModel]
+        A calibrated cost model, see `cinderella.cost.solve_timeout`.
+
+    Returns
+    -------
+    ThresholdResult
+        The final interval and the witness at the best satisfiable probe.
+    """
+    workers = workers or os.cpu_count() or 1
+    timeout = timeout if timeout is not None else solve_timeout(cs, cost_model)
+    probes: List[SweepResult] = []
+    sat_points: Dict[float, Dict[sp.Symbol, float]] = {}
+
+    inconclusive: List[float] = []
+
+    def closest_model(value: float) -> Optional[Dict[sp.Symbol, float]]:
+        if not sat_points:
+            return None
+        return sat_points[min(sat_points, key=lambda p: abs(p - value))]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cs,)) as pool:
+
+        def probe(values: List[float]) -> List[str]:
+            futures = [
+                pool.submit(_solve_point, {parameter: value},
+                            os.path.join(OUT_DIR, f'{name}_{value:.6g}.smt2'), 1, closest_model(value), timeout)
+                for value in values
+            ]
+            outcomes = []
+            for value, future in zip(values, futures):
+                result = future.result()
+                probes.append(result)
+                if result.result == 'sat':
+                    sat_points[value] = result.model
+                elif result.result != 'unsat':
+                    inconclusive.append(value)
+                outcomes.append(result.result)
+            return outcomes
+
+        # Both ends of the interval are probed in parallel
+        direction = 1 if sat_above else -1
+        sat_end, unsat_end = (upper, lower) if sat_above else (lower, upper)
+        sat_result, unsat_result = probe([sat_end, unsat_end])
+        if unsat_result == 'sat' and sat_result == 'unsat':
+            raise ValueError(f'Satisfiability is not monotone in {parameter} on [{lower}, {upper}]')
+
+        # Gallop outwards until the interval brackets the threshold, inconclusive ends bound nothing
+        width = upper - lower
+        for _ in range(max_gallop):
+            if sat_result == 'sat' and unsat_result == 'unsat':
+                break
+            if sat_result != 'sat':
+                if sat_result == 'unsat':
+                    unsat_end, unsat_result = sat_end, sat_result
+                sat_end = sat_end + direction * width
+                sat_result, = probe([sat_end])
+            else:
+                if unsat_result == 'sat':
+                    sat_end = unsat_end
+                unsat_end = unsat_end - direction * width
+                unsat_result, = probe([unsat_end])
+            width *= 2
+        if sat_result != 'sat' or unsat_result != 'unsat':
+            raise ValueError(f'No threshold of {parameter} found within {max_gallop} galloping steps '
+                             f'({len(inconclusive)} probes were inconclusive)')
+
+        while abs(sat_end - unsat_end) > tolerance:
+            values = [float(value) for value in np.linspace(unsat_end, sat_end, workers + 2)[1:-1]]
+            outcomes = probe(values)
+            # By monotonicity the first satisfiable probe from the unsat end and the unsat probes before it bound
+            # the threshold, the inconclusive probes bound nothing
+            first_sat = next((i for i, outcome in enumerate(outcomes) if outcome == 'sat'), len(values))
+            unsat = [value for value, outcome in zip(values[:first_sat], outcomes) if outcome == 'unsat']
+            if first_sat == len(values) and not unsat:
+                print(f'Every probe in ({min(values):g}, {max(values):g}) was inconclusive, '
+                      f'stopping at an interval of width {abs(sat_end - unsat_end):g}')
+                break
+            if first_sat < len(values):
+                sat_end = values[first_sat]
+            if unsat:
+                unsat_end = unsat[-1]
+
+    lower, upper = sorted((sat_end, unsat_end))
+    return ThresholdResult(lower, upper, sat_end, sat_points.get(sat_end), probes, inconclusive)
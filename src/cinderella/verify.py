@@ -0,0 +1,139 @@
+"""
+This module checks candidate models against a constraint system without
+calling the solver.
+
+After the model is substituted, every constraint pair is a universally
+quantified implication over the game variables only. When the pair is
+linear, it is decided with one small LP per implication atom. The LPs are
+solved in exact rational arithmetic and floats in the model are taken as the
+rationals they represent, so a model that passes is a witness: a tolerance
+would accept e.g. a rank decrease of 1e-10 for a rank that does not decrease.
+"""
+from typing import Any, List, Optional
+
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.lp import exact_linprog, linear_rows
+from cinderella.normal_form import dnf_size, dnf_terms, to_nnf
+
+MAX_DISJUNCTS = 64
+
+
+def check_model(cs: ConstraintSystem, model: dict) -> Optional[bool]:
+    """
+    Check whether a model satisfies a constraint system.
+
+    Parameters
+    ----------
+    cs : ConstraintSystem
+        The constraint system.
+    model : dict
+        The values of the free variables of the constraint system.
+
+    Returns
+    -------
+    Optional[bool]
+        True if the model satisfies every constraint, False if some constraint
+        is violated, None if the check is inconclusive, e.g. because a pair is
+        not linear or the model does not assign every free variable.
+    """
+    model = {sp.sympify(k): _rational(v) for k, v in model.items()}
+    conclusive = True
+    for constraint in cs.free_constraints:
+        value = constraint.formula.xreplace(model)
+        if value == sp.false:
+            return False
+        if value != sp.true:
+            conclusive = False
+    for pair in cs.constraint_pairs:
+        holds = check_pair(pair, model)
+        if holds is False:
+            return False
+        if holds is None:
+            conclusive = False
+    return True if conclusive else None
+
+
+def check_pair(pair: ConstraintPair, model: dict) -> Optional[bool]:
+    """
+    Check whether a constraint pair holds for all values of its universally
+    quantified variables once the model is substituted.
+
+    Parameters
+    ----------
+    pair : ConstraintPair
+        The constraint pair.
+    model : dict
+        The values of the free variables of the constraint pair.
+
+    Returns
+    -------
+    Optional[bool]
+        True if the pair holds, False if it is violated (strict conditions are
+        relaxed to their closure), None if the check is inconclusive.
+    """
+    model = {sp.sympify(k): _rational(v) for k, v in model.items()}
+    variables = list(pair.forall_vars)
+    condition = pair.condition.formula.xreplace(model)
+    implication = to_nnf(pair.implication.formula.xreplace(model))
+    if (condition.free_symbols | implication.free_symbols) - set(variables):
+        return None
+    if implication == sp.true or condition == sp.false:
+        return True
+    if isinstance(implication, sp.Or):
+        return None
+
+    regions = _polyhedra(condition, variables)
+    if regions is None:
+        return None
+    if implication == sp.false:
+        return not any(exact_linprog([0] * len(variables), A_ub, b_ub).status != 'infeasible'
+                       for A_ub, b_ub in regions)
+    for atom in sp.And.make_args(implication):
+        rows = linear_rows(atom, variables, exact=True)
+        if rows is None:
+            return None
+        strict = atom.is_Relational and atom.rel_op in ('<', '>')
+        for a, b in rows:
+            # The atom requires max a @ x <= b (< b if strict) over the condition
+            for A_ub, b_ub in regions:
+                lp = exact_linprog(-a, A_ub, b_ub)
+                if lp.status == 'infeasible':
+                    continue
+                if lp.status == 'unbounded':
+                    return False
+                maximum = -lp.fun
+                if maximum > b or (strict and maximum >= b):
+                    return False
+    return True
+
+
+def _polyhedra(condition: sp.Basic, variables: List[sp.Symbol]) -> Optional[list]:
+    """
+    Get the closures of the disjuncts of a condition as polyhedra A @ x <= b
+    with rational entries. Returns None if the condition is not a linear
+    formula.
+    """
+    condition = to_nnf(condition)
+    # Count the disjuncts before building them, the DNF can be exponential
+    if dnf_size(condition) > MAX_DISJUNCTS:
+        return None
+    regions = []
+    for disjunct in dnf_terms(condition):
+        rows = []
+        for atom in sorted(disjunct, key=str):
+            atom_rows = linear_rows(atom, variables, exact=True)
+            if atom_rows is None:
+                return None
+            rows.extend(atom_rows)
+        regions.append(([list(a) for a, _ in rows], [b for _, b in rows]))
+    return regions
+
+
+def _rational(value: Any) -> sp.Basic:
+    """
+    Replace the floats in a value by the rationals they represent.
+    """
+    value = sp.sympify(value)
+    return value.xreplace({f: sp.Rational(f) for f in value.atoms(sp.Float)})
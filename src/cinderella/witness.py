@@ -1,12 +1,15 @@
+from typing import Optional, Union
+
 import sympy as sp
 
 from cinderella.constraint import ConstraintSystem, ConstraintPair
+from cinderella.normal_form import to_nnf
 
 
 def construct_constraints(game_variables: list[sp.Symbol],
          game_variable_invariants: list[sp.Basic],
          free_constraints: list[sp.Basic],
-         reach_updates: dict[sp.Symbol, sp.Basic],
+         reach_updates: Union[dict[sp.Symbol, sp.Basic], list[tuple[sp.Basic, dict[sp.Symbol, sp.Basic]]]],
          reach_update_constraints: list[sp.Basic],
          safety_updates: list[dict[sp.Symbol, sp.Basic]],
          goal: sp.Basic,
@@ -14,26 +17,73 @@ def construct_constraints(game_variables: list[sp.Symbol],
          ranking_offset: sp.Basic,
          non_det_aux_vars: list[sp.Symbol] = [],
          non_det_bounds: list[sp.Basic] = [],
-         use_target_not_reached: bool = False) -> ConstraintSystem:
+         use_target_not_reached: bool = False,
+         normalization: Optional[str] = None,
+         symmetries: list[dict[sp.Symbol, sp.Symbol]] = []) -> ConstraintSystem:
 
     # Construct the constraint system
     cs = ConstraintSystem()
 
+    # Guarded updates are a list of (guard, update) pieces, the first piece whose guard holds is played
+    pieces = reach_updates if isinstance(reach_updates, list) else [(sp.true, reach_updates)]
+    if pieces[-1][0] != sp.true:
+        raise ValueError('The guard of the last reach update piece must be true')
+    regions = [sp.And(guard, *[sp.Not(previous) for previous, _ in pieces[:i]])
+               for i, (guard, _) in enumerate(pieces)]
+
+    # Any positive multiple of a witness is a witness, so its scale can be fixed
+    if normalization is not None:
+        scale = get_offset_scale(ranking_offset, game_variables + non_det_aux_vars)
+        others = [*game_variable_invariants, goal, *non_det_bounds,
+                  *[expr for guard, updates in pieces for expr in (guard, *updates.values())],
+                  *[value for update in safety_updates for value in update.values()],
+                  *[constraint(*game_variables) for constraint in reach_update_constraints]]
+        if any(scale in sp.sympify(expr).free_symbols for expr in others):
+            raise ValueError(f'The offset scale {scale} must only occur in the ranking offset and free constraints')
+        # The free constraints must hold for every positive scale and not restrict the rank function
+        positive = sp.Dummy('scale', positive=True)
+        rank_coefficients = set(_rank_coefficients(rank_fn, game_variables))
+        for fc in free_constraints:
+            if fc.free_symbols & rank_coefficients or (scale in fc.free_symbols and fc.subs(scale, positive) != sp.true):
+                raise ValueError(f'The free constraint {fc} is not invariant under scaling the witness')
+        if normalization == 'offset':
+            # A witness with a zero offset cannot be scaled to an offset of 1
+            nonpositive = sp.Dummy('scale', nonpositive=True)
+            if not any(fc.subs(scale, nonpositive) == sp.false for fc in free_constraints):
+                raise ValueError(f'The free constraints must force {scale} > 0 to fix it to 1')
+            ranking_offset = ranking_offset.subs(scale, 1)
+            free_constraints = [fc.subs(scale, 1) for fc in free_constraints]
+        elif normalization == 'box':
+            free_constraints = free_constraints + [
+                sp.And(coeff >= -1, coeff <= 1) for coeff in _rank_coefficients(rank_fn, game_variables)
+            ]
+        else:
+            raise ValueError(f'Unknown normalization {normalization}')
+
+    if symmetries:
+        free_constraints = free_constraints + _symmetry_breaking(
+            symmetries, game_variables, game_variable_invariants, reach_update_constraints,
+            safety_updates, goal, rank_fn, pieces, non_det_bounds, free_constraints)
 
     for fc in free_constraints:
-        cs.add_free_constraint(fc)
+        if fc != sp.true:
+            cs.add_free_constraint(fc)
 
 
-    reach_update_constraints = [
-        constraint(*[reach_updates[var] for var in game_variables])
-        for constraint in reach_update_constraints
-    ]
+    # Pairs are labelled with their origin, the piece is only mentioned for guarded updates
+    def piece_label(i: int) -> str:
+        return f', piece {i}' if len(pieces) > 1 else ''
 
     # Ensure update correctness
-    updates_correct = ConstraintPair(
-        game_variables, sp.And(*game_variable_invariants), sp.And(*reach_update_constraints)
-    )
-    cs.add_constraint_pair(updates_correct)
+    for i, (region, (_, updates)) in enumerate(zip(regions, pieces)):
+        updates_correct = ConstraintPair(
+            game_variables,
+            sp.And(*game_variable_invariants, region),
+            sp.And(*[constraint(*[updates[var] for var in game_variables])
+                     for constraint in reach_update_constraints]),
+            f'update correctness{piece_label(i)}',
+        )
+        cs.add_constraint_pair(updates_correct)
 
     # Ensure that the ranking function is non-negative
     
@@ -41,39 +91,184 @@ def construct_constraints(game_variables: list[sp.Symbol],
         game_variables,
         sp.And(*game_variable_invariants, sp.Not(goal)),
         sp.And(rank_fn >= 0),
+        'rank non-negativity',
     )
     cs.add_constraint_pair(rank_non_neg)
     
-    for update in safety_updates:
-        # Ranking Constraint
-        target_not_reached = sp.Not(goal).simplify()
-        target_not_reached_upd = target_not_reached.subs(update, simultaneous=True).subs(
-            reach_updates, simultaneous=True
-        )
-
-        rank_fn_upd = rank_fn.subs(update, simultaneous=True).subs(
-            reach_updates, simultaneous=True
-        )
-
-        game_variable_invariants_upd = [
-            inv.subs(update, simultaneous=True).subs(reach_updates, simultaneous=True)
-            for inv in game_variable_invariants
-        ]
+    target_not_reached = to_nnf(sp.Not(goal))
+    for j, update in enumerate(safety_updates):
         game_variable_invariants_after_safety = [
             inv.subs(update, simultaneous=True) for inv in game_variable_invariants
         ]
+        for i, (region, (_, reach_updates)) in enumerate(zip(regions, pieces)):
+            # Ranking Constraint
+            target_not_reached_upd = target_not_reached.subs(update, simultaneous=True).subs(
+                reach_updates, simultaneous=True
+            )
+
+            rank_fn_upd = rank_fn.subs(update, simultaneous=True).subs(
+                reach_updates, simultaneous=True
+            )
+
+            game_variable_invariants_upd = [
+                inv.subs(update, simultaneous=True).subs(reach_updates, simultaneous=True)
+                for inv in game_variable_invariants
+            ]
+
+            rank_correct = ConstraintPair(
+                game_variables + non_det_aux_vars,
+                sp.And(
+                    *game_variable_invariants,
+                    target_not_reached if use_target_not_reached else sp.true,
+                    target_not_reached_upd,
+                    *non_det_bounds,
+                    *game_variable_invariants_after_safety,
+                    region.subs(update, simultaneous=True),
+                ),
+                sp.And(rank_fn - rank_fn_upd >= ranking_offset, *game_variable_invariants_upd),
+                f'rank decrease, safety update {j}{piece_label(i)}',
+            )
+            cs.add_constraint_pair(rank_correct)
+
+    # Variables that only occur in hypotheses independent of the conclusion enlarge every certificate
+    return cs.minimize_forall_variables()
 
-        rank_correct = ConstraintPair(
-            game_variables + non_det_aux_vars,
-            sp.And(
-                *game_variable_invariants,
-                target_not_reached if use_target_not_reached else sp.true,
-                target_not_reached_upd,
-                *non_det_bounds,
-                *game_variable_invariants_after_safety,
-            ),
-            sp.And(rank_fn - rank_fn_upd >= ranking_offset, *game_variable_invariants_upd),
+
+def get_offset_scale(ranking_offset: sp.Basic, variables: list[sp.Symbol]) -> sp.Symbol:
+    """
+    Get the unknown that scales the ranking offset, e.g. M in M or t in t*eps.
+
+    Parameters
+    ----------
+    ranking_offset : sp.Basic
+        The ranking offset.
+    variables : list[sp.Symbol]
+        The game and auxiliary variables.
+
+    Returns
+    -------
+    sp.Symbol
+        The unknown, of which the ranking offset is a linear multiple.
+    """
+    unknowns = sp.sympify(ranking_offset).free_symbols - set(variables)
+    if len(unknowns) != 1:
+        raise ValueError(f'The ranking offset {ranking_offset} must contain exactly one unknown')
+    scale, = unknowns
+    if not sp.expand(ranking_offset - scale * ranking_offset.diff(scale)) == 0 \
+            or scale in ranking_offset.diff(scale).free_symbols:
+        raise ValueError(f'The ranking offset {ranking_offset} must be linear in {scale}')
+    return scale
+
+
+def _rank_coefficients(rank_fn: sp.Basic, game_variables: list[sp.Symbol]) -> list[sp.Symbol]:
+    return sorted(sp.sympify(rank_fn).free_symbols - set(game_variables), key=str)
+
+
+def _symmetry_breaking(symmetries: list[dict[sp.Symbol, sp.Symbol]],
+                       game_variables: list[sp.Symbol],
+                       game_variable_invariants: list[sp.Basic],
+                       reach_update_constraints: list,
+                       safety_updates: list[dict[sp.Symbol, sp.Basic]],
+                       goal: sp.Basic,
+                       rank_fn: sp.Basic,
+                       pieces: list[tuple[sp.Basic, dict[sp.Symbol, sp.Basic]]],
+                       non_det_bounds: list[sp.Basic],
+                       free_constraints: list[sp.Basic]) -> list[sp.Basic]:
+    """
+    Get constraints that select one witness of every orbit of witnesses under
+    the given permutations of the game variables: the linear rank coefficient
+    of the first variable is at most the coefficients of the variables it can
+    be permuted to.
+
+    A permutation is only used if it maps the game to itself and the
+    templates to themselves, so that every permuted witness can be
+    represented: the rank function, the reach updates and the guards must be
+    mapped onto each other by a renaming of their unknown coefficients, under
+    which the free constraints are invariant.
+    """
+    primed = [sp.Dummy(f'{var.name}_p') for var in game_variables]
+    to_primed = dict(zip(game_variables, primed))
+
+    def canonical_updates(updates):
+        return {frozenset((var, sp.sympify(update.get(var, var))) for var in game_variables) for update in updates}
+
+    orbits = {var: {var} for var in game_variables}
+    for permutation in symmetries:
+        if set(permutation) - set(game_variables) or sorted(permutation, key=str) != sorted(permutation.values(), key=str):
+            raise ValueError(f'{permutation} is not a permutation of the game variables')
+        permutation = {var: permutation.get(var, var) for var in game_variables}
+        primed_permutation = {to_primed[k]: to_primed[v] for k, v in permutation.items()}
+
+        def permute(expr):
+            return sp.sympify(expr).xreplace({**permutation, **primed_permutation})
+
+        permuted_updates = [{permutation[var]: permute(value) for var, value in update.items()}
+                            for update in safety_updates]
+        invariant = (
+            set(map(permute, game_variable_invariants)) == set(game_variable_invariants)
+            and canonical_updates(permuted_updates) == canonical_updates(safety_updates)
+            and permute(goal) == goal
+            and {permute(c(*primed)) for c in reach_update_constraints} == {c(*primed) for c in reach_update_constraints}
+            and set(map(permute, non_det_bounds)) == set(map(sp.sympify, non_det_bounds))
         )
-        cs.add_constraint_pair(rank_correct)
+        if invariant:
+            # The renaming of the unknowns that maps a witness to its permutation
+            renaming: dict[sp.Symbol, sp.Basic] = {}
+            pairs = [(permute(rank_fn), rank_fn)]
+            for guard, updates in pieces:
+                # The update of a variable is permuted into the update of its image
+                pairs.extend((permute(updates.get(var, var)), updates.get(permutation[var], permutation[var]))
+                             for var in game_variables)
+                if guard != sp.true:
+                    if not isinstance(guard, sp.core.relational.Relational) or permute(guard).rel_op != guard.rel_op:
+                        invariant = False
+                        break
+                    pairs.append((permute(guard.lhs - guard.rhs), guard.lhs - guard.rhs))
+            invariant = invariant and all(_match_template(source, target, game_variables, renaming)
+                                          for source, target in pairs)
+            invariant = (invariant and len(set(renaming.values())) == len(renaming)
+                         and {fc.xreplace(renaming) for fc in free_constraints} == set(free_constraints))
+        if not invariant:
+            raise ValueError(f'The game and its templates could not be verified to be symmetric under {permutation}')
+        for var, image in permutation.items():
+            merged = orbits[var] | orbits[image]
+            for member in merged:
+                orbits[member] = merged
+
+    # Symmetry can only be broken for one orbit, the orbits are not independent
+    linear = {var: sp.sympify(rank_fn).coeff(var).subs({v: 0 for v in game_variables}) for var in game_variables}
+    for var in game_variables:
+        ordered = [other for other in game_variables if other in orbits[var]]
+        if len(ordered) > 1 and all(isinstance(linear[other], sp.Symbol) for other in ordered):
+            return [linear[ordered[0]] <= linear[other] for other in ordered[1:]]
+    return []
+
 
-    return cs
+def _match_template(source: sp.Basic, target: sp.Basic, game_variables: list[sp.Symbol],
+                    renaming: dict[sp.Symbol, sp.Basic]) -> bool:
+    """
+    Check that a permuted template equals another template up to a renaming
+    of its unknown coefficients, and extend the renaming. Coefficients
+    without unknowns must be equal.
+    """
+    variables = set(game_variables)
+    try:
+        source_terms = sp.Poly(sp.sympify(source), *game_variables).as_dict()
+        target_terms = sp.Poly(sp.sympify(target), *game_variables).as_dict()
+    except sp.PolynomialError:
+        return False
+    if set(source_terms) != set(target_terms):
+        return False
+    for monomial, coefficient in source_terms.items():
+        image = target_terms[monomial]
+        if coefficient.free_symbols & variables or image.free_symbols & variables:
+            return False
+        if not coefficient.free_symbols and not image.free_symbols:
+            if coefficient != image:
+                return False
+        elif isinstance(coefficient, sp.Symbol) and isinstance(image, sp.Symbol):
+            if renaming.setdefault(coefficient, image) != image:
+                return False
+        else:
+            return False
+    return True
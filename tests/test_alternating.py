@@ -0,0 +1,28 @@
+import sympy as sp
+
+from cinderella.alternating import _exact_witness, alternate
+from cinderella.verify import check_model
+from cinderella.witness import construct_constraints
+
+x = sp.Symbol('x')
+u0, u1, r0, r1, M = sp.symbols('u0 u1 r0 r1 M')
+
+
+def _counter_game():
+    # The reach player counts x up by at least one until it exceeds 10
+    return construct_constraints([x], [x >= 0], [M > 0], {x: u0 + u1 * x}, [lambda x_p: x_p >= x + 1],
+                                 [{x: x}], x > 10, r0 + r1 * x, M)
+
+
+def test_alternate_returns_exact_witness():
+    cs = _counter_game()
+    result = alternate(cs, [[r0, r1], [u0, u1]], seed=0)
+    assert result.model is not None
+    assert all(isinstance(value, sp.Rational) for value in result.model.values())
+    assert check_model(cs, result.model) is True
+
+
+def test_near_witness_is_not_accepted():
+    # The rank does not decrease, the offset is only positive up to rounding
+    values = {u0: 1.0, u1: 1.0, r0: 0.0, r1: 0.0, M: 1e-12}
+    assert _exact_witness(_counter_game(), values) is None
@@ -0,0 +1,50 @@
+import math
+
+import pytest
+import sympy as sp
+
+pytest.importorskip('polyqent')
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem  # noqa: E402
+from cinderella.cost import (DEFAULT_TIMEOUT, FEATURES, CostFeatures, CostModel, calibrate,  # noqa: E402
+                             cost_features, solve_timeout)
+
+
+def _features(disjuncts: int) -> CostFeatures:
+    return CostFeatures(pairs=3, forall_per_pair=1.0, hypothesis_atoms=4, disjuncts=disjuncts,
+                        unknowns=5, bilinear_terms=2, degree=1)
+
+
+def test_predict_is_log_linear():
+    model = CostModel(0.0, {name: 1.0 if name == 'disjuncts' else 0.0 for name in FEATURES})
+    assert model.predict(_features(0)) == pytest.approx(1.0)
+    assert model.predict(_features(9)) == pytest.approx(10.0)
+
+
+def test_timeout_is_clamped():
+    model = CostModel(math.log(1.234), {name: 1.0 if name == 'disjuncts' else 0.0 for name in FEATURES})
+    assert model.timeout(_features(0)) == 30
+    assert model.timeout(_features(9)) == 124
+    assert model.timeout(_features(999)) == 300
+    assert model.timeout(_features(9), factor=2.5, minimum=1) == 31
+
+
+def test_calibrate_recovers_weights():
+    features = [_features(d)._replace(hypothesis_atoms=h) for d in (1, 3, 7, 15) for h in (2, 8)]
+    times = [0.5 * (1 + f.disjuncts) ** 2 for f in features]
+    model = calibrate(features, times, ridge=1e-9)
+    assert model.weights['disjuncts'] == pytest.approx(2.0, abs=1e-3)
+    assert model.weights['hypothesis_atoms'] == pytest.approx(0.0, abs=1e-3)
+    assert all(weight >= 0 for weight in model.weights.values())
+    assert model.predict(features[0]) == pytest.approx(times[0], rel=1e-3)
+
+
+def test_default_timeout_without_model():
+    x, u = sp.symbols('x u')
+    cs = ConstraintSystem()
+    cs.add_constraint_pair(ConstraintPair([x], sp.Or(x >= 0, x <= -1), u * x >= 0))
+    features = cost_features(cs)
+    assert (features.pairs, features.disjuncts, features.unknowns, features.degree) == (1, 2, 1, 1)
+    assert solve_timeout(cs) == DEFAULT_TIMEOUT
+    model = CostModel(math.log(10.5), {name: 0.0 for name in FEATURES})
+    assert solve_timeout(cs, model) == 105
@@ -0,0 +1,26 @@
+import subprocess
+
+import pytest
+
+pytest.importorskip('polyqent')
+
+from cinderella import executor  # noqa: E402
+
+
+def _failing(error):
+    def execute(*args, **kwargs):
+        raise error
+    return execute
+
+
+def test_solver_process_failures_are_unknown(monkeypatch):
+    monkeypatch.setattr(executor, 'load_config', lambda path: {})
+    monkeypatch.setattr(executor, 'execute', _failing(subprocess.CalledProcessError(1, 'z3')))
+    assert executor.execute_polyqent('game.smt2', repeat=2, timeout=5) == ('unknown', None)
+
+
+def test_other_errors_are_raised(monkeypatch):
+    monkeypatch.setattr(executor, 'load_config', lambda path: {})
+    monkeypatch.setattr(executor, 'execute', _failing(KeyError('x')))
+    with pytest.raises(KeyError):
+        executor.execute_polyqent('game.smt2', repeat=2, timeout=5)
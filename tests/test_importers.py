@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+import sympy as sp
+
+pytest.importorskip('polyqent')
+
+from cinderella.importers import import_game  # noqa: E402
+from cinderella.spec import GameSpec  # noqa: E402
+
+BENCHMARKS = Path(__file__).parents[1] / 'other_benchmarks'
+GAMES = sorted(BENCHMARKS.glob('rpgsolve/*.rpg')) + sorted(BENCHMARKS.glob('gensys/*.py'))
+
+
+@pytest.mark.parametrize('path', GAMES, ids=lambda path: path.name)
+def test_bundled_benchmarks_import_and_compile(path, tmp_path):
+    spec = import_game(str(path))
+    spec.dump(str(tmp_path / 'game.json'))
+    assert GameSpec.load(str(tmp_path / 'game.json')).data == spec.data
+    compiled = spec.compile(use_cache=False)
+    assert compiled.cs.constraint_pairs
+    unknowns = set().union(*[pair.get_free_variables() for pair in compiled.cs.constraint_pairs])
+    assert {sp.Symbol(var) for var in spec.data['game_variables']}.isdisjoint(unknowns)
+
+
+@pytest.mark.parametrize('path', ['rpgsolve/cinderella-15.rpg', 'gensys/1_cinderella_reach_15.py'])
+def test_imported_cinderella_game(path):
+    spec = import_game(str(BENCHMARKS / path))
+    game_variables, _, _, parse = spec._symbols()
+    assert len(game_variables) == 5
+    goal, initial = parse(spec.data['goal']), parse(spec.data['initial_states'])
+
+    def at(formula, values):
+        return formula.subs(dict(zip(game_variables, values)))
+
+    assert at(initial, [0] * 5) == sp.true
+    assert at(goal, [0] * 5) == sp.false and at(goal, [1.5] * 5) == sp.false
+    assert at(goal, [0, 0, 1.6, 0, 0]) == sp.true
+    # The stepmother empties two adjacent buckets
+    emptied = {frozenset(game_variables.index(sp.Symbol(var)) for var in update)
+               for update in spec.data['safety_updates']}
+    assert emptied == {frozenset({i, (i + 1) % 5}) for i in range(5)}
@@ -0,0 +1,30 @@
+import sympy as sp
+
+from cinderella.invariants import _round_up, infer_invariants
+from cinderella.verify import check_model
+from cinderella.witness import construct_constraints
+
+
+def test_invariants_hold_after_safety_move():
+    # The safety player moves x from 0 to 5 and the reach player can only move it back, so x > 100 is never reached
+    x = sp.Symbol('x')
+    u0, u1, r0, r1, M = sp.symbols('u0 u1 r0 r1 M')
+    reach_update_constraints = [lambda x_p: sp.Eq(x_p, x - 5)]
+    safety_updates = [{x: x + 5}]
+    goal = x > 100
+
+    invariants = infer_invariants([x], sp.Eq(x, 0), reach_update_constraints, safety_updates, goal)
+    # The states after the safety move have to satisfy the invariants as well
+    assert all(invariant.subs(x, 5) == sp.true for invariant in invariants)
+
+    cs = construct_constraints([x], invariants, [M > 0], {x: u0 + u1 * x}, reach_update_constraints,
+                               safety_updates, goal, r0 + r1 * x, M)
+    for rank in [(0, 0), (0, 1), (10, -1)]:
+        assert not check_model(cs, {u0: -5, u1: 1, r0: rank[0], r1: rank[1], M: 1})
+
+
+def test_bounds_are_rounded_outward():
+    assert _round_up(5.0) == 5 and _round_up(4.9999999997) == 5 and _round_up(-0.5) == sp.Rational(-1, 2)
+    # A bound just above a simple rational is not rounded down to it
+    assert _round_up(5.0000000003) == sp.Rational(5000001, 1000000)
+    assert _round_up(123456.78912345) >= sp.Rational(123456.78912345) + sp.Rational(1, 10**5)
@@ -0,0 +1,38 @@
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair
+from cinderella.lp import exact_linprog, is_feasible, is_infeasible, linear_rows, linprog
+
+
+def test_linprog_matches_exact_linprog():
+    c, A_ub, b_ub = [1, 1], [[-1, 0], [0, -1], [1, 1]], [1, 2, 4]
+    lp, exact = linprog(c, A_ub, b_ub), exact_linprog(c, A_ub, b_ub)
+    assert lp.status == exact.status == 'optimal'
+    assert exact.fun == -3 and abs(lp.fun + 3) < 1e-9
+    assert exact_linprog([1], [[1]], [0]).status == 'unbounded'
+    assert exact_linprog([1], [[1], [-1]], [0, -1]).status == 'infeasible'
+
+
+def test_exact_rows_keep_floats_exactly():
+    x = sp.Symbol('x')
+    [(a, b)] = linear_rows(sp.Float(0.1) * x <= 1, [x], exact=True)
+    assert a[0] == sp.Rational(0.1) and a[0] != sp.Rational(1, 10) and b == 1
+
+
+def test_barely_feasible_strict_region_is_not_infeasible():
+    x = sp.Symbol('x')
+    atoms = [x > 0, x < sp.Rational(1, 10**12)]
+    # The floating point check cannot tell the open interval from the empty set
+    assert is_feasible(atoms, [x]) is False
+    assert is_feasible(atoms, [x], exact=True) is True
+    assert not is_infeasible(atoms, [x])
+    assert is_infeasible([x > 0, x < 0], [x])
+    assert not is_infeasible([x >= 0, x <= 0], [x])
+
+
+def test_minimize_forall_variables_keeps_barely_feasible_pairs():
+    x, y, u = sp.symbols('x y u')
+    pair = ConstraintPair([x, y], sp.And(x >= 0, y > 0, y < sp.Rational(1, 10**12)), u * x >= 0)
+    minimized = pair.minimize_forall_variables()
+    assert minimized is not None and minimized.forall_vars == [x]
+    assert ConstraintPair([x, y], sp.And(x >= 0, y > 0, y < 0), u * x >= 0).minimize_forall_variables() is None
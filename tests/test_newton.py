@@ -0,0 +1,36 @@
+import numpy as np
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.newton import _separated, forced_zeros, prune_monomials
+
+x, y = sp.symbols('x y')
+u0, u1, u2 = sp.symbols('u0 u1 u2')
+
+
+def test_monomials_outside_farkas_certificates_are_zero():
+    pair = ConstraintPair([x], sp.And(x >= 0, x <= 1), u2 * x ** 2 + u1 * x + u0 >= 0)
+    assert forced_zeros(pair, 'handelman', 1) == {u2}
+    assert forced_zeros(pair, 'handelman', 2) == set()
+
+
+def test_infeasible_hypotheses_force_nothing():
+    conclusion = u2 * x ** 2 + u1 * x + u0 >= 0
+    assert forced_zeros(ConstraintPair([x], sp.And(x > 0, x < 0), conclusion), 'handelman', 1) == set()
+    barely = sp.And(x > 0, x < sp.Rational(1, 10**12))
+    assert forced_zeros(ConstraintPair([x], barely, conclusion), 'handelman', 1) == {u2}
+
+
+def test_separation_is_exact():
+    square = np.array([(0, 0), (1, 0), (0, 1), (1, 1)], dtype=float)
+    assert _separated((2, 0), square)
+    assert not _separated((1, 1), square)
+    assert not _separated((0, 0), np.array([(0, 0)], dtype=float))
+
+
+def test_prune_monomials_reports_zeros():
+    cs = ConstraintSystem()
+    cs.add_constraint_pair(ConstraintPair([x, y], sp.And(x >= 0, y >= 0), u2 * x * y + u1 * x + u0 >= 0))
+    pruned, zeros = prune_monomials(cs, 'farkas')
+    assert zeros == {u2: 0}
+    assert pruned.constraint_pairs[0].implication.formula == (u1 * x + u0 >= 0)
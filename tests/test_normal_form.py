@@ -0,0 +1,26 @@
+import sympy as sp
+
+from cinderella.normal_form import dnf_size, dnf_terms, to_nnf
+
+x, y, z = sp.symbols('x y z')
+
+
+def test_negations_are_pushed_into_the_relations():
+    formula = sp.Not(sp.And(x >= 0, sp.Or(y < 1, sp.Eq(z, 2))))
+    assert to_nnf(formula) == sp.Or(x < 0, sp.And(y >= 1, sp.Ne(z, 2)))
+    assert to_nnf(sp.Implies(x > 0, y <= 0)) == sp.Or(x <= 0, y <= 0)
+    assert to_nnf(sp.Not(sp.Implies(x > 0, y <= 0))) == sp.And(x > 0, y > 0)
+    assert to_nnf(sp.Not(sp.true)) == sp.false
+
+
+def test_dnf_size_matches_dnf_terms():
+    formula = to_nnf(sp.And(sp.Or(x > 0, y > 0), sp.Or(x < 0, z > 0, y < 0), z <= 1))
+    terms = dnf_terms(formula)
+    assert dnf_size(formula) == len(terms) == 6
+    assert frozenset([x > 0, z > 0, z <= 1]) in terms
+
+
+def test_dnf_terms_of_constants():
+    assert dnf_terms(sp.false) == []
+    assert dnf_terms(sp.true) == [frozenset()]
+    assert dnf_terms(sp.Or(x > 0, sp.And(y > 0, z > 0))) == [frozenset([x > 0]), frozenset([y > 0, z > 0])]
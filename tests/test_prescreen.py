@@ -0,0 +1,26 @@
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.prescreen import prescreen
+
+x, u, v = sp.symbols('x u v')
+
+
+def _system(upper):
+    cs = ConstraintSystem()
+    cs.add_free_constraint(u <= upper)
+    cs.add_constraint_pair(ConstraintPair([x], sp.And(x >= 0, x <= 10), u >= x))
+    # Hypotheses with unknowns are not sampled
+    cs.add_constraint_pair(ConstraintPair([x], sp.And(x >= v, x <= 10), u >= 2 * x))
+    return cs
+
+
+def test_too_weak_templates_are_rejected():
+    # The extreme point x = 10 of the hypotheses is always sampled
+    result = prescreen(_system(5))
+    assert not result.feasible and result.skipped == [1] and result.samples > 0
+
+
+def test_satisfiable_systems_pass():
+    result = prescreen(_system(20))
+    assert result.feasible and result.skipped == [1]
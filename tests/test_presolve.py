@@ -0,0 +1,55 @@
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.presolve import complete_model, presolve, remove_redundant_hypotheses
+
+x, y, u = sp.symbols('x y u')
+v, w = sp.symbols('v w')
+
+
+def _system(*conditions):
+    cs = ConstraintSystem()
+    for condition in conditions:
+        cs.add_constraint_pair(ConstraintPair([x, y], condition, u * x + y >= 0))
+    return cs
+
+
+def test_remove_redundant_hypotheses():
+    cs, removed = remove_redundant_hypotheses(_system(sp.And(x >= 0, y >= 0, x + y >= -1, u * x >= 1)))
+    assert removed == 1
+    assert cs.constraint_pairs[0].condition.formula == sp.And(x >= 0, y >= 0, u * x >= 1)
+
+
+def test_nearly_implied_hypotheses_are_kept():
+    # x <= 1 - 1e-12 is implied by x + y <= 1 and y >= 0 up to the LP tolerance, but not exactly
+    bound = x <= 1 - sp.Rational(1, 10**12)
+    cs, removed = remove_redundant_hypotheses(_system(sp.And(x >= 0, y >= 0, bound, x + y <= 1)))
+    assert removed == 0 and bound in sp.And.make_args(cs.constraint_pairs[0].condition.formula)
+
+
+def test_only_exactly_infeasible_pairs_are_dropped():
+    tiny = sp.And(x >= 0, y > 0, y < sp.Rational(1, 10**12))
+    cs, removed = remove_redundant_hypotheses(_system(tiny, sp.And(x >= 1, x <= 0, y >= 0)))
+    assert len(cs.constraint_pairs) == 1 and removed == 3
+    assert cs.constraint_pairs[0].condition.formula == tiny
+
+
+def test_presolve_eliminates_equalities_and_completes_the_model():
+    cs = ConstraintSystem()
+    cs.add_free_constraint(sp.And(sp.Eq(v, 2 * u + 1), w >= 0))
+    cs.add_constraint_pair(ConstraintPair([y, x], sp.And(sp.Eq(y, x + 1), x >= 0), v * x + y + w >= 0))
+    cs.add_constraint_pair(ConstraintPair([x, y], sp.Eq(y, x), x - y >= 0))
+    presolved, eliminated = presolve(cs)
+    assert eliminated == {u: v / 2 - sp.Rational(1, 2)}
+    assert len(presolved.constraint_pairs) == 1
+    pair = presolved.constraint_pairs[0]
+    assert pair.forall_vars == [x] and pair.condition.formula == (x >= 0)
+    assert pair.implication.formula == (v * x + x + 1 + w >= 0)
+    assert complete_model({v: 3, w: 0}, eliminated) == {u: 1, v: 3, w: 0}
+
+
+def test_presolve_keeps_unknowns():
+    cs = ConstraintSystem()
+    cs.add_free_constraint(sp.Eq(v, 2 * u + 1))
+    presolved, eliminated = presolve(cs, keep=[u, v])
+    assert eliminated == {} and presolved.free_constraints[0].formula == sp.Eq(v, 2 * u + 1)
@@ -0,0 +1,41 @@
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.projection import project_aux_vars
+from cinderella.verify import check_model
+
+x, s, t, u, v = sp.symbols('x s t u v')
+
+
+def _system(forall_vars, condition, conclusion):
+    cs = ConstraintSystem()
+    cs.add_constraint_pair(ConstraintPair(forall_vars, condition, conclusion))
+    return cs
+
+
+def _equivalent(cs, projected, models):
+    return all(check_model(cs, model) == check_model(projected, model) for model in models)
+
+
+def test_aux_vars_only_in_hypotheses_are_eliminated_by_fourier_motzkin():
+    cs = _system([x, s], sp.And(x - s >= 0, s >= 1), u * x >= 1)
+    projected, [decision] = project_aux_vars(cs, [s])
+    assert decision.method == 'fourier-motzkin' and decision.eliminated == [s]
+    assert projected.constraint_pairs[0].forall_vars == [x]
+    assert s not in projected.constraint_pairs[0].condition.formula.free_symbols
+    assert _equivalent(cs, projected, [{u: value} for value in (0, sp.Rational(1, 2), 1, 2)])
+
+
+def test_bounded_aux_vars_in_conclusions_are_instantiated_at_vertices():
+    cs = _system([x, s], sp.And(x >= 0, s >= 0, s <= 1), u + s * v >= 0)
+    projected, [decision] = project_aux_vars(cs, [s])
+    assert decision.method == 'vertices'
+    assert projected.constraint_pairs[0].forall_vars == [x]
+    assert _equivalent(cs, projected, [{u: a, v: b} for a in (-1, 0, 1) for b in (-2, -1, 0, 1)])
+
+
+def test_aux_vars_in_hypotheses_and_conclusions_are_kept():
+    cs = _system([x, s, t], sp.And(x - s >= 0, s >= 0, s <= 1), u * s + v * x >= 0)
+    projected, [decision] = project_aux_vars(cs, [s, t])
+    assert decision.eliminated == [t] and 'hypothesis and conclusion' in decision.method
+    assert projected.constraint_pairs[0].forall_vars == [x, s]
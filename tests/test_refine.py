@@ -0,0 +1,40 @@
+import pytest
+import sympy as sp
+
+pytest.importorskip('polyqent')
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem  # noqa: E402
+from cinderella.refine import unsat_core  # noqa: E402
+
+x, u = sp.symbols('x u')
+
+
+def _system(count):
+    cs = ConstraintSystem()
+    for i in range(count):
+        cs.add_constraint_pair(ConstraintPair([x], x >= 0, u * x >= i, f'pair {i}'))
+    return cs
+
+
+def _unsat_with(*labels):
+    # A solver for which exactly the systems containing all given pairs are unsat
+    def is_sat(cs):
+        return not set(labels) <= {pair.label for pair in cs.constraint_pairs}
+    return is_sat
+
+
+def test_unsat_core_is_minimal():
+    core, solves = unsat_core(_system(8), _unsat_with('pair 1', 'pair 6'), max_solves=32)
+    assert core == [1, 6] and solves <= 32
+
+
+def test_timeouts_keep_pairs():
+    core, solves = unsat_core(_system(4), lambda cs: None, max_solves=32)
+    assert core == [0, 1, 2, 3]
+
+
+def test_unsat_core_stops_after_max_solves():
+    calls = []
+    is_sat = _unsat_with('pair 15')
+    core, solves = unsat_core(_system(16), lambda cs: calls.append(cs) or is_sat(cs), max_solves=3)
+    assert solves == len(calls) == 3 and 15 in core and len(core) < 16
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import pytest
+import sympy as sp
+
+pytest.importorskip('polyqent')
+
+from cinderella import spec as spec_module  # noqa: E402
+from cinderella.alternating import alternate  # noqa: E402
+from cinderella.presolve import complete_model  # noqa: E402
+from cinderella.spec import GameSpec, parse_formula  # noqa: E402
+from cinderella.verify import check_model  # noqa: E402
+
+SPECS = Path(__file__).parents[1] / 'specs'
+
+COUNTER = {
+    'name': 'counter',
+    'game_variables': ['x'],
+    'invariants': ['x >= 0'],
+    'free_constraints': ['M > 0'],
+    'reach_update_constraints': ['x_p >= x + 1'],
+    'safety_updates': [{'x': 'x'}],
+    'goal': 'x > 10',
+    'ranking_offset': 'M',
+}
+
+
+def _pairs(compiled):
+    return [str(pair) for pair in compiled.cs.constraint_pairs]
+
+
+@pytest.mark.parametrize('name', ['cinderella_15', 'robot_cocktail'])
+def test_load_dump_compile_round_trip(name, tmp_path, monkeypatch):
+    monkeypatch.setattr(spec_module, 'CACHE_DIR', tmp_path / 'cache')
+    spec = GameSpec.load(str(SPECS / f'{name}.toml'))
+    spec.dump(str(tmp_path / f'{name}.json'))
+    loaded = GameSpec.load(str(tmp_path / f'{name}.json'))
+    assert loaded.data == spec.data and loaded.hash() == spec.hash()
+
+    compiled = spec.compile()
+    assert (tmp_path / 'cache' / f'{spec.hash()}.pkl').exists()
+    assert _pairs(loaded.compile()) == _pairs(compiled) == _pairs(spec.compile(use_cache=False))
+    assert spec.replace(goal='x0 > 1').hash() != spec.hash()
+
+
+def test_prune_monomials_restores_zeros():
+    spec = GameSpec(COUNTER).replace(templates={'rank_fn': {'degree': 2}}, prune_monomials=True)
+    compiled = spec.compile(use_cache=False)
+    rank_x2 = [u for u in compiled.rank_fn.free_symbols if compiled.rank_fn.coeff(sp.Symbol('x'), 2).has(u)]
+    assert rank_x2 and all(compiled.eliminated.get(u) == 0 for u in rank_x2)
+    remaining = set().union(*[c.get_free_variables() for c in compiled.cs.free_constraints + compiled.cs.constraint_pairs])
+    assert not remaining & set(rank_x2)
+
+    # A witness of the pruned system, completed with the zeros, is a witness of the original one
+    blocks = compiled.registry.blocks
+    rank = [u for u in blocks['rank_fn'].coefficients if u not in compiled.eliminated]
+    updates = [u for owner, block in blocks.items() if owner != 'rank_fn' for u in block.coefficients]
+    result = alternate(compiled.cs, [rank, updates])
+    assert result.model is not None
+    original = GameSpec(COUNTER).replace(templates={'rank_fn': {'degree': 2}}).compile(use_cache=False)
+    assert check_model(original.cs, complete_model(result.model, compiled.eliminated)) is True
+
+
+def test_parse_formula():
+    x = sp.Symbol('x')
+    formula = parse_formula('And(x >= 0, x_p <= x + 1/2) & ~Eq(E, 1)', {'x': x, 'E': 2})
+    assert formula == sp.And(x >= 0, sp.Symbol('x_p') <= x + sp.Rational(1, 2))
+    assert parse_formula(0.5, {}) == sp.Float(0.5) and parse_formula('True', {}) is sp.true
+
+
+@pytest.mark.parametrize('expression', ["x.__class__", "__import__('os')", "open('game.toml')"])
+def test_parse_formula_rejects_code(expression):
+    with pytest.raises((ValueError, NameError)):
+        parse_formula(expression, {})
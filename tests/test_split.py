@@ -0,0 +1,35 @@
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.split import split_disjunctions
+
+x, y, u = sp.symbols('x y u')
+
+
+def _system(condition):
+    cs = ConstraintSystem()
+    cs.add_constraint_pair(ConstraintPair([x, y], condition, u * x + y >= 0, 'pair'))
+    return cs
+
+
+def test_split_drops_infeasible_and_subsumed_disjuncts():
+    condition = sp.Or(sp.And(x >= 1, y >= 0), sp.And(x >= 1, y >= 0, y <= 5), sp.And(x >= 1, x <= 0))
+    result, report = split_disjunctions(_system(condition))
+    assert [p.condition.formula for p in result.constraint_pairs] == [sp.And(x >= 1, y >= 0)]
+    assert report.decisions[0].split and report.pairs_after == 1
+
+
+def test_split_keeps_barely_feasible_disjuncts():
+    # The floating point LP cannot tell 0 < y < 1e-12 from the empty set
+    tiny = sp.And(x >= 0, y > 0, y < sp.Rational(1, 10**12))
+    condition = sp.Or(tiny, x >= 5, sp.And(y > 1, y < 0))
+    result, _ = split_disjunctions(_system(condition))
+    assert {p.condition.formula for p in result.constraint_pairs} == {tiny, x >= 5}
+    assert all(p.label == 'pair' for p in result.constraint_pairs)
+
+
+def test_split_keeps_pairs_above_the_cap():
+    condition = sp.And(*[sp.Or(x >= i, y >= i) for i in range(4)])
+    result, report = split_disjunctions(_system(condition), max_disjuncts=8)
+    assert len(result.constraint_pairs) == 1 and not report.decisions[0].split
+    assert report.decisions[0].disjuncts == 16
@@ -0,0 +1,37 @@
+from itertools import product
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from cinderella.template import TemplateRegistry, get_all_monomials, get_monomial_exponents, get_polynomial_expression
+
+x, y, z = sp.symbols('x y z')
+
+
+@pytest.mark.parametrize('n, degree', [(1, 3), (2, 2), (3, 3), (4, 2)])
+def test_monomial_order_matches_product_enumeration(n, degree):
+    expected = [e for e in product(range(degree + 1), repeat=n) if sum(e) <= degree]
+    assert [tuple(row) for row in get_monomial_exponents(n, degree).tolist()] == expected
+
+
+def test_monomials_are_built_in_order():
+    assert get_all_monomials([x, y], 2) == [1, y, y**2, x, x * y, x**2]
+
+
+def test_restricted_templates_keep_their_coefficient_indices():
+    c = sp.symbols('c_0:10')
+    full = get_polynomial_expression('c', [x, y, z], 2)
+    assert full.coeff(x * z) == c[7]
+    masked = get_polynomial_expression('c', [x, y, z], 2, mask=[x, z], max_degrees={x: 1})
+    assert masked == c[0] + c[1] * z + c[2] * z**2 + c[6] * x + c[7] * x * z
+    assert get_polynomial_expression('c', [x, y, z], 2, monomials=[1, x * z]) == c[0] + c[7] * x * z
+
+
+def test_registry_evaluates_templates():
+    registry = TemplateRegistry()
+    get_polynomial_expression('r', [x, y], 2, registry=registry)
+    coefficients = registry.decode({'r_0': 1, 'r_4': 2, 'r_5': -1})['r']
+    points = np.array([[1.0, 2.0], [3.0, -1.0]])
+    # 1 + 2xy - x^2
+    assert np.allclose(registry.evaluate('r', coefficients, points), [4.0, -14.0])
@@ -0,0 +1,29 @@
+import sympy as sp
+
+from cinderella.constraint import ConstraintPair, ConstraintSystem
+from cinderella.verify import check_model, check_pair
+
+
+def test_tiny_offset_does_not_pass_as_rank_decrease():
+    # The rank r * x does not decrease from x to x, but r * x - r * x >= M holds up to 1e-9 for M = 1e-10
+    x, r, M = sp.symbols('x r M')
+    pair = ConstraintPair([x], sp.And(x >= 0, x <= 1), r * x - r * x >= M)
+    assert check_pair(pair, {r: 1, M: 1e-10}) is False
+    assert check_pair(pair, {r: 1, M: 0}) is True
+
+
+def test_strict_conclusion_on_the_boundary_is_violated():
+    x, u = sp.symbols('x u')
+    pair = ConstraintPair([x], sp.And(x >= 0, x <= 1), x + u > 0)
+    assert check_pair(pair, {u: sp.Rational(1, 10**12)}) is True
+    assert check_pair(pair, {u: 0}) is False
+    assert check_pair(pair, {u: 1e-300}) is True
+
+
+def test_check_model_is_inconclusive_for_nonlinear_pairs():
+    x, u = sp.symbols('x u')
+    cs = ConstraintSystem()
+    cs.add_free_constraint(u >= 0)
+    cs.add_constraint_pair(ConstraintPair([x], x >= 0, u * x ** 2 >= 0))
+    assert check_model(cs, {u: 1}) is None
+    assert check_model(cs, {u: -1}) is False